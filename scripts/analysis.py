@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测速结果分析
+
+一次读取 result.csv（或 ResultTable 二进制文件，用 mmap 零拷贝加载）为紧凑的列式结构，
+在此基础上生成所有报告：
+- 全部结果及前 N 个结果的地区分布
+- 每个地区在按延迟排序后的列表中第一次出现的位置
+- best_ip.txt 中每个 IP 的排名（按地址排序的索引 + 二分查找，而不是逐个线性扫描）
+- 选优模拟（与 parse_top_ips_by_region 的三轮选择逻辑一致）
+
+--rank-by p95 / p99 时以上排序都改用尾延迟（tcp_probe 输出的分位数列；cfst 的结果没有这些列，
+等同于按平均延迟）。长连接更在意偶发的慢握手，p95 比平均值更能反映实际体验。
+
+用法：
+    python scripts/analysis.py --csv result.csv --best best_ip.txt
+    python scripts/analysis.py --report select --max-per-region 50 --save-selection test_best_ip.txt
+    python scripts/analysis.py --json
+    python scripts/analysis.py --rank-by p95 --report select first
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from region_index import DEFAULT_REGION
+from result_table import RANK_KEYS, ResultTable, load_table
+
+PRIORITY_REGIONS = ["US", "GB", "IN", "JP", "KR", "SG", "HK"]
+
+REPORTS = ("distribution", "first", "select", "ranks")
+
+
+def _count_regions(cols: ResultTable, rows) -> dict[str, int]:
+    counts = [0] * len(cols.categories)
+    region = cols.region
+    for row in rows:
+        counts[region[row]] += 1
+    return {name: counts[code] for code, name in enumerate(cols.categories) if counts[code]}
+
+
+def region_distribution(cols: ResultTable, top: int | None = None) -> dict[str, int]:
+    """全部结果（或按延迟排序后的前 top 个）的地区分布"""
+    rows = range(len(cols)) if top is None else cols.order[:top]
+    return _count_regions(cols, rows)
+
+
+def first_positions(cols: ResultTable) -> dict[str, dict]:
+    """每个地区在按延迟排序后的列表中第一次出现的位置"""
+    out: dict[str, dict] = {}
+    remaining = len(set(cols.region))
+    region = cols.region
+    for pos, row in enumerate(cols.order):
+        name = cols.categories[region[row]]
+        if name not in out:
+            out[name] = {"position": pos, "ip": cols.ip_at(row), "latency": round(cols.latency[row], 2)}
+            remaining -= 1
+            if remaining == 0:
+                break
+    return out
+
+
+def simulate_selection(cols: ResultTable, regions: list[str], max_per_region: int = 10,
+                       max_total: int = 100) -> dict:
+    """
+    在列式数据上模拟 parse_top_ips_by_region 的三轮选择
+
+    Returns:
+        {"selected": 行号列表, "after_pass": 每轮结束后的已选数量}
+    """
+    selected, after_pass = cols.select_top(regions, max_per_region, max_total)
+    return {"selected": list(selected), "after_pass": after_pass}
+
+
+def best_ip_ranks(cols: ResultTable, best_ips: list[str]) -> list[dict]:
+    """best_ip.txt 中每个 IP 在按延迟排序后的列表中的位置"""
+    out = []
+    for ip in best_ips:
+        pos = cols.rank_of(ip)
+        if pos is None:
+            out.append({"ip": ip, "position": None})
+            continue
+        row = cols.order[pos]
+        out.append({"ip": ip, "position": pos, "latency": round(cols.latency[row], 2),
+                    "region": cols.region_at(row)})
+    return out
+
+
+def build_report(cols: ResultTable, reports: list[str], regions: list[str], max_per_region: int,
+                 max_total: int, top: int, best_ips: list[str] | None = None) -> dict:
+    """生成所选报告，返回可 JSON 序列化的字典"""
+    report: dict = {"total": len(cols), "rank_by": cols.rank_key}
+    if "distribution" in reports:
+        report["distribution"] = region_distribution(cols)
+        report["distribution_top"] = {"top": top, "regions": region_distribution(cols, top)}
+    if "first" in reports:
+        report["first_positions"] = first_positions(cols)
+    if "select" in reports:
+        sim = simulate_selection(cols, regions, max_per_region, max_total)
+        selected = sim["selected"]
+        report["selection"] = {
+            "regions": regions,
+            "max_per_region": max_per_region,
+            "max_total": max_total,
+            "after_pass": sim["after_pass"],
+            "by_region": _count_regions(cols, selected),
+            "ips": [cols.ip_at(row) for row in selected],
+            "latency": [round(cols.latency[row], 2) for row in selected],
+            "region": [cols.region_at(row) for row in selected],
+        }
+        if cols.rank_key != "latency":
+            column = getattr(cols, cols.rank_key)
+            report["selection"][cols.rank_key] = [round(column[row], 2) for row in selected]
+    if "ranks" in reports and best_ips is not None:
+        ranks = best_ip_ranks(cols, best_ips)
+        by_region: dict[str, int] = {}
+        for r in ranks:
+            name = r.get("region", DEFAULT_REGION)
+            by_region[name] = by_region.get(name, 0) + 1
+        report["best_ips"] = {"total": len(best_ips), "by_region": by_region, "ranks": ranks}
+    return report
+
+
+def _print_counts(counts: dict[str, int]) -> None:
+    for region, count in sorted(counts.items()):
+        print(f"{region}: {count}")
+
+
+def print_report(report: dict, regions: list[str], show: int = 20) -> None:
+    """以文本形式输出报告"""
+    print(f"Total IPs in result.csv: {report['total']}")
+    key = report.get("rank_by", "latency")
+    if key != "latency":
+        print(f"Ranking by {key} latency")
+
+    if "distribution" in report:
+        print("\nRegion distribution in entire result.csv:")
+        _print_counts(report["distribution"])
+        top = report["distribution_top"]
+        print(f"\nRegion distribution in first {top['top']} IPs by {key}:")
+        _print_counts(top["regions"])
+        in_priority = sum(top["regions"].get(r, 0) for r in regions)
+        print(f"\nTotal IPs in priority regions in first {top['top']} IPs: {in_priority}")
+        print(f"Total IPs in other regions in first {top['top']} IPs: {sum(top['regions'].values()) - in_priority}")
+
+    if "first_positions" in report:
+        print(f"\nFirst occurrence of each region (position 0 has the lowest {key}):")
+        for region, info in sorted(report["first_positions"].items()):
+            print(f"{region}: position {info['position']}, IP: {info['ip']}, latency: {info['latency']:.2f}ms")
+
+    if "selection" in report:
+        sel = report["selection"]
+        first, second, third = sel["after_pass"]
+        print(f"\nSimulating parse_top_ips_by_region (MAX_PER_REGION={sel['max_per_region']}, "
+              f"MAX_TOTAL={sel['max_total']}):")
+        print(f"After first loop (priority regions): {first} IPs selected")
+        print(f"After second loop (other regions): {second} IPs selected")
+        print(f"After third loop (any region): {third} IPs selected")
+        print("\nFinal selection by region:")
+        _print_counts(sel["by_region"])
+        print(f"\nFirst {min(show, len(sel['ips']))} selected IPs (by {key}):")
+        tail = sel.get(key, [None] * len(sel["ips"]))
+        for i, (ip, latency, region, value) in enumerate(zip(sel["ips"], sel["latency"], sel["region"], tail)):
+            if i >= show:
+                break
+            extra = f", {key} {value:.2f}ms" if value is not None else ""
+            print(f"{i+1:3}. {ip:20} - {latency:.2f}ms{extra} ({region})")
+        if third < sel["max_total"]:
+            print(f"\n⚠️  Warning: Only {third} IPs selected out of {sel['max_total']} maximum.")
+        else:
+            print(f"\n✅ Successfully selected {third} IPs (maximum: {sel['max_total']})")
+
+    if "best_ips" in report:
+        best = report["best_ips"]
+        print(f"\nTotal IPs in best_ip.txt: {best['total']}")
+        print("Region distribution:")
+        _print_counts(best["by_region"])
+        print("\nPositions of best_ip.txt IPs in sorted list:")
+        for r in best["ranks"]:
+            if r["position"] is None:
+                print(f"IP: {r['ip']}, not found in result.csv")
+            else:
+                print(f"IP: {r['ip']}, position: {r['position']}, latency: {r['latency']:.2f}ms, "
+                      f"region: {r['region']}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse a cfst result.csv in a single pass")
+    parser.add_argument("--csv", type=Path, default=Path("result.csv"),
+                        help="result.csv or a binary result table written by --save-table")
+    parser.add_argument("--best", type=Path, default=Path("best_ip.txt"),
+                        help="selected IPs to rank (skipped if missing)")
+    parser.add_argument("--report", nargs="+", choices=REPORTS, default=list(REPORTS))
+    parser.add_argument("--regions", default=",".join(PRIORITY_REGIONS))
+    parser.add_argument("--max-per-region", type=int, default=10)
+    parser.add_argument("--max-total", type=int, default=100)
+    parser.add_argument("--top", type=int, default=100, help="size of the head for the distribution report")
+    parser.add_argument("--show", type=int, default=20, help="selected IPs to print")
+    parser.add_argument("--save-selection", type=Path, default=None,
+                        help="write the simulated selection to this file")
+    parser.add_argument("--save-table", type=Path, default=None,
+                        help="also save the loaded results as a memory-mappable binary table")
+    parser.add_argument("--rank-by", choices=RANK_KEYS, default="latency",
+                        help="column to rank by: mean latency or a tail percentile")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    regions = [r.strip().upper() for r in args.regions.split(",") if r.strip()]
+    best_ips = None
+    if "ranks" in args.report and args.best.exists():
+        with open(args.best, "r", encoding="utf-8") as f:
+            best_ips = [line.strip() for line in f if line.strip()]
+
+    cols = load_table(args.csv)
+    if args.save_table:
+        cols.save(args.save_table)
+    cols.rank_by(args.rank_by)
+    report = build_report(cols, args.report, regions, args.max_per_region, args.max_total, args.top, best_ips)
+
+    if args.save_selection and "selection" in report:
+        ips = report["selection"]["ips"]
+        args.save_selection.write_text("\n".join(ips) + ("\n" if ips else ""), encoding="utf-8")
+
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report, regions, args.show)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
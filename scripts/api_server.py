@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地 HTTP API：提供优选 IP 查询
+
+接口：
+    GET /best?n=20[&family=4|6]     已发布的前 N 个 IP（best_ip.txt / best_ipv6.txt 的顺序）及其测速数据
+    GET /best.txt?n=20              同上，纯文本，每行一个 IP（可直接替代 best_ip.txt）
+    GET /regions/<地区码>?n=20      该地区在 result.csv 中延迟最低的 N 个 IP
+    GET /ip/<ip>                    单个 IP 的全部测速数据、地区、排名
+    GET /metrics                    Prometheus 文本格式的服务指标
+
+结果常驻内存（result.csv 用 ResultTable 列式存放，二进制表则直接 mmap）。
+每隔 check_interval 秒检查一次文件的 mtime/大小，只有变化时才重新加载并重建索引。
+每个响应带有基于内容的 ETag，客户端带 If-None-Match 轮询时返回 304，无需传输内容。
+响应体按 (路径, 参数) 缓存在当前快照上，单进程 asyncio + keep-alive 每秒可处理数千请求。
+
+用法：
+    python scripts/api_server.py --port 8080 --best best_ip.txt --results result.csv
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from region_index import classify_ips
+from result_table import ResultTable, load_table
+
+DEFAULT_N = 20
+MAX_N = 1000
+# 每个快照最多缓存的响应数
+RESPONSE_CACHE_SIZE = 4096
+# /metrics 中按接口统计请求数；其他路径统一记为 other，避免标签无限增长
+ENDPOINTS = ("best", "best.txt", "regions", "ip", "metrics")
+# 关闭连接时等待对端确认的最长时间（秒）
+CLOSE_TIMEOUT = 5.0
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error"}
+
+
+class Response(NamedTuple):
+    status: int
+    content_type: str
+    body: bytes
+    etag: str | None = None
+
+
+def _json_response(payload, status: int = 200) -> Response:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _with_etag(Response(status, "application/json; charset=utf-8", body))
+
+
+def _with_etag(response: Response) -> Response:
+    if response.status != 200:
+        return response
+    return response._replace(etag='"' + hashlib.blake2b(response.body, digest_size=12).hexdigest() + '"')
+
+
+def _error(status: int, message: str) -> Response:
+    return _json_response({"error": message}, status)
+
+
+def _read_ips(path: Path | None) -> list[str]:
+    if path is None or not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class Snapshot:
+    """
+    某一时刻的 best_ip.txt / best_ipv6.txt / result.csv 及其索引
+
+    地区索引在第一次查询地区时一次性建立（单遍扫描按延迟排序的行号）。
+    """
+
+    def __init__(self, best: list[str], table: ResultTable | None, loaded_at: float | None = None) -> None:
+        self.best = best
+        self.table = table
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+        self.published = {ip: i for i, ip in enumerate(best)}
+        self._fallback_regions = dict(zip(best, classify_ips(best)))
+        self._region_rows: dict[str, list[int]] | None = None
+        self.responses: dict[tuple, Response] = {}
+
+    def close(self) -> None:
+        if self.table is not None:
+            self.table.close()
+
+    def meta(self, ip: str) -> dict | None:
+        """单个 IP 的测速数据；不在 result.csv 中但已发布的 IP 只有地区和发布排名"""
+        pos = self.table.rank_of(ip) if self.table is not None else None
+        if pos is None:
+            if ip not in self.published:
+                return None
+            return {"ip": ip, "region": self._fallback_regions[ip], "published_rank": self.published[ip]}
+        return self._row_meta(self.table.order[pos], pos, ip)
+
+    def _row_meta(self, row: int, pos: int, ip: str | None = None) -> dict:
+        table = self.table
+        ip = ip or table.ip_at(row)
+        return {
+            "ip": ip,
+            "region": table.region_at(row),
+            "latency": round(table.latency[row], 2),
+            "loss": round(table.loss[row], 4),
+            "jitter": round(table.jitter[row], 2),
+            "speed": round(table.speed[row], 2),
+            "rank": pos,
+            "published_rank": self.published.get(ip),
+        }
+
+    def region_top(self, region: str, n: int) -> list[dict]:
+        """某地区延迟最低的 n 个 IP"""
+        if self.table is None:
+            return [self.meta(ip) for ip in self.best if self._fallback_regions[ip] == region][:n]
+        if self._region_rows is None:
+            by_code: dict[int, list[int]] = {}
+            region_col = self.table.region
+            for pos, row in enumerate(self.table.order):
+                rows = by_code.setdefault(region_col[row], [])
+                if len(rows) < MAX_N:
+                    rows.append(pos)
+            self._region_rows = {self.table.categories[code]: rows for code, rows in by_code.items()}
+        order = self.table.order
+        return [self._row_meta(order[pos], pos) for pos in self._region_rows.get(region, [])[:n]]
+
+
+class SnapshotStore:
+    """
+    持有当前快照，文件变化时重新加载
+
+    Args:
+        best_files: 已发布 IP 的文件（按顺序拼接），如 best_ip.txt、best_ipv6.txt
+        results: result.csv 或 ResultTable 二进制文件
+        check_interval: 两次检查文件变化之间的最短间隔（秒）
+    """
+
+    def __init__(self, best_files: list[Path], results: Path | None = None, check_interval: float = 1.0) -> None:
+        self.best_files = best_files
+        self.results = results
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self._signature = None
+        self._checked_at = float("-inf")
+        self._snapshot: Snapshot | None = None
+
+    def _files(self) -> list[Path]:
+        return self.best_files + ([self.results] if self.results is not None else [])
+
+    def _stat_signature(self) -> tuple:
+        sig = []
+        for path in self._files():
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def current(self) -> Snapshot:
+        """
+        当前快照；文件有变化时重新加载
+
+        重新加载失败（文件损坏、写到一半等）时继续使用上一份快照，直到文件再次变化。
+
+        Raises:
+            OSError, ValueError: 第一次加载就失败
+        """
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        self._checked_at = now
+        signature = self._stat_signature()
+        if self._snapshot is None or signature != self._signature:
+            try:
+                best = [ip for path in self.best_files for ip in _read_ips(path)]
+                table = load_table(self.results) if self.results is not None and self.results.exists() else None
+            except (OSError, ValueError) as e:
+                if self._snapshot is None:
+                    raise
+                self.reload_errors += 1
+                self._signature = signature
+                print(f"Reload failed, keeping the previous snapshot: {e}", file=sys.stderr)
+                return self._snapshot
+            old, self._snapshot = self._snapshot, Snapshot(best, table)
+            self._signature = signature
+            self.reloads += 1
+            if old is not None:
+                old.close()
+        return self._snapshot
+
+
+def _int_param(query: dict[str, list[str]], name: str, default: int) -> int:
+    value = query.get(name, [str(default)])[-1]
+    n = int(value)
+    if n < 0:
+        raise ValueError(name)
+    return min(n, MAX_N)
+
+
+class ApiApp:
+    """与网络无关的请求处理（便于测试）"""
+
+    def __init__(self, store: SnapshotStore) -> None:
+        self.store = store
+        self.started_at = time.time()
+        self.port: int | None = None
+        self.requests: dict[tuple[str, int], int] = {}
+
+    def handle(self, method: str, target: str, headers: dict[str, str]) -> Response:
+        """
+        处理一个请求
+
+        Args:
+            method: HTTP 方法
+            target: 请求路径（含查询参数）
+            headers: 小写的请求头
+
+        Returns:
+            响应；If-None-Match 命中时为 304
+        """
+        parts = urlsplit(target)
+        path = unquote(parts.path).rstrip("/") or "/"
+        endpoint = path.split("/")[1] if path.startswith("/") else "other"
+        if endpoint not in ENDPOINTS:
+            endpoint = "other"
+        if not path.startswith("/"):
+            response = _error(400, "malformed request target")
+        elif method not in ("GET", "HEAD"):
+            response = _error(405, "only GET and HEAD are supported")
+        else:
+            try:
+                snapshot = self.store.current()
+            except (OSError, ValueError) as e:
+                response = _error(500, f"results not loaded: {e}")
+            else:
+                if path == "/metrics":
+                    response = Response(200, "text/plain; version=0.0.4",
+                                        self.metrics_text(snapshot).encode("utf-8"))
+                else:
+                    key = (path, parts.query)
+                    response = snapshot.responses.get(key)
+                    if response is None:
+                        response = self._route(snapshot, path, parse_qs(parts.query))
+                        if len(snapshot.responses) >= RESPONSE_CACHE_SIZE:
+                            snapshot.responses.clear()
+                        snapshot.responses[key] = response
+
+        if response.etag is not None and headers.get("if-none-match") == response.etag:
+            response = Response(304, response.content_type, b"", response.etag)
+        counter = (endpoint or "/", response.status)
+        self.requests[counter] = self.requests.get(counter, 0) + 1
+        return response
+
+    def _route(self, snapshot: Snapshot, path: str, query: dict[str, list[str]]) -> Response:
+        try:
+            n = _int_param(query, "n", DEFAULT_N)
+        except ValueError:
+            return _error(400, "n must be a non-negative integer")
+
+        if path in ("/best", "/best.txt"):
+            family = query.get("family", [""])[-1]
+            if family not in ("", "4", "6"):
+                return _error(400, "family must be 4 or 6")
+            ips = [ip for ip in snapshot.best if not family or (":" in ip) == (family == "6")][:n]
+            if path == "/best.txt":
+                body = "".join(ip + "\n" for ip in ips).encode("utf-8")
+                return _with_etag(Response(200, "text/plain; charset=utf-8", body))
+            return _json_response({"count": len(ips), "ips": [snapshot.meta(ip) for ip in ips]})
+
+        if path.startswith("/regions/"):
+            region = path[len("/regions/"):].upper()
+            ips = snapshot.region_top(region, n)
+            return _json_response({"region": region, "count": len(ips), "ips": ips})
+
+        if path.startswith("/ip/"):
+            meta = snapshot.meta(path[len("/ip/"):])
+            if meta is None:
+                return _error(404, "IP not found")
+            return _json_response(meta)
+
+        return _error(404, "unknown endpoint")
+
+    def metrics_text(self, snapshot: Snapshot) -> str:
+        lines = ["# TYPE cfst_api_requests_total counter"]
+        for (endpoint, status), count in sorted(self.requests.items()):
+            lines.append(f'cfst_api_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines += [
+            "# TYPE cfst_api_reloads_total counter",
+            f"cfst_api_reloads_total {self.store.reloads}",
+            "# TYPE cfst_api_reload_errors_total counter",
+            f"cfst_api_reload_errors_total {self.store.reload_errors}",
+            "# TYPE cfst_api_snapshot_age_seconds gauge",
+            f"cfst_api_snapshot_age_seconds {time.time() - snapshot.loaded_at:.3f}",
+            "# TYPE cfst_api_published_ips gauge",
+            f"cfst_api_published_ips {len(snapshot.best)}",
+            "# TYPE cfst_api_result_rows gauge",
+            f"cfst_api_result_rows {len(snapshot.table) if snapshot.table is not None else 0}",
+            "# TYPE cfst_api_uptime_seconds gauge",
+            f"cfst_api_uptime_seconds {time.time() - self.started_at:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+async def _serve_connection(app: ApiApp, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """HTTP/1.1 连接：支持 keep-alive，忽略请求体（只有 GET/HEAD）"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                response, method, version = _error(400, "malformed request line"), "GET", "HTTP/1.0"
+            else:
+                response = app.handle(method, target, headers)
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+            head = [
+                f"HTTP/1.1 {response.status} {_REASONS.get(response.status, '')}",
+                f"Content-Type: {response.content_type}",
+                f"Content-Length: {len(response.body)}",
+                "Cache-Control: no-cache",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            ]
+            if response.etag is not None:
+                head.append(f"ETag: {response.etag}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            if method != "HEAD":
+                writer.write(response.body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), CLOSE_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+
+async def serve(app: ApiApp, host: str = "127.0.0.1", port: int = 8080,
+                ready: asyncio.Event | None = None) -> None:
+    """运行 HTTP 服务直到被取消"""
+    server = await asyncio.start_server(lambda r, w: _serve_connection(app, r, w), host, port)
+    app.port = server.sockets[0].getsockname()[1]
+    print(f"Serving on http://{host}:{app.port}")
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the best IPs over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--best", type=Path, nargs="+", default=[Path("best_ip.txt"), Path("best_ipv6.txt")],
+                        help="published IP files, concatenated in order")
+    parser.add_argument("--results", type=Path, default=Path("result.csv"),
+                        help="result.csv or a binary result table")
+    parser.add_argument("--check-interval", type=float, default=1.0,
+                        help="seconds between checks for changed files")
+    args = parser.parse_args(argv)
+
+    app = ApiApp(SnapshotStore(args.best, args.results, args.check_interval))
+    app.store.current()
+    try:
+        asyncio.run(serve(app, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
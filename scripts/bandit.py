@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基于多臂老虎机（Thompson 采样）的候选 IP 生成
+
+把 ip.txt 中的每个 /24 当作一个臂：某个 /24 的 IP 进入一次运行的前 K 名记为一次
+成功，否则记为一次失败，使用 Beta 分布做 Thompson 采样，在给定的测速预算内
+优先测过去表现好的网段，同时保留对未知网段的探索。历史统计带指数衰减，
+以适应网络状况的变化。
+
+离线模拟：
+    python scripts/bandit.py simulate --csv run1.csv run2.csv ... --budgets 500 1000 2000
+    python scripts/bandit.py simulate --archive results.archive --last 30 --holdout 10
+"""
+
+import csv
+import json
+import random
+import heapq
+import sqlite3
+import argparse
+import ipaddress
+from pathlib import Path
+from typing import Iterable
+
+# 单个臂的统计：[成功次数, 失败次数]（衰减后为浮点数）
+ArmStats = dict[int, list[float]]
+
+DEFAULT_TOP_K = 100
+DEFAULT_DECAY = 0.9
+DEFAULT_MAX_RUNS = 30
+
+
+def arm_of(ip: str) -> int:
+    """IPv4 地址所属 /24 的整数键"""
+    return int(ipaddress.IPv4Address(ip)) >> 8
+
+
+def load_arms(ip_txt: Path) -> list[int]:
+    """列出 ip.txt 中所有 IPv4 网段覆盖的 /24（作为臂）"""
+    arms = set()
+    with open(ip_txt, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            net = ipaddress.ip_network(line, strict=False)
+            if net.version != 4:
+                continue
+            first = int(net.network_address) >> 8
+            last = int(net.broadcast_address) >> 8
+            arms.update(range(first, last + 1))
+    return sorted(arms)
+
+
+def update_arm_stats(stats: ArmStats, records: Iterable[tuple[str, float]],
+                     top_k: int = DEFAULT_TOP_K, decay: float = DEFAULT_DECAY) -> None:
+    """
+    用一次运行的结果更新臂的统计
+
+    Args:
+        stats: 臂统计（原地更新）
+        records: (ip, 平均延迟) 序列，只包含实际测到的 IP
+        top_k: 进入前 top_k 名视为成功
+        decay: 更新前对已有统计乘以的衰减系数
+    """
+    best: dict[int, float] = {}
+    for ip, latency in records:
+        if ":" in ip:
+            continue
+        arm = arm_of(ip)
+        if latency < best.get(arm, float("inf")):
+            best[arm] = latency
+    if not best:
+        return
+
+    latencies = sorted(best.values())
+    cutoff = latencies[min(top_k, len(latencies)) - 1]
+
+    for counts in stats.values():
+        counts[0] *= decay
+        counts[1] *= decay
+    for arm, latency in best.items():
+        counts = stats.setdefault(arm, [0.0, 0.0])
+        if latency <= cutoff:
+            counts[0] += 1
+        else:
+            counts[1] += 1
+
+
+def choose_arms(arms: list[int], stats: ArmStats, budget: int, rng: random.Random) -> list[int]:
+    """
+    Thompson 采样：每个臂从 Beta(1+成功, 1+失败) 抽一个样本，取样本最大的 budget 个臂
+    """
+    if budget >= len(arms):
+        return list(arms)
+    betavariate = rng.betavariate
+    get = stats.get
+    sampled = []
+    for arm in arms:
+        counts = get(arm)
+        theta = betavariate(1 + counts[0], 1 + counts[1]) if counts else rng.random()
+        sampled.append((theta, arm))
+    return [arm for _, arm in heapq.nlargest(budget, sampled)]
+
+
+def generate_candidates(arms: list[int], stats: ArmStats, budget: int, seed: int | None = None) -> list[str]:
+    """
+    生成预筛选的候选 IP 列表：被选中的每个 /24 随机取一个地址
+
+    Args:
+        arms: 全部臂（/24 键）
+        stats: 臂统计
+        budget: 测速预算（候选 IP 数量）
+        seed: 随机种子
+
+    Returns:
+        候选 IP 列表
+    """
+    rng = random.Random(seed)
+    return [str(ipaddress.IPv4Address((arm << 8) | rng.randrange(256)))
+            for arm in choose_arms(arms, stats, budget, rng)]
+
+
+def stats_from_history(conn: sqlite3.Connection, top_k: int = DEFAULT_TOP_K, decay: float = DEFAULT_DECAY,
+                       max_runs: int = DEFAULT_MAX_RUNS) -> ArmStats:
+    """从历史库（见 history.py）中最近 max_runs 次运行重建臂统计"""
+    run_ids = [row[0] for row in conn.execute("SELECT id FROM runs ORDER BY id DESC LIMIT ?", (max_runs,))]
+    stats: ArmStats = {}
+    for run_id in reversed(run_ids):
+        cur = conn.execute("SELECT ip, latency FROM probes WHERE run_id = ?", (run_id,))
+        update_arm_stats(stats, cur, top_k, decay)
+    return stats
+
+
+def _result_rows(rows: Iterable[list[str]]) -> Iterable[tuple[str, float]]:
+    """从 result.csv 的数据行读取 (ip, 平均延迟)"""
+    for row in rows:
+        try:
+            yield row[0].strip(), float(row[4])
+        except (ValueError, IndexError):
+            continue
+
+
+def _read_runs_from_csv(paths: list[Path]) -> list[dict[int, float]]:
+    runs = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            runs.append(_best_per_arm(_result_rows(reader)))
+    return runs
+
+
+def _read_runs_from_archive(path: Path, last: int) -> list[dict[int, float]]:
+    """按时间顺序读取归档（见 result_archive.py）中最近 last 次运行"""
+    from result_archive import ResultArchive
+
+    archive = ResultArchive(path)
+    return [_best_per_arm(_result_rows(archive.read(run)[1])) for run in archive.runs()[-last:]]
+
+
+def _best_per_arm(rows: Iterable[tuple[str, float]]) -> dict[int, float]:
+    best: dict[int, float] = {}
+    for ip, latency in rows:
+        if not ip or ":" in ip:
+            continue
+        arm = arm_of(ip)
+        if latency < best.get(arm, float("inf")):
+            best[arm] = latency
+    return best
+
+
+def simulate(runs: list[dict[int, float]], budgets: list[int], top_k: int = DEFAULT_TOP_K,
+             decay: float = DEFAULT_DECAY, warmup: int = 1, seed: int = 0, holdout: int = 0) -> list[dict]:
+    """
+    用历史运行离线回放，比较 Thompson 采样与随机采样在相同预算下的前 K 名质量
+
+    每次历史运行视为当次的“真实”结果：测某个 /24 得到该运行中它的延迟，
+    历史中没有该 /24 的记录则视为测速失败。与之前某次运行完全相同的运行（同一份文件传了两次、
+    未更新的提交）不参与评估，否则等于用学过的数据打分。
+
+    Args:
+        runs: 每次运行的 {/24 键: 延迟}，按时间顺序
+        budgets: 要评估的测速预算
+        top_k: 前 K 名
+        decay: 统计衰减系数
+        warmup: 前 warmup 次运行只用于学习（全量测速），不计入指标
+        seed: 随机种子
+        holdout: 大于 0 时只用最后 holdout 次运行评估，统计只从之前的运行学习，评估期间不再更新
+                 （覆盖 warmup）
+
+    Returns:
+        每个预算、每种策略一行：评估的运行数、平均召回率、平均延迟比（选出的前 K 名 / 真实前 K 名）、
+        节省的测速比例
+    """
+    if holdout > 0:
+        warmup = max(len(runs) - holdout, 0)
+    arms = sorted({arm for run in runs for arm in run})
+    duplicate = [any(run == prev for prev in runs[:i]) for i, run in enumerate(runs)]
+    report = []
+    for budget in budgets:
+        for strategy in ("thompson", "random"):
+            rng = random.Random(seed)
+            stats: ArmStats = {}
+            recalls = []
+            ratios = []
+            for i, run in enumerate(runs):
+                if i < warmup:
+                    update_arm_stats(stats, _as_records(run), top_k, decay)
+                    continue
+                if duplicate[i]:
+                    continue
+                if strategy == "thompson":
+                    chosen = choose_arms(arms, stats, budget, rng)
+                else:
+                    chosen = rng.sample(arms, min(budget, len(arms)))
+                observed = {arm: run[arm] for arm in chosen if arm in run}
+                if not holdout:
+                    update_arm_stats(stats, _as_records(observed), top_k, decay)
+
+                truth = heapq.nsmallest(top_k, run.items(), key=lambda kv: kv[1])
+                found = heapq.nsmallest(top_k, observed.items(), key=lambda kv: kv[1])
+                if not truth or not found:
+                    continue
+                recalls.append(len({a for a, _ in truth} & {a for a, _ in found}) / len(truth))
+                ratios.append((sum(l for _, l in found) / len(found)) / (sum(l for _, l in truth) / len(truth)))
+            report.append({
+                "strategy": strategy,
+                "budget": budget,
+                "arms": len(arms),
+                "runs": len(recalls),
+                "skipped_duplicates": sum(duplicate[warmup:]),
+                "recall": round(sum(recalls) / len(recalls), 4) if recalls else None,
+                "latency_ratio": round(sum(ratios) / len(ratios), 4) if ratios else None,
+                "probes_saved": round(1 - min(budget, len(arms)) / len(arms), 4) if arms else 0.0,
+            })
+    return report
+
+
+def _as_records(run: dict[int, float]) -> list[tuple[str, float]]:
+    return [(str(ipaddress.IPv4Address(arm << 8)), latency) for arm, latency in run.items()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Bandit-driven candidate sampling for ip.txt")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="write a candidate list from the history database")
+    gen.add_argument("--ip-txt", type=Path, default=Path("ip.txt"))
+    gen.add_argument("--history-db", type=Path, required=True)
+    gen.add_argument("--budget", type=int, required=True)
+    gen.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    gen.add_argument("--seed", type=int, default=None)
+    gen.add_argument("-o", "--output", type=Path, default=Path("candidates.txt"))
+
+    sim = sub.add_parser("simulate", help="replay historical result.csv files")
+    src = sim.add_mutually_exclusive_group(required=True)
+    src.add_argument("--csv", type=Path, nargs="+")
+    src.add_argument("--archive", type=Path, help="results.archive written by run_speedtest.py")
+    sim.add_argument("--last", type=int, default=DEFAULT_MAX_RUNS, help="number of archived runs to replay")
+    sim.add_argument("--budgets", type=int, nargs="+", default=[250, 500, 1000, 2000])
+    sim.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    sim.add_argument("--decay", type=float, default=DEFAULT_DECAY)
+    sim.add_argument("--seed", type=int, default=0)
+    sim.add_argument("--holdout", type=int, default=0,
+                     help="evaluate only on the last N runs, learning from the earlier ones")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        from history import open_history
+
+        conn = open_history(args.history_db)
+        try:
+            stats = stats_from_history(conn, args.top_k)
+        finally:
+            conn.close()
+        candidates = generate_candidates(load_arms(args.ip_txt), stats, args.budget, args.seed)
+        args.output.write_text("\n".join(candidates) + ("\n" if candidates else ""), encoding="utf-8")
+        print(f"Wrote {len(candidates)} candidates to {args.output}")
+        return 0
+
+    runs = _read_runs_from_csv(args.csv) if args.csv else _read_runs_from_archive(args.archive, args.last)
+    for row in simulate(runs, args.budgets, args.top_k, args.decay, seed=args.seed, holdout=args.holdout):
+        print(json.dumps(row))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
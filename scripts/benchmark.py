@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+选优与分析热点路径的基准测试
+
+生成 cfst 格式的合成 result.csv（地区分布和延迟分布取自真实测速结果），
+对 CSV 解析、地区分类、parse_top_ips_by_region 以及分析脚本计时，
+并用 tracemalloc 记录峰值内存。结果写成 JSON，可以与基线比较，
+发现回退时以非零状态退出。
+
+用法：
+    python scripts/benchmark.py --sizes 10K 100K 1M -o bench.json
+    python scripts/benchmark.py --baseline benchmark_baseline.json
+    python scripts/benchmark.py --sizes 10M --repeat 1 --cases select
+"""
+
+import os
+import io
+import gc
+import csv
+import sys
+import json
+import math
+import time
+import bisect
+import random
+import runpy
+import statistics
+import argparse
+import platform
+import contextlib
+import ipaddress
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterator
+
+from region_index import REPO_ROOT, DEFAULT_REGION, classify_ips, get_default_index, read_cidr_file
+from run_speedtest import iter_result_rows, parse_top_ips_by_region
+from tcp_probe import RESULT_HEADER
+
+PRIORITY_REGIONS = ["US", "GB", "IN", "JP", "KR", "SG", "HK"]
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# 合成数据的地区分布（参考每日 result.csv：绝大多数是 US，其余地区零星出现）
+REGION_MIX = {
+    "US": 0.90,
+    "GB": 0.025,
+    "HK": 0.02,
+    "JP": 0.01,
+    "SG": 0.01,
+    "KR": 0.01,
+    "IN": 0.01,
+    DEFAULT_REGION: 0.015,
+}
+
+# 延迟分布的分位点 (分位, 毫秒)，同样取自真实测速结果
+LATENCY_QUANTILES = [
+    (0.00, 5.40), (0.01, 5.54), (0.05, 5.63), (0.10, 5.68), (0.25, 5.76),
+    (0.50, 5.88), (0.75, 6.03), (0.90, 6.32), (0.95, 7.40), (0.99, 28.2), (1.00, 260.0),
+]
+
+# 各丢包率所占比例；cfst 先按丢包率、再按延迟排序
+LOSS_MIX = [(0.00, 0.97), (0.25, 0.02), (0.50, 0.01)]
+
+# 与基线比较时允许的最大倍数
+DEFAULT_MAX_SLOWDOWN = 1.5
+DEFAULT_MAX_MEMORY_GROWTH = 1.25
+# 基线耗时低于该值（秒）的用例不参与耗时比较：计时噪声与用例本身同一量级
+DEFAULT_MIN_GATE_SECONDS = 0.1
+
+
+def _region_networks(ip_txt: Path) -> dict[str, list[ipaddress.IPv4Network]]:
+    """按地区对 ip.txt 中的 IPv4 网段分组"""
+    index = get_default_index()
+    nets = [ipaddress.ip_network(c, strict=False) for c, _ in read_cidr_file(ip_txt)]
+    nets = [n for n in nets if n.version == 4]
+    out: dict[str, list[ipaddress.IPv4Network]] = {}
+    for net, region in zip(nets, index.classify_many(str(n.network_address) for n in nets)):
+        out.setdefault(region, []).append(net)
+    return out
+
+
+def _sorted_uniforms(n: int, rng: random.Random) -> Iterator[float]:
+    """按升序逐个产出 n 个 [0, 1) 均匀分布的顺序统计量，内存 O(1)"""
+    u = 1.0
+    for k in range(n, 0, -1):
+        u *= rng.random() ** (1.0 / k)
+        yield 1.0 - u
+
+
+def _latency_at(q: float) -> float:
+    qs = [p for p, _ in LATENCY_QUANTILES]
+    i = min(max(bisect.bisect_right(qs, q), 1), len(qs) - 1)
+    (q0, v0), (q1, v1) = LATENCY_QUANTILES[i - 1], LATENCY_QUANTILES[i]
+    return v0 + (v1 - v0) * (q - q0) / (q1 - q0)
+
+
+def iter_synthetic_rows(rows: int, seed: int = 0, ip_txt: Path = REPO_ROOT / "ip.txt") -> Iterator[list]:
+    """
+    产出 cfst 格式的合成结果行，已按 (丢包率, 平均延迟) 排序
+
+    Args:
+        rows: 行数
+        seed: 随机种子
+        ip_txt: 用于抽样 IP 的网段文件
+    """
+    rng = random.Random(seed)
+    by_region = _region_networks(ip_txt)
+    regions = [r for r in REGION_MIX if by_region.get(r)]
+    cum_weights = []
+    total = 0.0
+    for region in regions:
+        total += REGION_MIX[region]
+        cum_weights.append(total)
+
+    remaining = rows
+    for i, (loss, share) in enumerate(LOSS_MIX):
+        block = remaining if i == len(LOSS_MIX) - 1 else min(remaining, round(rows * share))
+        remaining -= block
+        received = 4 - round(loss * 4)
+        for q in _sorted_uniforms(block, rng):
+            region = rng.choices(regions, cum_weights=cum_weights)[0]
+            net = rng.choice(by_region[region])
+            ip = net.network_address + rng.randrange(net.num_addresses)
+            yield [str(ip), 4, received, f"{loss:.2f}", f"{_latency_at(q):.2f}", "0.00", "N/A"]
+
+
+def generate_csv(path: Path, rows: int, seed: int = 0) -> Path:
+    """生成合成 result.csv（已存在则直接复用）"""
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_HEADER)
+        writer.writerows(iter_synthetic_rows(rows, seed))
+    os.replace(tmp, path)
+    return path
+
+
+def _run_script(script: Path, cwd: Path) -> None:
+    """在 cwd 下执行分析脚本，丢弃其输出"""
+    old_cwd, old_argv = Path.cwd(), sys.argv
+    os.chdir(cwd)
+    sys.argv = [str(script)]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(str(script), run_name="__main__")
+    except SystemExit as e:
+        if e.code:
+            raise
+    finally:
+        os.chdir(old_cwd)
+        sys.argv = old_argv
+
+
+def build_cases(csv_path: Path) -> dict[str, Callable[[], object]]:
+    """
+    构造各基准用例
+
+    用例在 csv_path 所在目录中运行分析脚本（脚本从当前目录读取 result.csv / best_ip.txt）。
+    """
+    work = csv_path.parent
+    result_csv = work / "result.csv"
+    if result_csv.exists() or result_csv.is_symlink():
+        result_csv.unlink()
+    try:
+        result_csv.symlink_to(csv_path.name)
+    except OSError:
+        result_csv.write_bytes(csv_path.read_bytes())
+
+    best = parse_top_ips_by_region(csv_path, PRIORITY_REGIONS, 10, 100)
+    (work / "best_ip.txt").write_text("\n".join(best) + "\n", encoding="utf-8")
+    ips = [ip for ip, _ in iter_result_rows(csv_path)]
+
+    return {
+        "csv_parse": lambda: sum(1 for _ in iter_result_rows(csv_path)),
+        "classify": lambda: classify_ips(ips),
+        "select": lambda: parse_top_ips_by_region(csv_path, PRIORITY_REGIONS, 10, 100),
+        "analyze_csv": lambda: _run_script(REPO_ROOT / "analyze_csv.py", work),
+        "find_regions": lambda: _run_script(REPO_ROOT / "find_regions.py", work),
+    }
+
+
+def _calibrate(repeat: int = 3) -> list[float]:
+    """
+    固定的纯 Python 负载，用来消除机器快慢对比较的影响
+
+    每轮约 0.2 秒，返回 repeat 轮各自的耗时。run_benchmarks 在每个数据规模前后都校准几轮，
+    取全部轮次的中位数：共享的 CI 机器速度在一次运行中会漂移，只在开头或结尾校准一次，
+    同一台机器上前后两次的结果能相差 30%，并原样放大到所有用例的比较结果上。
+    """
+    rng = random.Random(0)
+    data = [f"{rng.random() * 100:.2f}" for _ in range(500_000)]
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        sorted(float(x) for x in data)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def measure(fn: Callable[[], object], repeat: int, memory: bool) -> dict:
+    """
+    对一个用例计时（取 repeat 次中的最小值），并可选地单独跑一遍测峰值内存
+    """
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    out = {"seconds": round(best, 6)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            out["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return out
+
+
+def run_benchmarks(sizes: list[int], cases: list[str] | None = None, repeat: int = 3,
+                   memory: bool = True, data_dir: Path | None = None, seed: int = 0) -> dict:
+    """
+    运行基准测试
+
+    Args:
+        sizes: 合成 CSV 的行数列表
+        cases: 要运行的用例名，None 表示全部
+        repeat: 每个用例计时的次数
+        memory: 是否测峰值内存
+        data_dir: 合成数据目录（可复用），默认 .tmp_cfst/bench
+        seed: 随机种子
+
+    Returns:
+        {"meta": {...}, "results": [{"case", "rows", "seconds", "peak_bytes"}, ...]}
+    """
+    data_dir = data_dir or REPO_ROOT / ".tmp_cfst" / "bench"
+    results = []
+    calibration = []
+    for rows in sizes:
+        work = data_dir / f"rows_{rows}_seed_{seed}"
+        csv_path = generate_csv(work / "synthetic.csv", rows, seed)
+        available = build_cases(csv_path)
+        calibration += _calibrate()
+        for name in cases or available:
+            stats = measure(available[name], repeat, memory)
+            results.append({"case": name, "rows": rows, **stats})
+            print(json.dumps(results[-1]), file=sys.stderr)
+    calibration += _calibrate()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "calibration_s": round(statistics.median(calibration), 6),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_slowdown: float = DEFAULT_MAX_SLOWDOWN,
+            max_memory_growth: float = DEFAULT_MAX_MEMORY_GROWTH,
+            min_seconds: float = DEFAULT_MIN_GATE_SECONDS) -> list[str]:
+    """
+    与基线比较，返回回退描述列表（为空表示没有回退）
+
+    耗时先除以各自的校准时间再比较，使不同机器上的结果可比；基线耗时不足 min_seconds 的用例
+    只比较内存。内存直接比较。
+    """
+    scale = current["meta"]["calibration_s"] / baseline["meta"]["calibration_s"]
+    base = {(r["case"], r["rows"]): r for r in baseline["results"]}
+    problems = []
+    for r in current["results"]:
+        ref = base.get((r["case"], r["rows"]))
+        if ref is None:
+            continue
+        ratio = r["seconds"] / (ref["seconds"] * scale)
+        if ref["seconds"] >= min_seconds and ratio > max_slowdown:
+            problems.append(f"{r['case']}@{r['rows']}: {ratio:.2f}x slower than baseline")
+        if "peak_bytes" in r and ref.get("peak_bytes"):
+            growth = r["peak_bytes"] / ref["peak_bytes"]
+            if growth > max_memory_growth:
+                problems.append(f"{r['case']}@{r['rows']}: peak memory {growth:.2f}x baseline")
+    return problems
+
+
+def _parse_size(text: str) -> int:
+    units = {"K": 1_000, "M": 1_000_000}
+    suffix = text[-1:].upper()
+    if suffix in units:
+        return int(float(text[:-1]) * units[suffix])
+    return int(text)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks for the selection and analysis hot paths")
+    parser.add_argument("--sizes", type=_parse_size, nargs="+", default=DEFAULT_SIZES,
+                        help="row counts, e.g. 10K 100K 1M 10M")
+    parser.add_argument("--cases", nargs="+", default=None,
+                        choices=["csv_parse", "classify", "select", "analyze_csv", "find_regions"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--data-dir", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", type=Path, default=None, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, default=None, help="compare against a baseline JSON")
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_MAX_SLOWDOWN)
+    parser.add_argument("--max-memory-growth", type=float, default=DEFAULT_MAX_MEMORY_GROWTH)
+    parser.add_argument("--min-gate-seconds", type=float, default=DEFAULT_MIN_GATE_SECONDS,
+                        help="do not gate timings of cases faster than this in the baseline")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes, args.cases, args.repeat, not args.no_memory, args.data_dir, args.seed)
+    text = json.dumps(current, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        problems = compare(current, baseline, args.max_slowdown, args.max_memory_growth,
+                           args.min_gate_seconds)
+        for p in problems:
+            print(f"REGRESSION {p}", file=sys.stderr)
+        if problems:
+            return 1
+        print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
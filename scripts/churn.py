@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+best_ip.txt 的逐次变化（churn）分析
+
+比较两次或多次测速选出的 IP 集合，报告：
+- 集合重合度（Jaccard）以及新进 / 移出的数量
+- 两次都在的 IP 的排名位移
+- 各地区的进出情况
+- 两次都在的 IP 的延迟变化
+
+每次运行建成 ip→排名 / ip→延迟 的字典，比较时用集合运算做连接，不做列表扫描，
+因此可以一次比较数百个历史版本。读取 git 历史时用一个 `git cat-file --batch`
+进程取出所有版本的 best_ip.txt；延迟取自 results.archive 中该提交之前的最后一次运行，
+归档之前的旧提交退回读取同一版本的 result.csv。
+
+用法：
+    python scripts/churn.py --git-revs 60
+    python scripts/churn.py --runs runs/2024-05-01 runs/2024-05-02 --against first
+"""
+
+import io
+import csv
+import json
+import argparse
+import statistics
+import subprocess
+import bisect
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from region_index import classify_ips
+from result_archive import ResultArchive
+
+
+class Run(NamedTuple):
+    label: str
+    rank: dict[str, int]
+    latency: dict[str, float]
+
+
+def make_run(label: str, ips: Iterable[str], result_rows: Iterable[list[str]] | None = None) -> Run:
+    """
+    由选出的 IP 列表（及可选的 result.csv 行）构造一次运行
+
+    Args:
+        label: 运行的名字（提交 SHA、目录名等）
+        ips: best_ip.txt 中的 IP，按文件顺序
+        result_rows: result.csv 的数据行，用于取延迟；只保留选出的 IP
+    """
+    rank: dict[str, int] = {}
+    for ip in ips:
+        ip = ip.strip()
+        if ip and ip not in rank:
+            rank[ip] = len(rank)
+    latency: dict[str, float] = {}
+    if result_rows is not None:
+        for row in result_rows:
+            if not row:
+                continue
+            ip = row[0].strip()
+            if ip in rank and ip not in latency:
+                try:
+                    latency[ip] = float(row[4])
+                except (ValueError, IndexError):
+                    continue
+    return Run(label, rank, latency)
+
+
+def _csv_rows(text: str) -> Iterable[list[str]]:
+    reader = csv.reader(io.StringIO(text))
+    next(reader, None)
+    return reader
+
+
+def read_runs_from_dirs(paths: list[Path]) -> list[Run]:
+    """
+    读取本地保存的运行结果
+
+    每个路径可以是 best_ip.txt 文件，也可以是包含 best_ip.txt（和可选 result.csv）的目录。
+    """
+    runs = []
+    for path in paths:
+        best = path / "best_ip.txt" if path.is_dir() else path
+        result = best.with_name("result.csv")
+        rows = _csv_rows(result.read_text(encoding="utf-8")) if result.exists() else None
+        runs.append(make_run(str(path), best.read_text(encoding="utf-8").splitlines(), rows))
+    return runs
+
+
+def _cat_files(repo: Path, objects: list[str]) -> list[str | None]:
+    """用一个 git cat-file --batch 进程读取多个 <rev>:<path> 对象，不存在的返回 None"""
+    proc = subprocess.run(["git", "cat-file", "--batch"], cwd=repo, check=True, capture_output=True,
+                          input="".join(obj + "\n" for obj in objects).encode())
+    out: list[str | None] = []
+    data = proc.stdout
+    pos = 0
+    for _ in objects:
+        end = data.index(b"\n", pos)
+        header = data[pos:end].split()
+        pos = end + 1
+        if len(header) < 3 or header[-1] == b"missing":
+            out.append(None)
+            continue
+        size = int(header[2])
+        out.append(data[pos:pos + size].decode("utf-8", errors="replace"))
+        pos += size + 1
+    return out
+
+
+def read_runs_from_git(repo: Path, revs: int, path: str = "best_ip.txt", archive: str = "results.archive",
+                       csv_path: str = "result.csv") -> list[Run]:
+    """
+    按时间顺序读取 git 历史中最近 revs 次测速提交（修改过 best_ip.txt 或旧版 result.csv 的版本）
+
+    每次提交的延迟取自工作区归档中提交时间之前的最后一次运行；归档中没有更早的运行时
+    （归档建立之前的提交），读取同一版本中的 result.csv。
+
+    Args:
+        repo: 仓库路径
+        revs: 最多读取的版本数
+        path: best_ip.txt 在仓库中的路径
+        archive: results.archive 在仓库中的路径
+        csv_path: 旧版本中 result.csv 的路径
+    """
+    log = subprocess.run(["git", "log", f"-n{revs}", "--format=%H %ct %cI", "--", path, csv_path],
+                         cwd=repo, check=True, capture_output=True, text=True).stdout.split("\n")
+    commits = [line.split() for line in reversed(log) if line.strip()]
+    archived = ResultArchive(Path(repo) / archive)
+    runs_by_time = sorted(archived.runs(), key=lambda run: run.timestamp)
+    times = [run.timestamp for run in runs_by_time]
+
+    objects = []
+    matched = []
+    for sha, ctime, _ in commits:
+        i = bisect.bisect_right(times, float(ctime))
+        matched.append(runs_by_time[i - 1] if i else None)
+        objects.append(f"{sha}:{path}")
+        if not i:
+            objects.append(f"{sha}:{csv_path}")
+    blobs = iter(_cat_files(repo, objects))
+
+    runs = []
+    for (sha, _, date), run in zip(commits, matched):
+        best = next(blobs)
+        if run is not None:
+            rows = archived.read(run)[1]
+        else:
+            result = next(blobs)
+            rows = _csv_rows(result) if result is not None else None
+        if best is None:
+            continue
+        runs.append(make_run(f"{sha[:10]} {date}", best.splitlines(), rows))
+    return runs
+
+
+def _summary(values: list[float]) -> dict:
+    if not values:
+        return {"mean": None, "median": None, "max": None}
+    return {
+        "mean": round(statistics.fmean(values), 3),
+        "median": round(statistics.median(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def top_set_change(old_ips: Iterable[str], new_ips: Iterable[str]) -> float:
+    """
+    两次选出的 IP 集合的变化比例（0~1）
+
+    取 新进、移出 两者中较多的数量，除以较大集合的大小；两个集合都为空时为 0，
+    只有一边为空时为 1。顺序变化不计入。
+    """
+    old, new = {ip.strip() for ip in old_ips} - {""}, {ip.strip() for ip in new_ips} - {""}
+    size = max(len(old), len(new))
+    return max(len(new - old), len(old - new)) / size if size else 0.0
+
+
+def diff_runs(old: Run, new: Run, regions: dict[str, str] | None = None) -> dict:
+    """
+    比较两次运行
+
+    Args:
+        old: 较早的运行
+        new: 较新的运行
+        regions: ip→地区码 的缓存；缺失的 IP 会被批量分类后写入
+
+    Returns:
+        差异报告字典
+    """
+    old_ips, new_ips = old.rank.keys(), new.rank.keys()
+    kept = old_ips & new_ips
+    entered = new_ips - old_ips
+    left = old_ips - new_ips
+    union = len(old_ips | new_ips)
+
+    if regions is None:
+        regions = {}
+    missing = [ip for ip in entered | left | kept if ip not in regions]
+    regions.update(zip(missing, classify_ips(missing)))
+
+    per_region: dict[str, dict[str, int]] = {}
+    for name, ips in (("kept", kept), ("entered", entered), ("left", left)):
+        for ip in ips:
+            counts = per_region.setdefault(regions[ip], {"kept": 0, "entered": 0, "left": 0})
+            counts[name] += 1
+
+    displacement = [abs(new.rank[ip] - old.rank[ip]) for ip in kept]
+    deltas = [new.latency[ip] - old.latency[ip] for ip in kept if ip in old.latency and ip in new.latency]
+
+    return {
+        "old": old.label,
+        "new": new.label,
+        "old_size": len(old_ips),
+        "new_size": len(new_ips),
+        "kept": len(kept),
+        "entered": len(entered),
+        "left": len(left),
+        "jaccard": round(len(kept) / union, 4) if union else 1.0,
+        "rank_displacement": _summary(displacement),
+        "latency_delta_ms": _summary(deltas),
+        "regions": dict(sorted(per_region.items())),
+    }
+
+
+def churn_report(runs: list[Run], against: str = "previous") -> dict:
+    """
+    比较一组按时间排序的运行
+
+    Args:
+        runs: 运行列表（从旧到新）
+        against: previous 表示每次与上一次比较，first 表示每次与第一次比较
+
+    Returns:
+        {"pairs": [...], "summary": {...}}
+    """
+    regions: dict[str, str] = {}
+    pairs = []
+    for i in range(1, len(runs)):
+        base = runs[i - 1] if against == "previous" else runs[0]
+        pairs.append(diff_runs(base, runs[i], regions))
+
+    # 每个 IP 出现在多少次运行中
+    appearances: dict[str, int] = {}
+    for run in runs:
+        for ip in run.rank:
+            appearances[ip] = appearances.get(ip, 0) + 1
+    always = sum(1 for n in appearances.values() if n == len(runs)) if runs else 0
+
+    summary = {
+        "runs": len(runs),
+        "distinct_ips": len(appearances),
+        "in_every_run": always,
+        "jaccard": _summary([p["jaccard"] for p in pairs]),
+        "entered_per_run": _summary([p["entered"] for p in pairs]),
+        "median_rank_displacement": _summary([p["rank_displacement"]["median"] for p in pairs
+                                              if p["rank_displacement"]["median"] is not None]),
+    }
+    return {"pairs": pairs, "summary": summary}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare best_ip.txt across runs")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--git-revs", type=int, help="read the last N revisions of best_ip.txt from git")
+    src.add_argument("--runs", type=Path, nargs="+", help="best_ip.txt files or run directories, oldest first")
+    parser.add_argument("--repo", type=Path, default=Path("."))
+    parser.add_argument("--against", choices=["previous", "first"], default="previous")
+    parser.add_argument("--summary-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    runs = read_runs_from_git(args.repo, args.git_revs) if args.git_revs else read_runs_from_dirs(args.runs)
+    if len(runs) < 2:
+        parser.error("need at least two runs to compare")
+
+    report = churn_report(runs, args.against)
+    if not args.summary_only:
+        for pair in report["pairs"]:
+            print(json.dumps(pair, ensure_ascii=False))
+    print(json.dumps({"summary": report["summary"]}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按可复现的伪随机顺序惰性遍历 ip.txt 中的网段
+
+把所有网段（去重合并后）看作一个连续的下标空间 [0, N)，用带种子的 Feistel 网络
+（配合 cycle walking）构造该空间上的双射，按置换后的顺序逐个给出地址：
+- 不展开网段，内存只与网段数量有关，与地址数量无关
+- 同一种子得到完全相同的顺序，且没有重复
+- 可以从任意偏移继续（断点续测），也可以按下标取模分片
+
+每块取 N 个（分层抽样，IPv4 按 /24、IPv6 按 /48 分块）时，下标空间为 每块的 N 个槽位，
+槽位再通过按块加盐的仿射变换映射到该块内互不相同的地址。IPv6 的 /32 有 2^96 个地址，
+置换只在下标上计算，不需要展开。IPv4 与 IPv6 各自构成独立的下标空间。
+
+用法：
+    python scripts/cidr_walk.py ip.txt --per-block 1 --seed 42 --limit 5000 > candidates.txt
+    python scripts/cidr_walk.py ip.txt --seed 42 --offset 5000 --limit 5000
+    python scripts/cidr_walk.py .tmp_cfst/bin/ipv6.txt --version 6 --limit 2000
+"""
+
+import socket
+import argparse
+import ipaddress
+from bisect import bisect_right
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+DEFAULT_ROUNDS = 4
+
+# 分层抽样的块大小（前缀长度）
+BLOCK_PREFIX = {4: 24, 6: 48}
+
+
+def _mix(x: int) -> int:
+    """splitmix64 的终结函数，用作 Feistel 轮函数和加盐哈希"""
+    x = (x + GOLDEN) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class FeistelPermutation:
+    """
+    [0, size) 上由种子决定的伪随机双射
+
+    在不小于 size 的 2^(2h) 空间上做平衡 Feistel 网络（本身是双射），
+    结果落在 [0, size) 之外时继续加密（cycle walking），直到落回范围内。
+    由于 2^(2h) < 4·size，平均不超过 4 次加密。
+    """
+
+    def __init__(self, size: int, seed: int = 0, rounds: int = DEFAULT_ROUNDS) -> None:
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        # 轮函数输出 64 位，半块最多 64 位（覆盖 128 位的 IPv6 下标空间）
+        bits += bits & 1
+        self._half = bits // 2
+        self._mask = (1 << self._half) - 1
+        self._keys = [_mix((seed & MASK64) ^ _mix(r)) for r in range(rounds)]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _encrypt(self, x: int) -> int:
+        half, mask = self._half, self._mask
+        left, right = x >> half, x & mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right ^ key) & mask)
+        return (left << half) | right
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        x = self._encrypt(index)
+        while x >= self.size:
+            x = self._encrypt(x)
+        return x
+
+
+class CidrSpace:
+    """
+    ip.txt / ipv6.txt 中同一地址族的网段构成的下标空间
+
+    下标数可能超过 sys.maxsize（IPv6），需要时请用 size 属性而不是 len()。
+
+    Args:
+        cidrs: CIDR 列表（其他地址族的网段会被忽略，重叠的网段会被合并）
+        per_block: 每块（IPv4 为 /24，IPv6 为 /48）取的地址数；None 表示全部地址
+        seed: 块内选取地址时的盐
+        version: 地址族，4 或 6
+    """
+
+    def __init__(self, cidrs: Iterable[str], per_block: int | None = None, seed: int = 0,
+                 version: int = 4) -> None:
+        nets = [ipaddress.ip_network(c, strict=False) for c in cidrs]
+        nets = list(ipaddress.collapse_addresses(n for n in nets if n.version == version))
+        self.version = version
+        self.per_block = per_block
+        self._family = socket.AF_INET if version == 4 else socket.AF_INET6
+        self._width = 4 if version == 4 else 16
+        self._salt = _mix(seed & MASK64)
+        max_block = 1 << (8 * self._width - BLOCK_PREFIX[version])
+        # 每个网段：起始地址、块大小（一个分层块或更小网段本身）、每块的槽位数、起始下标
+        self._bases: list[int] = []
+        self._block_sizes: list[int] = []
+        self._slots: list[int] = []
+        self._starts: list[int] = []
+        total = 0
+        for net in nets:
+            size = net.num_addresses
+            block_size = min(max_block, size)
+            slots = block_size if per_block is None else min(per_block, block_size)
+            if slots <= 0:
+                continue
+            self._bases.append(int(net.network_address))
+            self._block_sizes.append(block_size)
+            self._slots.append(slots)
+            self._starts.append(total)
+            total += size // block_size * slots
+        self.size = total
+
+    def __len__(self) -> int:
+        return self.size
+
+    def address_at(self, index: int) -> int:
+        """下标对应的地址（整数）"""
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        i = bisect_right(self._starts, index) - 1
+        local = index - self._starts[i]
+        block_size, slots = self._block_sizes[i], self._slots[i]
+        block, slot = divmod(local, slots)
+        block_base = self._bases[i] + block * block_size
+        if slots < block_size:
+            # 块大小为 2 的幂，奇数乘数的仿射变换在块内是双射，不同槽位得到不同地址；
+            # 乘数和偏移拼成 128 位，使 IPv6 块内的地址分散在整个主机部分
+            h = _mix(_mix(block_base >> 64) ^ (block_base & MASK64) ^ self._salt)
+            g = _mix(h)
+            mask = block_size - 1
+            slot = (((g << 64 | h) | 1) * slot + (h << 64 | g)) & mask
+        return block_base + slot
+
+    def format(self, value: int) -> str:
+        """整数地址转为字符串"""
+        return socket.inet_ntop(self._family, value.to_bytes(self._width, "big"))
+
+
+def walk(space: CidrSpace, seed: int = 0, offset: int = 0, limit: int | None = None,
+         shard: int = 0, shards: int = 1) -> Iterator[str]:
+    """
+    按置换顺序遍历下标空间
+
+    Args:
+        space: 下标空间
+        seed: 置换种子
+        offset: 从置换后的第几个位置开始（断点续测）
+        limit: 最多给出的地址数
+        shard, shards: 只给出位置 ≡ shard (mod shards) 的地址
+
+    Returns:
+        地址字符串的迭代器
+    """
+    perm = FeistelPermutation(space.size, seed)
+    start = offset + (shard - offset) % shards
+    positions = range(start, space.size, shards)
+    if limit is not None:
+        positions = islice(positions, limit)
+    for pos in positions:
+        yield space.format(space.address_at(perm[pos]))
+
+
+def read_cidrs(ip_txt: Path) -> list[str]:
+    """读取 ip.txt 中的网段（忽略空行和注释）"""
+    cidrs = []
+    with open(ip_txt, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                cidrs.append(line)
+    return cidrs
+
+
+def walk_candidates(ip_txt: Path, per_block: int | None = 1, seed: int = 0, offset: int = 0,
+                    limit: int | None = None, shard: int = 0, shards: int = 1,
+                    limit_v6: int | None = None) -> Iterator[str]:
+    """
+    从网段文件按可复现的伪随机顺序生成候选 IP（每个 /24 或 /48 取 per_block 个）
+
+    文件中的 IPv4 与 IPv6 网段各自遍历：先给出 IPv4 候选（最多 limit 个），
+    再给出 IPv6 候选（最多 limit_v6 个）。其余参数含义同 walk；per_block 为 None 时遍历全部地址。
+    """
+    cidrs = read_cidrs(ip_txt)
+    for version, family_limit in ((4, limit), (6, limit_v6)):
+        space = CidrSpace(cidrs, per_block, seed, version)
+        yield from walk(space, seed, offset, family_limit, shard, shards)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Walk the ranges in ip.txt in a reproducible random order")
+    parser.add_argument("ip_txt", type=Path)
+    parser.add_argument("--per-block", type=int, default=1,
+                        help="addresses per /24 (IPv4) or /48 (IPv6); 0 = every address")
+    parser.add_argument("--version", type=int, choices=[4, 6], default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--offset", type=int, default=0, help="skip this many positions (resume)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--count", action="store_true", help="only print the size of the space")
+    args = parser.parse_args(argv)
+
+    space = CidrSpace(read_cidrs(args.ip_txt), args.per_block or None, args.seed, args.version)
+    if args.count:
+        print(space.size)
+        return 0
+    for ip in walk(space, args.seed, args.offset, args.limit, args.shard, args.shards):
+        print(ip)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
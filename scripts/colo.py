@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+通过 /cdn-cgi/trace 实测 IP 落在哪个数据中心（colo）
+
+region_index 只能按网段推断地区，而 173.245.x、188.114.x 这类任播网段实际落在哪个数据中心
+取决于测速所在的网络。这里直接向 IP 请求 /cdn-cgi/trace（Host/SNI 取自 trace 地址），
+解析响应中的 colo=（数据中心的 IATA 代码）和 loc=（客户端所在国家），按 COLO_COUNTRY
+把数据中心换算成地区码。
+
+同一 /24（IPv6 为 /48）内的 IP 落在同一个数据中心，结果按前缀缓存（JSON 文件，带 TTL）：
+每个前缀在 TTL 内只请求一次，且只请求该前缀中延迟最低的 IP。解析出的 前缀→地区码 通过
+region_index.set_resolved_regions 交给地区索引，之后的选择（parse_top_ips_by_region 等）直接使用。
+
+用法：
+    python scripts/colo.py result.csv --top 200 --cache .history/colo_cache.json
+"""
+
+import os
+import ssl
+import csv
+import json
+import time
+import heapq
+import asyncio
+import argparse
+import ipaddress
+import tempfile
+from pathlib import Path
+from typing import Iterable, NamedTuple
+from urllib.parse import urlsplit
+
+DEFAULT_TRACE_URL = "https://cloudflare.com/cdn-cgi/trace"
+DEFAULT_TTL = 86400.0
+DEFAULT_CONCURRENCY = 32
+
+COLO_COLUMN = "数据中心"
+
+# 数据中心 IATA 代码 → 地区码（ISO 3166-1 alpha-2）；不在表中的数据中心不改变 region_index 的结果
+_COLOS_BY_COUNTRY = {
+    "US": "ABQ ANC ATL BGR BNA BOS BUF CLT CMH DEN DFW DTW EWR HNL IAD IAH IND JAX LAS LAX MCI MEM MFE "
+          "MIA MSP OKC OMA ORD ORF PDX PHL PHX PIT RDU RIC SAN SAT SEA SJC SLC SMF STL TLH TPA",
+    "CA": "YHZ YOW YUL YVR YWG YXE YYC YYZ",
+    "GB": "EDI LHR MAN",
+    "IN": "AMD BBI BLR BOM CCU COK DEL HYD IXC KNU MAA NAG PAT",
+    "JP": "FUK KIX NRT OKA",
+    "KR": "ICN",
+    "SG": "SIN",
+    "HK": "HKG",
+    "TW": "KHH TPE",
+    "DE": "DUS FRA HAM MUC STR TXL",
+    "FR": "CDG MRS",
+    "NL": "AMS", "BE": "BRU", "IE": "DUB ORK", "ES": "BCN MAD", "PT": "LIS", "IT": "FCO MXP PMO",
+    "CH": "GVA ZRH", "AT": "VIE", "CZ": "PRG", "PL": "WAW", "SE": "ARN GOT", "NO": "OSL", "DK": "CPH",
+    "FI": "HEL", "RU": "DME KJA LED SVX", "UA": "KBP", "RO": "OTP", "HU": "BUD", "GR": "ATH", "BG": "SOF",
+    "TR": "ADB IST", "IL": "TLV", "AE": "DXB", "SA": "JED RUH", "EG": "CAI",
+    "ZA": "CPT DUR JNB", "KE": "NBO", "NG": "LOS",
+    "AU": "ADL BNE CBR MEL PER SYD", "NZ": "AKL CHC",
+    "BR": "BSB CWB FOR GIG GRU POA", "AR": "EZE", "CL": "SCL", "MX": "MEX QRO",
+    "TH": "BKK", "VN": "HAN SGN", "MY": "JHB KUL", "ID": "CGK", "PH": "MNL",
+}
+COLO_COUNTRY = {colo: cc for cc, colos in _COLOS_BY_COUNTRY.items() for colo in colos.split()}
+
+
+class Trace(NamedTuple):
+    colo: str
+    loc: str
+    region: str | None  # 由 colo 换算；数据中心不在 COLO_COUNTRY 中时为 None
+
+
+def parse_trace(text: str) -> dict[str, str]:
+    """解析 /cdn-cgi/trace 的 key=value 行"""
+    fields = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def prefix_of(ip: str) -> str:
+    """IP 所在的 /24（IPv6 为 /48）"""
+    addr = ipaddress.ip_address(ip)
+    return str(ipaddress.ip_network(f"{addr}/{24 if addr.version == 4 else 48}", strict=False))
+
+
+class ColoCache:
+    """
+    按前缀缓存的 trace 结果（JSON 文件）
+
+    Args:
+        path: 缓存文件；不存在时从空缓存开始
+        ttl: 条目的有效期（秒），加载时丢弃过期条目
+        now: 当前时间（便于测试）
+    """
+
+    def __init__(self, path: Path | None, ttl: float = DEFAULT_TTL, now: float | None = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.now = time.time() if now is None else now
+        self.entries: dict[str, dict] = {}
+        if path is not None and Path(path).exists():
+            try:
+                data = json.loads(Path(path).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            self.entries = {prefix: entry for prefix, entry in data.items()
+                            if self.now - entry.get("at", 0) < ttl}
+
+    def get(self, prefix: str) -> Trace | None:
+        entry = self.entries.get(prefix)
+        if entry is None:
+            return None
+        return Trace(entry["colo"], entry.get("loc", ""), entry.get("region"))
+
+    def put(self, prefix: str, trace: Trace) -> None:
+        self.entries[prefix] = {"colo": trace.colo, "loc": trace.loc, "region": trace.region, "at": self.now}
+
+    def regions(self) -> dict[str, str]:
+        """前缀→地区码（只含能换算出地区的条目）"""
+        return {prefix: entry["region"] for prefix, entry in self.entries.items() if entry.get("region")}
+
+    def save(self) -> None:
+        """写入缓存文件（先写临时文件再原子替换）"""
+        if self.path is None:
+            return
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+async def fetch_trace(ip: str, url: str = DEFAULT_TRACE_URL, timeout: float = 5.0) -> Trace | None:
+    """
+    向 ip 请求 trace 地址
+
+    Returns:
+        解析结果；连接失败、非 200 或响应中没有 colo 时返回 None
+    """
+    parts = urlsplit(url)
+    use_ssl = parts.scheme == "https"
+    port = parts.port or (443 if use_ssl else 80)
+    path = parts.path or "/"
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(
+            ip, port,
+            ssl=ssl.create_default_context() if use_ssl else None,
+            server_hostname=parts.hostname if use_ssl else None,
+        ), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        # HTTP/1.0：响应不分块，读到连接关闭即可
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parts.netloc}\r\nUser-Agent: MyAutoScript/1.0\r\n\r\n"
+                     .encode("ascii"))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        # 等待连接真正关闭（TLS 需要完成关闭握手），避免留下未关闭的传输
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout)
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = head.split(b" ", 2)[1:2]
+    if status != [b"200"]:
+        return None
+    fields = parse_trace(body.decode("utf-8", "replace"))
+    colo = fields.get("colo", "").upper()
+    if not colo:
+        return None
+    return Trace(colo, fields.get("loc", ""), COLO_COUNTRY.get(colo))
+
+
+def resolve_colos(ips: Iterable[str], cache: ColoCache, url: str = DEFAULT_TRACE_URL,
+                  concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 5.0) -> dict:
+    """
+    解析 ips 所在前缀的数据中心，结果写入 cache
+
+    Args:
+        ips: 要解析的 IP（按优先程度排序；每个前缀只请求排在最前的 IP）
+        cache: 前缀缓存，命中的前缀不再请求
+        url: trace 地址（Host/SNI 取自该地址，连接直接发往 IP）
+        concurrency: 同时进行的请求数
+        timeout: 连接和读取的超时（秒）
+
+    Returns:
+        统计信息
+    """
+    start = time.perf_counter()
+    pending: dict[str, str] = {}
+    prefixes = set()
+    for ip in ips:
+        prefix = prefix_of(ip)
+        prefixes.add(prefix)
+        if cache.get(prefix) is None and prefix not in pending:
+            pending[prefix] = ip
+
+    async def run() -> list[Trace | None]:
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(ip: str) -> Trace | None:
+            async with sem:
+                return await fetch_trace(ip, url, timeout)
+
+        return await asyncio.gather(*(one(ip) for ip in pending.values()))
+
+    traces = asyncio.run(run()) if pending else []
+    for prefix, trace in zip(pending, traces):
+        if trace is not None:
+            cache.put(prefix, trace)
+    return {
+        "prefixes": len(prefixes),
+        "cached": len(prefixes) - len(pending),
+        "requested": len(pending),
+        "resolved": sum(1 for t in traces if t is not None),
+        "unknown_colos": sorted({t.colo for t in traces if t is not None and t.region is None}),
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def top_ips(rows: Iterable[tuple[str, float]], n: int) -> list[str]:
+    """延迟最低的 n 个 IP（按延迟排序）"""
+    return [ip for ip, _ in heapq.nsmallest(n, rows, key=lambda row: row[1])]
+
+
+def apply_colo_results(csv_path: Path, cache: ColoCache) -> int:
+    """
+    把解析结果写回 result.csv：已解析前缀中的行填入 地区码 和 数据中心 列
+
+    写入临时文件后原子替换。
+
+    Returns:
+        填入的行数
+    """
+    csv_path = Path(csv_path)
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return 0
+
+    header = rows[0]
+    if COLO_COLUMN not in header:
+        header.append(COLO_COLUMN)
+    colo_idx = header.index(COLO_COLUMN)
+    filled = 0
+    for row in rows[1:]:
+        if not row:
+            continue
+        while len(row) <= colo_idx:
+            row.append("")
+        try:
+            trace = cache.get(prefix_of(row[0].strip()))
+        except ValueError:
+            continue
+        if trace is not None:
+            if trace.region and len(row) > 6:
+                row[6] = trace.region
+            row[colo_idx] = trace.colo
+            filled += 1
+
+    fd, tmp = tempfile.mkstemp(dir=csv_path.parent, prefix=csv_path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+        os.replace(tmp, csv_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return filled
+
+
+def main(argv: list[str] | None = None) -> int:
+    from run_speedtest import iter_result_rows
+
+    parser = argparse.ArgumentParser(description="Resolve the Cloudflare colo of the fastest IPs via /cdn-cgi/trace")
+    parser.add_argument("csv", type=Path, help="result.csv")
+    parser.add_argument("--top", type=int, default=200, help="resolve the N lowest-latency IPs")
+    parser.add_argument("--cache", type=Path, default=None, help="per-prefix JSON cache")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="cache TTL in seconds")
+    parser.add_argument("--url", default=DEFAULT_TRACE_URL)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--write", action="store_true", help="write the region/colo columns back to the CSV")
+    args = parser.parse_args(argv)
+
+    cache = ColoCache(args.cache, args.ttl)
+    ips = top_ips(iter_result_rows(args.csv), args.top)
+    stats = resolve_colos(ips, cache, args.url, args.concurrency)
+    cache.save()
+    print(json.dumps(stats, ensure_ascii=False))
+    for ip in ips:
+        trace = cache.get(prefix_of(ip))
+        print(f"{ip}\t{trace.colo if trace else '-'}\t{(trace.region if trace else None) or '-'}")
+    if args.write:
+        apply_colo_results(args.csv, cache)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
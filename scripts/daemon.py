@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+常驻模式：增量复测 + 迟滞替换
+
+每日一次的全量测速之间，已发布的 IP 可能变差但仍然挂在 best_ip.txt 上。常驻模式
+把当前发布的集合放在按地区分组的可索引大顶堆中（堆顶为该地区当前最差的 IP）：
+- 每隔 incumbent_interval 秒复测一次已发布的 IP，用 EWMA 平滑更新分数
+- 每隔 challenger_interval 秒从 ip.txt 中按 cidr_walk 的顺序轮换取一批挑战者测速
+- 挑战者只有在比被挑战者好出迟滞阈值（相对比例 + 绝对毫秒）时才替换，避免来回抖动
+- 集合成员有变化时原子地重写 best_ip.txt（按分数排序）
+
+每轮的测速量只有已发布集合和一小批挑战者，远小于一次全量扫描。
+"""
+
+import os
+import time
+import json
+from pathlib import Path
+from typing import Callable, Iterable, NamedTuple
+
+from cidr_walk import CidrSpace, read_cidrs, walk
+from history import DEFAULT_ALPHA, score_of
+from region_index import classify_ips
+from tcp_probe import run_probes
+
+DEFAULT_INCUMBENT_INTERVAL = 300.0
+DEFAULT_CHALLENGER_INTERVAL = 900.0
+DEFAULT_CHALLENGERS = 200
+
+# 挑战者的分数须低于 被挑战者 × (1 - DEFAULT_MARGIN) - DEFAULT_MARGIN_MS 才会替换
+DEFAULT_MARGIN = 0.1
+DEFAULT_MARGIN_MS = 5.0
+
+
+class IndexedHeap:
+    """
+    按分数排序的可索引大顶堆
+
+    堆顶是分数最高（最差）的元素；维护 key→堆中位置 的索引，
+    按 key 更新分数或删除都是 O(log n)。
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, str]] = []
+        self._pos: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pos
+
+    def score(self, key: str) -> float:
+        return self._heap[self._pos[key]][0]
+
+    def peek(self) -> tuple[str, float]:
+        """分数最高的 (key, 分数)"""
+        score, key = self._heap[0]
+        return key, score
+
+    def items(self) -> list[tuple[str, float]]:
+        return [(key, score) for score, key in self._heap]
+
+    def push(self, key: str, score: float) -> None:
+        """加入新元素；key 已存在时更新其分数"""
+        if key in self._pos:
+            self.update(key, score)
+            return
+        self._heap.append((score, key))
+        self._pos[key] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, key: str, score: float) -> None:
+        i = self._pos[key]
+        old = self._heap[i][0]
+        self._heap[i] = (score, key)
+        if score > old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, key: str) -> None:
+        i = self._pos.pop(key)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+
+    def _swap(self, i: int, j: int) -> None:
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, i: int) -> None:
+        heap = self._heap
+        while i > 0:
+            parent = (i - 1) // 2
+            if heap[i] <= heap[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int) -> None:
+        heap = self._heap
+        n = len(heap)
+        while True:
+            largest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and heap[child] > heap[largest]:
+                    largest = child
+            if largest == i:
+                return
+            self._swap(i, largest)
+            i = largest
+
+
+class Swap(NamedTuple):
+    removed: str
+    added: str
+    removed_score: float
+    added_score: float
+
+
+class HysteresisSet:
+    """
+    当前发布的 IP 集合
+
+    配额规则与 parse_top_ips_by_region 相同：优先地区每个最多 max_per_region 个，
+    总数最多 max_total 个。挑战者优先与同地区最差的 IP 比较；同地区没有 IP 时
+    与全体中最差的 IP 比较。
+
+    Args:
+        regions: 优先处理的地区列表
+        max_per_region: 每个优先地区最多的 IP 数量
+        max_total: 总共最多的 IP 数量
+        margin: 相对迟滞阈值
+        margin_ms: 绝对迟滞阈值（毫秒）
+        alpha: 复测分数的 EWMA 平滑系数
+    """
+
+    def __init__(self, regions: list[str], max_per_region: int = 10, max_total: int = 100,
+                 margin: float = DEFAULT_MARGIN, margin_ms: float = DEFAULT_MARGIN_MS,
+                 alpha: float = DEFAULT_ALPHA) -> None:
+        self.priority = set(regions)
+        self.max_per_region = max_per_region
+        self.max_total = max_total
+        self.margin = margin
+        self.margin_ms = margin_ms
+        self.alpha = alpha
+        self._heaps: dict[str, IndexedHeap] = {}
+        self._region: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._region)
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self._region
+
+    def ips(self) -> list[str]:
+        """已发布的 IP，按分数从好到差"""
+        items = [item for heap in self._heaps.values() for item in heap.items()]
+        return [ip for ip, _ in sorted(items, key=lambda item: (item[1], item[0]))]
+
+    def score(self, ip: str) -> float:
+        return self._heaps[self._region[ip]].score(ip)
+
+    def _add(self, ip: str, region: str, score: float) -> None:
+        self._heaps.setdefault(region, IndexedHeap()).push(ip, score)
+        self._region[ip] = region
+
+    def _remove(self, ip: str) -> None:
+        region = self._region.pop(ip)
+        self._heaps[region].remove(ip)
+        if not self._heaps[region]:
+            del self._heaps[region]
+
+    def observe(self, ip: str, score: float) -> None:
+        """记录一次复测结果（EWMA 平滑）"""
+        heap = self._heaps[self._region[ip]]
+        heap.update(ip, self.alpha * score + (1 - self.alpha) * heap.score(ip))
+
+    def _beats(self, challenger: float, incumbent: float) -> bool:
+        return challenger < incumbent * (1 - self.margin) - self.margin_ms
+
+    def challenge(self, ip: str, region: str, score: float) -> Swap | None:
+        """
+        挑战者尝试进入集合
+
+        Returns:
+            发生替换时返回 Swap；直接加入（集合未满）或未能进入时返回 None
+        """
+        if ip in self._region:
+            self.observe(ip, score)
+            return None
+
+        region_full = region in self.priority and len(self._heaps.get(region, ())) >= self.max_per_region
+        if not region_full and len(self) < self.max_total:
+            self._add(ip, region, score)
+            return None
+
+        if region in self._heaps:
+            target = self._heaps[region]
+        elif self._heaps:
+            target = max(self._heaps.values(), key=lambda heap: heap.peek()[1])
+        else:
+            return None
+        worst, worst_score = target.peek()
+        if not self._beats(score, worst_score):
+            return None
+        self._remove(worst)
+        self._add(ip, region, score)
+        return Swap(worst, ip, worst_score, score)
+
+
+def write_atomic(path: Path, lines: Iterable[str]) -> None:
+    """先写临时文件再 os.replace，读取方不会看到写了一半的文件"""
+    lines = list(lines)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+Prober = Callable[[list[str]], dict[str, float]]
+
+
+def tcp_prober(port: int = 443, count: int = 4, concurrency: int = 200, timeout: float = 1.0) -> Prober:
+    """用 tcp_probe 测速，返回 ip→分数；全部失败的 IP 记为满额丢包惩罚"""
+    dead = score_of(timeout * 1000, 1.0)
+
+    def probe(ips: list[str]) -> dict[str, float]:
+        results, _ = run_probes(ips, port, count, concurrency, timeout)
+        scores = dict.fromkeys(ips, dead)
+        scores.update((r.ip, score_of(r.latency, r.loss)) for r in results)
+        return scores
+
+    return probe
+
+
+def run_daemon(ranges_txt: Path, best_path: Path, live: HysteresisSet, probe: Prober, *,
+               version: int = 4, per_24: int = 1, seed: int = 0, challengers: int = DEFAULT_CHALLENGERS,
+               incumbent_interval: float = DEFAULT_INCUMBENT_INTERVAL,
+               challenger_interval: float = DEFAULT_CHALLENGER_INTERVAL,
+               rounds: int | None = None, sleep: Callable[[float], None] = time.sleep,
+               clock: Callable[[], float] = time.monotonic) -> dict:
+    """
+    常驻运行：按各自的间隔复测已发布的 IP 和轮换的挑战者
+
+    Args:
+        ranges_txt: 挑战者来源的网段文件
+        best_path: 输出的 best_ip.txt
+        live: 已发布的集合；为空且 best_path 存在时，先测一遍其中的 IP 作为初始集合
+        probe: 测速函数，ip 列表 → ip→分数
+        version, per_24, seed: 挑战者的遍历参数（见 cidr_walk），偏移在各轮之间递增
+        challengers: 每轮挑战者数量
+        incumbent_interval: 复测已发布 IP 的间隔（秒）
+        challenger_interval: 测挑战者的间隔（秒）
+        rounds: 最多运行的轮数（None 为一直运行），便于测试
+        sleep, clock: 可替换的计时函数
+
+    Returns:
+        累计统计信息
+    """
+    stats = {"rounds": 0, "incumbent_probes": 0, "challenger_probes": 0, "swaps": 0, "writes": 0}
+    cidrs = read_cidrs(ranges_txt)
+    space = CidrSpace(cidrs, per_24, seed, version)
+    per_hour = live.max_total * 3600 / incumbent_interval + challengers * 3600 / challenger_interval
+    print(f"Daemon: about {per_hour:.0f} IPs probed per hour; a full scan is {space.size} IPs")
+
+    published = None
+    if not len(live) and best_path.exists():
+        previous = [line.strip() for line in best_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+        scores = probe(previous)
+        stats["incumbent_probes"] += len(previous)
+        for ip, region in zip(previous, classify_ips(previous)):
+            live.challenge(ip, region, scores[ip])
+        published = set(previous)
+
+    offset = 0
+    next_incumbent = next_challenger = clock()
+    while rounds is None or stats["rounds"] < rounds:
+        now = clock()
+        wait = min(next_incumbent, next_challenger) - now
+        if wait > 0:
+            sleep(wait)
+            now = clock()
+
+        swaps: list[Swap] = []
+        if now >= next_challenger or not len(live):
+            batch = list(walk(space, seed, offset, challengers))
+            if len(batch) < challengers:
+                # 遍历完一遍：换一个种子从头开始
+                offset, seed = 0, seed + 1
+                space = CidrSpace(cidrs, per_24, seed, version)
+            else:
+                offset += len(batch)
+            scores = probe(batch)
+            stats["challenger_probes"] += len(batch)
+            ordered = sorted(scores.items(), key=lambda item: item[1])
+            for (ip, score), region in zip(ordered, classify_ips([ip for ip, _ in ordered])):
+                swap = live.challenge(ip, region, score)
+                if swap is not None:
+                    swaps.append(swap)
+            next_challenger = now + challenger_interval
+
+        if now >= next_incumbent:
+            incumbents = live.ips()
+            for ip, score in probe(incumbents).items():
+                live.observe(ip, score)
+            stats["incumbent_probes"] += len(incumbents)
+            next_incumbent = now + incumbent_interval
+
+        stats["rounds"] += 1
+        stats["swaps"] += len(swaps)
+        current = live.ips()
+        if set(current) != published:
+            write_atomic(best_path, current)
+            published = set(current)
+            stats["writes"] += 1
+        print("Daemon:", json.dumps({
+            "round": stats["rounds"],
+            "published": len(current),
+            "offset": offset,
+            "swaps": [s._asdict() for s in swaps],
+        }, ensure_ascii=False))
+    return stats
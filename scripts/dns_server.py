@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按延迟加权轮换应答的本地 DNS 服务（UDP）
+
+通过 best_ip.txt / hosts 发布时，所有客户端都解析到同一个 IP。这里对配置的域名
+应答 A/AAAA 查询，每次从 parse_top_ips_by_region 选出的集合中给出一个按延迟加权
+抽样的子集，使负载分散到前几名 IP 上，且延迟越低的 IP 出现得越多。
+
+应答在加载结果时一次性预编码为 DNS 报文格式：每个 (域名, 类型) 预先生成 variants
+份不同的应答段（名称用指向问题段的压缩指针），收到查询时只需校验问题段、
+拼上报头和一份预编码的应答段。结果文件变化后在后台重建应答表并整体替换。
+
+用法：
+    python scripts/dns_server.py --port 5353 --results result.csv --names cdn.example.com
+    dig @127.0.0.1 -p 5353 cdn.example.com A
+"""
+
+import os
+import math
+import struct
+import random
+import asyncio
+import argparse
+import ipaddress
+from pathlib import Path
+from typing import Iterable
+
+from result_table import ResultTable, is_table_file
+from run_speedtest import iter_result_rows, parse_top_ips_by_region
+
+QTYPE_A = 1
+QTYPE_AAAA = 28
+CLASS_IN = 1
+
+RCODE_FORMERR = 1
+RCODE_NOTIMP = 4
+RCODE_REFUSED = 5
+
+DEFAULT_TTL = 60
+DEFAULT_ANSWERS = 4
+DEFAULT_VARIANTS = 64
+
+_HEADER = struct.Struct("!HHHHHH")
+
+
+def encode_name(name: str) -> bytes:
+    """域名转为报文中的标签序列（小写，以 0 结尾）"""
+    labels = [label for label in name.strip().rstrip(".").lower().split(".") if label]
+    if not labels:
+        raise ValueError(f"Invalid domain name: {name!r}")
+    wire = b""
+    for label in labels:
+        raw = label.encode("idna")
+        if len(raw) > 63:
+            raise ValueError(f"Label too long in {name!r}")
+        wire += bytes([len(raw)]) + raw
+    return wire + b"\x00"
+
+
+def weighted_variants(ips: list[tuple[str, float]], answers: int, variants: int,
+                      seed: int = 0) -> list[list[str]]:
+    """
+    按延迟加权、不放回地抽样 variants 组 IP
+
+    每组取 answers 个：权重为 1/延迟，用 Efraimidis-Spirakis 的指数键
+    （键 = Exp(1) × 延迟，取最小的若干个），组内按键排序，排在第一位的 IP 同样按权重分布。
+    可抽的 IP 不多于 answers 时只生成一组（按延迟排序的全部 IP）。
+
+    Args:
+        ips: (ip, 延迟毫秒) 列表
+        answers: 每组的 IP 数
+        variants: 组数
+        seed: 随机种子
+
+    Returns:
+        IP 组列表
+    """
+    if len(ips) <= answers:
+        return [[ip for ip, _ in sorted(ips, key=lambda item: item[1])]] if ips else []
+    rng = random.Random(seed)
+    groups = []
+    for _ in range(variants):
+        keyed = sorted((-math.log(1.0 - rng.random()) * max(latency, 1.0), ip) for ip, latency in ips)
+        groups.append([ip for _, ip in keyed[:answers]])
+    return groups
+
+
+def _encode_answers(ips: list[str], qtype: int, ttl: int) -> bytes:
+    """应答段：各记录的名称都是指向问题段（偏移 12）的压缩指针"""
+    out = bytearray()
+    for ip in ips:
+        rdata = ipaddress.ip_address(ip).packed
+        out += struct.pack("!HHHIH", 0xC00C, qtype, CLASS_IN, ttl, len(rdata)) + rdata
+    return bytes(out)
+
+
+def _counts(answers: int) -> bytes:
+    """报头中的 QDCOUNT、ANCOUNT、NSCOUNT、ARCOUNT"""
+    return _HEADER.pack(0, 0, 1, answers, 0, 0)[4:]
+
+
+# 域名存在但没有该类型的记录（NOERROR + 空应答段）
+_NO_DATA = [(_counts(0), b"")]
+
+
+class AnswerTable:
+    """
+    预编码的应答表
+
+    Args:
+        names: 应答的域名
+        ipv4, ipv6: (ip, 延迟毫秒) 列表
+        answers: 每次应答的 IP 数
+        variants: 每个 (域名, 类型) 预生成的应答份数，按查询依次轮换
+        ttl: 记录的 TTL（秒）
+        seed: 抽样种子
+    """
+
+    def __init__(self, names: Iterable[str], ipv4: list[tuple[str, float]], ipv6: list[tuple[str, float]],
+                 answers: int = DEFAULT_ANSWERS, variants: int = DEFAULT_VARIANTS, ttl: int = DEFAULT_TTL,
+                 seed: int = 0) -> None:
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+        # (小写的报文域名, 类型) → [(报头中的 4 个计数, 应答段), ...]
+        self._answers: dict[tuple[bytes, int], list[tuple[bytes, bytes]]] = {}
+        per_type = {}
+        for qtype, ips in ((QTYPE_A, ipv4), (QTYPE_AAAA, ipv6)):
+            groups = weighted_variants(ips, answers, variants, seed)
+            per_type[qtype] = [(_counts(len(group)), _encode_answers(group, qtype, ttl)) for group in groups]
+        for name in names:
+            wire = encode_name(name)
+            for qtype, encoded in per_type.items():
+                self._answers[(wire, qtype)] = encoded or _NO_DATA
+        self.names = {wire for wire, _ in self._answers}
+
+    def lookup(self, wire: bytes, qtype: int) -> list[tuple[bytes, bytes]] | None:
+        """预编码的应答；域名不在表中时返回 None，类型不是 A/AAAA 时返回无记录的应答"""
+        variants = self._answers.get((wire, qtype))
+        if variants is None and wire in self.names:
+            return _NO_DATA
+        return variants
+
+
+class DnsResponder(asyncio.DatagramProtocol):
+    """UDP 协议处理；table 可随时整体替换"""
+
+    def __init__(self, table: AnswerTable) -> None:
+        self.table = table
+        self.queries = 0
+        self._rotation = 0
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        response = self.respond(data)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+    def respond(self, data: bytes) -> bytes | None:
+        """
+        生成应答报文
+
+        Returns:
+            应答报文；不是查询或无法回复时返回 None（直接丢弃）
+        """
+        if len(data) < 12 or data[2] & 0x80:
+            return None
+        self.queries += 1
+        ident, flags, qdcount = data[:2], data[2], _HEADER.unpack_from(data)[2]
+        # QR=1, AA=1，回显 opcode 和 RD
+        reply_flags = bytes([0x84 | (flags & 0x79), 0])
+        if flags & 0x78:
+            return ident + bytes([reply_flags[0], RCODE_NOTIMP]) + bytes(8)
+        if qdcount != 1:
+            return ident + bytes([reply_flags[0], RCODE_FORMERR]) + bytes(8)
+
+        # 问题段：标签序列（不允许压缩指针）+ 类型 + 类
+        pos = 12
+        while pos < len(data) and 0 < data[pos] < 64:
+            pos += data[pos] + 1
+        end = pos + 5
+        if pos >= len(data) or data[pos] != 0 or end > len(data):
+            return ident + bytes([reply_flags[0], RCODE_FORMERR]) + bytes(8)
+        qtype, qclass = struct.unpack_from("!HH", data, pos + 1)
+        question = data[12:end]
+
+        variants = self.table.lookup(data[12:pos + 1].lower(), qtype) if qclass == CLASS_IN else None
+        if variants is None:
+            return ident + bytes([reply_flags[0], RCODE_REFUSED]) + _counts(0) + question
+        self._rotation += 1
+        counts, answers = variants[self._rotation % len(variants)]
+        return ident + reply_flags + counts + question + answers
+
+
+def load_selection(results: Path, regions: list[str], max_per_region: int = 10,
+                   max_total: int = 100) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
+    """
+    用 parse_top_ips_by_region 选出 IP，并附上各自的延迟
+
+    Returns:
+        (IPv4 的 (ip, 延迟) 列表, IPv6 的 (ip, 延迟) 列表)
+    """
+    if is_table_file(results):
+        # 二进制结果表：select_top 与 parse_top_ips_by_region 规则相同，且行上直接有延迟
+        with ResultTable.open(results) as table:
+            rows, _ = table.select_top(regions, max_per_region, max_total)
+            pairs = [(table.ip_at(row), float(table.latency[row])) for row in rows]
+    else:
+        selected = parse_top_ips_by_region(results, regions, max_per_region, max_total)
+        latency: dict[str, float | None] = dict.fromkeys(selected)
+        for ip, value in iter_result_rows(results):
+            if ip in latency and latency[ip] is None:
+                latency[ip] = value
+        pairs = [(ip, latency[ip] if latency[ip] is not None else 9999.0) for ip in selected]
+    return [p for p in pairs if ":" not in p[0]], [p for p in pairs if ":" in p[0]]
+
+
+def _signature(path: Path) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+async def watch(responder: DnsResponder, results: Path, build, interval: float = 5.0) -> None:
+    """结果文件变化时在工作线程中用 build() 重建应答表，完成后在事件循环中整体替换"""
+    signature = _signature(results)
+    while True:
+        await asyncio.sleep(interval)
+        current = _signature(results)
+        if current == signature or current is None:
+            continue
+        signature = current
+        try:
+            table = await asyncio.to_thread(build)
+        except (OSError, ValueError) as e:
+            print(f"Reload failed, keeping the previous answers: {e}")
+            continue
+        responder.table = table
+        print(f"Reloaded {results}: {len(table.ipv4)} IPv4, {len(table.ipv6)} IPv6")
+
+
+async def serve(responder: DnsResponder, host: str = "127.0.0.1", port: int = 5353,
+                ready: asyncio.Event | None = None) -> None:
+    """运行 UDP 服务直到被取消"""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: responder, local_addr=(host, port))
+    print(f"DNS listening on {host}:{transport.get_extra_info('sockname')[1]}")
+    if ready is not None:
+        ready.set()
+    try:
+        await asyncio.Future()
+    finally:
+        transport.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Answer A/AAAA queries with latency-weighted best IPs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5353)
+    parser.add_argument("--results", type=Path, default=Path("result.csv"),
+                        help="result.csv or a binary result table")
+    names = parser.add_mutually_exclusive_group(required=True)
+    names.add_argument("--names", nargs="+")
+    names.add_argument("--names-file", type=Path)
+    parser.add_argument("--regions", default=os.getenv("PRIORITY_REGIONS", "US,GB,IN,JP,KR,SG,HK"))
+    parser.add_argument("--max-per-region", type=int, default=int(os.getenv("MAX_PER_REGION", "10")))
+    parser.add_argument("--max-total", type=int, default=int(os.getenv("MAX_TOTAL", "100")))
+    parser.add_argument("--answers", type=int, default=DEFAULT_ANSWERS, help="IPs per answer")
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS, help="precomputed answers per name")
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL)
+    parser.add_argument("--check-interval", type=float, default=5.0,
+                        help="seconds between checks for a new results file")
+    args = parser.parse_args(argv)
+
+    if args.names_file:
+        with open(args.names_file, "r", encoding="utf-8") as f:
+            domains = [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+    else:
+        domains = args.names
+    regions = [r.strip() for r in args.regions.split(",") if r.strip()]
+
+    def build() -> AnswerTable:
+        ipv4, ipv6 = load_selection(args.results, regions, args.max_per_region, args.max_total)
+        return AnswerTable(domains, ipv4, ipv6, args.answers, args.variants, args.ttl)
+
+    responder = DnsResponder(build())
+    print(f"Serving {len(domains)} names with {len(responder.table.ipv4)} IPv4 / "
+          f"{len(responder.table.ipv6)} IPv6 addresses")
+
+    async def run() -> None:
+        reloader = asyncio.create_task(watch(responder, args.results, build, args.check_interval))
+        try:
+            await serve(responder, args.host, args.port)
+        finally:
+            reloader.cancel()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多连接并行下载测速
+
+对延迟选出的候选 IP，用多个并发连接分别请求不重叠的 HTTP Range，
+所有连接共享一个全局带宽预算（令牌桶），记录持续吞吐量和首字节时间，
+并写回 result.csv 的 下载速度(MB/s) 列。
+"""
+
+import os
+import csv
+import ssl
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+# 每个连接请求的 Range 跨度，足够覆盖一次测速时长
+DEFAULT_RANGE_SPAN = 256 * 1024 * 1024
+
+READ_CHUNK = 64 * 1024
+
+TTFB_COLUMN = "首字节时间(ms)"
+
+
+class DownloadResult(NamedTuple):
+    ip: str
+    bytes: int
+    speed: float  # 持续吞吐量（MB/s），从首字节开始计时
+    ttfb: float  # 各连接中最小的首字节时间（毫秒），全部失败时为 0.0
+    connections_ok: int
+
+
+class TokenBucket:
+    """全局带宽预算：所有连接读取数据前都要从这里取令牌（字节）"""
+
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: 每秒允许的字节数，0 表示不限制
+        """
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+
+    async def consume(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        self._tokens -= n
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+async def _fetch_range(ip: str, url: str, start: int, end: int, deadline: float,
+                       bucket: TokenBucket, timeout: float) -> tuple[int, float, float, float]:
+    """
+    通过一个连接下载 [start, end] 字节直到截止时间
+
+    Returns:
+        (读取的字节数, 首字节时间秒, 首字节时刻, 最后一次读取时刻)
+    """
+    parts = urlsplit(url)
+    use_ssl = parts.scheme == "https"
+    host = parts.hostname or ""
+    port = parts.port or (443 if use_ssl else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    sent_at = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(
+        ip, port,
+        ssl=ssl.create_default_context() if use_ssl else None,
+        server_hostname=host if use_ssl else None,
+    ), timeout)
+    try:
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Range: bytes={start}-{end}\r\n"
+            "User-Agent: MyAutoScript/1.0\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(request.encode("ascii"))
+        await writer.drain()
+
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        first_byte_at = time.perf_counter()
+        status = head.split(b" ", 2)[1]
+        if status not in (b"200", b"206"):
+            raise ConnectionError(f"HTTP {status.decode()} from {ip}")
+
+        total = 0
+        last_at = first_byte_at
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(READ_CHUNK), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            await bucket.consume(len(chunk))
+            total += len(chunk)
+            last_at = time.perf_counter()
+        return total, first_byte_at - sent_at, first_byte_at, last_at
+    finally:
+        # 等待连接真正关闭（TLS 需要完成关闭握手），否则截止时间打断读取后会留下未关闭的传输
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout)
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+
+async def measure_ip(ip: str, url: str, connections: int = 4, duration: float = 8.0,
+                     bucket: TokenBucket | None = None, timeout: float = 5.0,
+                     range_span: int = DEFAULT_RANGE_SPAN) -> DownloadResult:
+    """
+    对单个 IP 用多个并发连接测下载速度
+
+    Args:
+        ip: 目标 IP
+        url: 测速文件地址（Host/SNI 取自该地址，连接直接发往 ip）
+        connections: 并发连接数，每个连接请求不重叠的 Range
+        duration: 测速时长（秒）
+        bucket: 全局带宽预算
+        timeout: 建立连接和等待响应头的超时（秒）
+        range_span: 每个连接请求的字节跨度
+    """
+    bucket = bucket or TokenBucket(0)
+    deadline = time.perf_counter() + duration
+    tasks = [
+        _fetch_range(ip, url, i * range_span, (i + 1) * range_span - 1, deadline, bucket, timeout)
+        for i in range(connections)
+    ]
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    ok = [o for o in outcomes if not isinstance(o, BaseException)]
+    if not ok:
+        return DownloadResult(ip, 0, 0.0, 0.0, 0)
+
+    total = sum(o[0] for o in ok)
+    elapsed = max(o[3] for o in ok) - min(o[2] for o in ok)
+    speed = total / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    ttfb = min(o[1] for o in ok) * 1000
+    return DownloadResult(ip, total, speed, ttfb, len(ok))
+
+
+async def measure_many(ips: list[str], url: str, connections: int = 4, duration: float = 8.0,
+                       parallel_ips: int = 1, budget: float = 0.0, timeout: float = 5.0) -> list[DownloadResult]:
+    """
+    对候选 IP 逐批测下载速度
+
+    Args:
+        parallel_ips: 同时测速的 IP 数量
+        budget: 所有连接共享的带宽预算（字节/秒），0 表示不限制
+    """
+    bucket = TokenBucket(budget)
+    sem = asyncio.Semaphore(max(1, parallel_ips))
+
+    async def one(ip: str) -> DownloadResult:
+        async with sem:
+            return await measure_ip(ip, url, connections, duration, bucket, timeout)
+
+    return await asyncio.gather(*(one(ip) for ip in ips))
+
+
+def run_download_stage(ips: list[str], url: str, connections: int = 4, duration: float = 8.0,
+                       parallel_ips: int = 1, budget: float = 0.0,
+                       timeout: float = 5.0) -> tuple[list[DownloadResult], dict]:
+    """
+    同步入口：对延迟选出的 IP 测下载速度
+
+    Returns:
+        (测速结果, 统计信息)
+    """
+    start = time.perf_counter()
+    results = asyncio.run(measure_many(ips, url, connections, duration, parallel_ips, budget, timeout))
+    elapsed = time.perf_counter() - start
+    stats = {
+        "ips": len(ips),
+        "ok": sum(1 for r in results if r.connections_ok),
+        "connections": connections,
+        "bytes": sum(r.bytes for r in results),
+        "elapsed_s": round(elapsed, 3),
+    }
+    return results, stats
+
+
+def apply_download_results(csv_path: Path, results: list[DownloadResult]) -> None:
+    """
+    把下载测速结果写回 result.csv：更新 下载速度(MB/s) 列，并追加首字节时间列
+
+    写入临时文件后原子替换。
+    """
+    by_ip = {r.ip: r for r in results}
+    csv_path = Path(csv_path)
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return
+
+    header = rows[0]
+    if TTFB_COLUMN not in header:
+        header.append(TTFB_COLUMN)
+    ttfb_idx = header.index(TTFB_COLUMN)
+    for row in rows[1:]:
+        if not row:
+            continue
+        while len(row) <= ttfb_idx:
+            row.append("")
+        r = by_ip.get(row[0].strip())
+        if r is not None and r.connections_ok:
+            row[5] = f"{r.speed:.2f}"
+            row[ttfb_idx] = f"{r.ttfb:.2f}"
+
+    fd, tmp = tempfile.mkstemp(dir=csv_path.parent, prefix=csv_path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+        os.replace(tmp, csv_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
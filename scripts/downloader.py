@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可续传、带条件请求和重试的下载器
+
+- 通过 ETag / Last-Modified 发送条件 GET，未修改（304）时保留本地文件
+- 下载到 <目标>.part，中断后用 Range 请求续传（If-Range 保证是同一份内容）
+- 失败时按带抖动的指数退避重试
+- 下载完成后原子重命名到目标路径
+- 相互独立的资源可以并发下载
+"""
+
+import os
+import json
+import time
+import random
+import http.client
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+USER_AGENT = "MyAutoScript/1.0"
+
+# 这些 HTTP 状态码视为临时错误，可以重试
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+COPY_CHUNK = 1 << 16
+
+
+class FetchResult(NamedTuple):
+    url: str
+    path: Path
+    not_modified: bool
+    bytes_downloaded: int
+    attempts: int
+
+
+def _load_meta(meta_path: Path | None) -> dict:
+    if meta_path is None or not meta_path.exists():
+        return {}
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(meta_path: Path | None, meta: dict) -> None:
+    if meta_path is None:
+        return
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, meta_path)
+
+
+def _part_meta_path(part: Path) -> Path:
+    return part.with_name(part.name + ".json")
+
+
+def _attempt(url: str, dst: Path, part: Path, meta: dict, conditional: bool,
+             timeout: float, counter: list[int]) -> tuple[bool, dict]:
+    """
+    进行一次下载尝试，读取的字节数累加到 counter[0]
+
+    Returns:
+        (是否未修改, 新的校验信息)
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if conditional and dst.exists():
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    # 只有知道 .part 对应的 ETag/Last-Modified 时才续传
+    part_meta = _load_meta(_part_meta_path(part))
+    validator = part_meta.get("etag") or part_meta.get("last_modified")
+    offset = part.stat().st_size if part.exists() else 0
+    if offset and validator:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        resp = urllib.request.urlopen(req, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return True, meta
+        if e.code == 416:
+            # 续传位置无效：丢弃 .part，下次重新下载
+            part.unlink(missing_ok=True)
+        raise
+
+    with resp:
+        new_meta = {"url": url, "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+        resumed = resp.status == 206 and "Range" in headers
+        if not resumed:
+            _save_meta(_part_meta_path(part), new_meta)
+        expected = resp.headers.get("Content-Length")
+        received = 0
+        with open(part, "ab" if resumed else "wb") as f:
+            for block in iter(lambda: resp.read(COPY_CHUNK), b""):
+                f.write(block)
+                received += len(block)
+                counter[0] += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        # 连接提前关闭时 read() 只会返回空字节串，需要自己核对长度
+        if expected is not None and received < int(expected):
+            raise http.client.IncompleteRead(b"", int(expected) - received)
+    return False, new_meta
+
+
+def download(url: str, dst: Path, conditional: bool = False, meta_path: Path | None = None,
+             retries: int = 4, backoff: float = 1.0, timeout: float = 60) -> FetchResult:
+    """
+    下载 url 到 dst
+
+    Args:
+        url: 下载地址
+        dst: 目标路径
+        conditional: 目标已存在时发送条件 GET（使用 meta_path 中保存的 ETag/Last-Modified）
+        meta_path: 保存 ETag/Last-Modified 的文件，默认 <dst>.meta.json
+        retries: 最多重试次数
+        backoff: 退避基数（秒），第 n 次重试前随机等待 [0, backoff * 2^n)
+        timeout: 单次请求超时（秒）
+
+    Returns:
+        FetchResult
+    """
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    meta_path = Path(meta_path) if meta_path else dst.with_name(dst.name + ".meta.json")
+    part = dst.with_name(dst.name + ".part")
+    meta = _load_meta(meta_path)
+
+    counter = [0]
+    for attempt in range(retries + 1):
+        try:
+            not_modified, new_meta = _attempt(url, dst, part, meta, conditional, timeout, counter)
+        except urllib.error.HTTPError as e:
+            if (e.code not in RETRY_STATUS and e.code != 416) or attempt == retries:
+                raise
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            # 中断时 .part 中已有的数据保留，下次用 Range 续传
+            if attempt == retries:
+                raise
+        else:
+            if not not_modified:
+                os.replace(part, dst)
+                _part_meta_path(part).unlink(missing_ok=True)
+                _save_meta(meta_path, new_meta)
+            return FetchResult(url, dst, not_modified, counter[0], attempt + 1)
+        time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+
+    raise RuntimeError(f"Download failed: {url}")
+
+
+def download_many(jobs: list[dict], max_workers: int = 4) -> list[FetchResult]:
+    """
+    并发下载多个相互独立的资源
+
+    Args:
+        jobs: 每个元素是 download() 的关键字参数（至少包含 url 和 dst）
+        max_workers: 最大并发数
+
+    Returns:
+        与 jobs 顺序一致的 FetchResult 列表；任何一个失败都会抛出异常
+    """
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+        futures = [pool.submit(download, **job) for job in jobs]
+        return [f.result() for f in futures]
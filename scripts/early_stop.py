@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按地区配额提前结束测速
+
+测速结果流入时统计每个地区“足够好”的 IP 数（无丢包且延迟不超过 cutoff_ms）。
+延迟都低于 cutoff 的 IP 视为同样好：把一个换成另一个不算选择结果的变化。
+按 parse_top_ips_by_region 的三轮选择规则（记 s1 为第一轮已确定的优先地区 IP 数）：
+- 优先地区已有 min(max_per_region, max_total) 个足够好的 IP 后，该地区的新 IP 只会进入
+  第三轮的回填；第一、二轮已能填满 max_total 时回填用不上，跳过该地区的候选
+- 非优先地区已有 max_total - s1 个足够好的 IP 后，跳过非优先地区的候选
+- 所有地区的候选都会被跳过时，选择结果已经确定，停止测速
+
+候选按 cidr_walk 的伪随机顺序给出，已测的部分是全体的无偏样本，提前结束不会偏向某些网段。
+"""
+
+from typing import Iterable
+
+from region_index import RegionIndex, get_default_index
+
+
+class QuotaTracker:
+    """
+    跟踪各地区配额的填充情况
+
+    Args:
+        regions: 优先处理的地区列表
+        max_per_region: 每个优先地区最多选择的 IP 数量
+        max_total: 总共最多选择的 IP 数量
+        cutoff_ms: 足够好的延迟上限（毫秒）
+        index: 地区索引，默认使用 get_default_index()
+    """
+
+    def __init__(self, regions: Iterable[str], max_per_region: int = 10, max_total: int = 100,
+                 cutoff_ms: float = 100.0, index: RegionIndex | None = None) -> None:
+        self.priority = set(regions)
+        self.cap = min(max_per_region, max_total)
+        self.max_total = max_total
+        self.cutoff_ms = cutoff_ms
+        self._index = index or get_default_index()
+        self.good: dict[str, int] = dict.fromkeys(self.priority, 0)
+        self.good_other = 0
+        # 第一轮中已确定的足够好的 IP 数：sum(min(good[r], cap))
+        self._step1 = 0
+        self.observed = 0
+        self.skipped = 0
+
+    def region_of(self, ip: str) -> str:
+        return self._index.lookup(ip)
+
+    def wants(self, region: str) -> bool:
+        """该地区的候选是否还可能改变选择结果"""
+        step1 = self._step1
+        if step1 >= self.max_total:
+            return False
+        if region in self.priority:
+            return self.good[region] < self.cap or step1 + self.good_other < self.max_total
+        return self.good_other < self.max_total - step1
+
+    @property
+    def settled(self) -> bool:
+        """选择结果是否已经确定（所有地区的候选都不再需要）"""
+        step1 = self._step1
+        if step1 >= self.max_total:
+            return True
+        return self.good_other >= self.max_total - step1 and all(n >= self.cap for n in self.good.values())
+
+    def admit(self, ip: str) -> str | None:
+        """
+        判断候选是否需要测速
+
+        Returns:
+            需要测速时返回其地区码，否则返回 None（计入 skipped）
+        """
+        region = self.region_of(ip)
+        if self.wants(region):
+            return region
+        self.skipped += 1
+        return None
+
+    def observe(self, region: str, latency: float, loss: float) -> None:
+        """记录一条测速结果（region 为 admit 的返回值）"""
+        self.observed += 1
+        if loss > 0 or latency > self.cutoff_ms:
+            return
+        if region in self.priority:
+            self.good[region] += 1
+            if self.good[region] <= self.cap:
+                self._step1 += 1
+        else:
+            self.good_other += 1
+
+    def summary(self) -> dict:
+        return {
+            "cutoff_ms": self.cutoff_ms,
+            "settled": self.settled,
+            "observed": self.observed,
+            "skipped": self.skipped,
+            "filled": {region: min(n, self.cap) for region, n in sorted(self.good.items())},
+            "filled_other": self.good_other,
+        }
+
+
+class PerFamilyTracker:
+    """
+    双栈模式：IPv4 与 IPv6 分别选择，各自维护一个 QuotaTracker
+
+    接口与 QuotaTracker 相同；admit 返回的是 (地址族, 地区码)，原样交给 observe。
+    """
+
+    def __init__(self, regions: Iterable[str], max_per_region: int = 10, max_total: int = 100,
+                 cutoff_ms: float = 100.0, index: RegionIndex | None = None) -> None:
+        regions = list(regions)
+        self.trackers = {family: QuotaTracker(regions, max_per_region, max_total, cutoff_ms, index)
+                         for family in (4, 6)}
+
+    @property
+    def settled(self) -> bool:
+        return all(tracker.settled for tracker in self.trackers.values())
+
+    def admit(self, ip: str) -> tuple[int, str] | None:
+        family = 6 if ":" in ip else 4
+        region = self.trackers[family].admit(ip)
+        return None if region is None else (family, region)
+
+    def observe(self, token: tuple[int, str], latency: float, loss: float) -> None:
+        family, region = token
+        self.trackers[family].observe(region, latency, loss)
+
+    def summary(self) -> dict:
+        return {f"ipv{family}": tracker.summary() for family, tracker in self.trackers.items()}
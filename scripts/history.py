@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测速历史库（SQLite）
+
+记录每次运行中每个 IP 的延迟、丢包率和下载速度，并维护每个 IP 以及每个
+/24（IPv6 为 /48）网段的指数加权移动平均（EWMA）分数，使选择逻辑可以按
+长期稳定性排序，而不是依赖单次 4 个 ping 的噪声样本。
+"""
+
+import sqlite3
+import ipaddress
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+# EWMA 平滑系数：新样本的权重
+DEFAULT_ALPHA = 0.3
+
+# 丢包惩罚：100% 丢包折算为多少毫秒延迟
+LOSS_PENALTY_MS = 1000.0
+
+# IP 样本数不足时，使用所在网段的分数
+DEFAULT_MIN_SAMPLES = 3
+
+# SQLite 单条语句的参数上限较低，分批查询
+_QUERY_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_at TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS probes (
+    run_id INTEGER NOT NULL,
+    ip TEXT NOT NULL,
+    latency REAL NOT NULL,
+    loss REAL NOT NULL,
+    speed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_probes_run ON probes(run_id);
+CREATE TABLE IF NOT EXISTS ip_scores (
+    ip TEXT PRIMARY KEY,
+    prefix TEXT NOT NULL,
+    latency REAL NOT NULL,
+    loss REAL NOT NULL,
+    speed REAL NOT NULL,
+    score REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    last_run INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_ip_scores_score ON ip_scores(score);
+CREATE TABLE IF NOT EXISTS prefix_scores (
+    prefix TEXT PRIMARY KEY,
+    latency REAL NOT NULL,
+    loss REAL NOT NULL,
+    speed REAL NOT NULL,
+    score REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    last_run INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prefix_scores_score ON prefix_scores(score);
+"""
+
+
+def prefix_of(ip: str) -> str:
+    """返回 IP 所在的 /24（IPv4）或 /48（IPv6）网段"""
+    if ":" in ip:
+        return str(ipaddress.ip_network(f"{ip}/48", strict=False))
+    return ip.rsplit(".", 1)[0] + ".0/24"
+
+
+def score_of(latency: float, loss: float) -> float:
+    """综合分数（越小越好）：平均延迟 + 丢包惩罚"""
+    return latency + LOSS_PENALTY_MS * loss
+
+
+def open_history(db_path: Path) -> sqlite3.Connection:
+    """打开（必要时创建）历史库"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _fetch_scores(conn: sqlite3.Connection, table: str, key: str, keys: list[str]) -> dict[str, tuple]:
+    found = {}
+    for i in range(0, len(keys), _QUERY_CHUNK):
+        chunk = keys[i:i + _QUERY_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"SELECT {key}, latency, loss, speed, samples FROM {table} WHERE {key} IN ({marks})", chunk)
+        for row in cur:
+            found[row[0]] = row[1:]
+    return found
+
+
+def _ewma(old: tuple | None, latency: float, loss: float, speed: float, alpha: float) -> tuple[float, float, float, int]:
+    if old is None:
+        return latency, loss, speed, 1
+    old_latency, old_loss, old_speed, samples = old
+    return (
+        alpha * latency + (1 - alpha) * old_latency,
+        alpha * loss + (1 - alpha) * old_loss,
+        alpha * speed + (1 - alpha) * old_speed,
+        samples + 1,
+    )
+
+
+def record_run(conn: sqlite3.Connection, records: Iterable[tuple[str, float, float, float]],
+               run_at: str | None = None, alpha: float = DEFAULT_ALPHA) -> int:
+    """
+    记录一次运行并更新 EWMA 分数
+
+    Args:
+        conn: 历史库连接
+        records: (ip, 平均延迟, 丢包率, 下载速度) 序列
+        run_at: 运行时间（ISO 8601），默认当前 UTC 时间
+        alpha: EWMA 平滑系数
+
+    Returns:
+        本次运行的 run_id
+    """
+    records = list(records)
+    if run_at is None:
+        run_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    with conn:
+        run_id = conn.execute("INSERT INTO runs (run_at, rows) VALUES (?, ?)", (run_at, len(records))).lastrowid
+        conn.executemany(
+            "INSERT INTO probes (run_id, ip, latency, loss, speed) VALUES (?, ?, ?, ?, ?)",
+            ((run_id, ip, latency, loss, speed) for ip, latency, loss, speed in records))
+
+        # 每个 IP 的 EWMA（同一次运行中重复的 IP 取最后一条）
+        latest = {ip: (latency, loss, speed) for ip, latency, loss, speed in records}
+        old_ips = _fetch_scores(conn, "ip_scores", "ip", list(latest))
+        ip_rows = []
+        prefix_sums: dict[str, list[float]] = {}
+        for ip, (latency, loss, speed) in latest.items():
+            new = _ewma(old_ips.get(ip), latency, loss, speed, alpha)
+            prefix = prefix_of(ip)
+            ip_rows.append((ip, prefix, *new[:3], score_of(new[0], new[1]), new[3], run_id))
+            sums = prefix_sums.setdefault(prefix, [0.0, 0.0, 0.0, 0])
+            sums[0] += latency
+            sums[1] += loss
+            sums[2] += speed
+            sums[3] += 1
+        conn.executemany("INSERT OR REPLACE INTO ip_scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ip_rows)
+
+        # 每个网段以本次运行的均值作为一个样本更新 EWMA
+        old_prefixes = _fetch_scores(conn, "prefix_scores", "prefix", list(prefix_sums))
+        prefix_rows = []
+        for prefix, (latency, loss, speed, n) in prefix_sums.items():
+            new = _ewma(old_prefixes.get(prefix), latency / n, loss / n, speed / n, alpha)
+            prefix_rows.append((prefix, *new[:3], score_of(new[0], new[1]), new[3], run_id))
+        conn.executemany("INSERT OR REPLACE INTO prefix_scores VALUES (?, ?, ?, ?, ?, ?, ?)", prefix_rows)
+    return run_id
+
+
+def top_ips(conn: sqlite3.Connection, limit: int = 100, min_samples: int = 1) -> list[tuple[str, float, int]]:
+    """
+    按 EWMA 分数返回长期表现最好的 IP
+
+    Returns:
+        (ip, 分数, 样本数) 列表，分数越小越好
+    """
+    cur = conn.execute(
+        "SELECT ip, score, samples FROM ip_scores WHERE samples >= ? ORDER BY score LIMIT ?",
+        (min_samples, limit))
+    return cur.fetchall()
+
+
+def top_prefixes(conn: sqlite3.Connection, limit: int = 100) -> list[tuple[str, float, int]]:
+    """按 EWMA 分数返回长期表现最好的网段"""
+    cur = conn.execute("SELECT prefix, score, samples FROM prefix_scores ORDER BY score LIMIT ?", (limit,))
+    return cur.fetchall()
+
+
+def stability_scores(conn: sqlite3.Connection, ips: list[str],
+                     min_samples: int = DEFAULT_MIN_SAMPLES) -> dict[str, float]:
+    """
+    返回用于排序的长期分数
+
+    样本数达到 min_samples 的 IP 使用自身的 EWMA 分数，
+    否则使用所在网段的 EWMA 分数；都没有记录的 IP 不出现在结果中。
+    """
+    scores = {}
+    for i in range(0, len(ips), _QUERY_CHUNK):
+        chunk = ips[i:i + _QUERY_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            "SELECT i.ip, i.score, i.samples, p.score FROM ip_scores i "
+            f"LEFT JOIN prefix_scores p ON p.prefix = i.prefix WHERE i.ip IN ({marks})", chunk)
+        for ip, ip_score, samples, prefix_score in cur:
+            if samples >= min_samples or prefix_score is None:
+                scores[ip] = ip_score
+            else:
+                scores[ip] = prefix_score
+    return scores
+
+
+def record_speeds(conn: sqlite3.Connection, run_id: int, speeds: dict[str, float],
+                  alpha: float = DEFAULT_ALPHA) -> None:
+    """
+    在运行记录之后补记下载速度（下载测速在选择之后才进行）
+
+    record_run 以速度 0 更新了本次的 EWMA，这里把 alpha * 速度 补回去，
+    结果与一开始就带着速度记录相同。网段分数不做修正。
+    """
+    with conn:
+        conn.executemany("UPDATE probes SET speed = ? WHERE run_id = ? AND ip = ?",
+                         ((speed, run_id, ip) for ip, speed in speeds.items()))
+        conn.executemany(
+            "UPDATE ip_scores SET speed = CASE WHEN samples > 1 THEN speed + ? * ? ELSE ? END "
+            "WHERE ip = ? AND last_run = ?",
+            ((alpha, speed, speed, ip, run_id) for ip, speed in speeds.items()))
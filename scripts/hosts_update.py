@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+根据 best_ip.txt 更新 hosts 文件（替代 cfst_hosts.sh）
+
+cfst_hosts.sh 只取结果中的第一个 IP，用 sed -i 在整个 /etc/hosts 上做全局替换：
+不是原子操作，而且所有域名都指向同一个 IP。这里改为：
+- 只维护 hosts 中由标记行包围的受管块，块外的内容原样保留
+- 按分配策略把域名分散到前 N 个 IP 上
+- 写入时先写同目录的临时文件，fsync 后 rename；内容没有变化时不写
+
+分配策略：
+- rendezvous：最高随机权重哈希，前 N 个 IP 变化时只有少数域名换 IP（默认）
+- round-robin：按域名顺序轮流分配
+- first：全部指向第一个 IP（cfst_hosts.sh 的行为）
+
+用法：
+    python scripts/hosts_update.py --hosts /etc/hosts --domains a.example.com b.example.com --top 4
+    python scripts/hosts_update.py --hosts hosts.txt --domains-file domains.txt --ipv6 best_ipv6.txt --dry-run
+"""
+
+import os
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+BEGIN_MARKER = "# BEGIN cfst-bestip managed block"
+END_MARKER = "# END cfst-bestip managed block"
+
+POLICIES = ("rendezvous", "round-robin", "first")
+
+
+def read_list(path: Path, top: int | None = None) -> list[str]:
+    """读取每行一项的文件（忽略空行和注释），可只取前 top 项"""
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and line not in items:
+                items.append(line)
+                if top is not None and len(items) >= top:
+                    break
+    return items
+
+
+def _weight(domain: str, ip: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{domain}|{ip}".encode(), digest_size=8).digest(), "big")
+
+
+def assign(domains: list[str], ips: list[str], policy: str = "rendezvous") -> dict[str, str]:
+    """
+    把域名分配到 IP
+
+    Args:
+        domains: 域名列表
+        ips: 候选 IP（按优劣排序）
+        policy: 分配策略，见 POLICIES
+
+    Returns:
+        域名→IP；没有 IP 时返回空字典
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy} (choose from {', '.join(POLICIES)})")
+    if not ips:
+        return {}
+    if policy == "first":
+        return {domain: ips[0] for domain in domains}
+    if policy == "round-robin":
+        return {domain: ips[i % len(ips)] for i, domain in enumerate(domains)}
+    return {domain: max(ips, key=lambda ip: _weight(domain, ip)) for domain in domains}
+
+
+def render_block(domains: list[str], ips: list[str], ipv6: list[str] | None = None,
+                 policy: str = "rendezvous") -> list[str]:
+    """生成受管块的内容（含标记行）；有 IPv6 时每个域名再加一行 AAAA 对应的地址"""
+    lines = [BEGIN_MARKER]
+    for family in (ips, ipv6 or []):
+        mapping = assign(domains, family, policy)
+        lines += [f"{mapping[domain]}\t{domain}" for domain in domains if domain in mapping]
+    lines.append(END_MARKER)
+    return lines
+
+
+def replace_block(text: str, block: list[str]) -> str:
+    """
+    用 block 替换 hosts 文本中的受管块；没有受管块时追加到末尾
+
+    保留原文件的换行符（\\r\\n 或 \\n）以及块外的所有内容。
+    """
+    newline = "\r\n" if "\r\n" in text else "\n"
+    lines = text.splitlines()
+    try:
+        begin = lines.index(BEGIN_MARKER)
+        end = lines.index(END_MARKER, begin)
+    except ValueError:
+        begin = end = None
+
+    if begin is None:
+        head, tail = lines, []
+        if head and head[-1].strip():
+            head = head + [""]
+    else:
+        head, tail = lines[:begin], lines[end + 1:]
+    return newline.join(head + block + tail) + newline
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """
+    内容变化时原子地写入：同目录临时文件 + fsync + rename，并保留原文件的权限
+
+    Returns:
+        是否写入
+    """
+    try:
+        old = path.read_bytes()
+    except FileNotFoundError:
+        old = None
+    data = text.encode("utf-8")
+    if old == data:
+        return False
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if old is not None:
+            st = path.stat()
+            os.chmod(tmp, st.st_mode & 0o7777)
+            if hasattr(os, "chown"):
+                try:
+                    os.chown(tmp, st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+        else:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    # rename 本身也需要落盘
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return True
+
+
+def update_hosts(hosts: Path, domains: list[str], ips: list[str], ipv6: list[str] | None = None,
+                 policy: str = "rendezvous") -> bool:
+    """
+    更新 hosts 文件的受管块
+
+    Returns:
+        文件是否被改写
+    """
+    # 按字节读取再解码：read_text 会把 \r\n 转成 \n，导致整个文件被改成 LF
+    text = hosts.read_bytes().decode("utf-8") if hosts.exists() else ""
+    return write_if_changed(hosts, replace_block(text, render_block(domains, ips, ipv6, policy)))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Point domains in a hosts file at the best IPs")
+    parser.add_argument("--hosts", type=Path, required=True, help="hosts file to update")
+    parser.add_argument("--best", type=Path, default=Path("best_ip.txt"))
+    parser.add_argument("--ipv6", type=Path, default=None, help="also publish IPv6 from this file (best_ipv6.txt)")
+    domains = parser.add_mutually_exclusive_group(required=True)
+    domains.add_argument("--domains", nargs="+")
+    domains.add_argument("--domains-file", type=Path)
+    parser.add_argument("--top", type=int, default=4, help="spread the domains across the top N IPs")
+    parser.add_argument("--policy", choices=POLICIES, default="rendezvous")
+    parser.add_argument("--dry-run", action="store_true", help="print the managed block instead of writing")
+    args = parser.parse_args(argv)
+
+    names = args.domains or read_list(args.domains_file)
+    ips = read_list(args.best, args.top)
+    ipv6 = read_list(args.ipv6, args.top) if args.ipv6 and args.ipv6.exists() else None
+    if not ips and not ipv6:
+        print(f"No IPs in {args.best}, hosts file left unchanged")
+        return 1
+
+    if args.dry_run:
+        print("\n".join(render_block(names, ips, ipv6, args.policy)))
+        return 0
+    changed = update_hosts(args.hosts, names, ips, ipv6, args.policy)
+    print(f"{args.hosts}: {'updated' if changed else 'unchanged'} ({len(names)} domains, {len(ips)} IPs)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
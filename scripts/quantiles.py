@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+常数内存的流式延迟统计
+
+P² 算法（Jain & Chlamtac, 1985）用 5 个标记点估计一个分位数：每来一个样本只调整标记点的
+位置和高度，不保存样本本身。每个 IP 的握手次数再多，内存占用也不变。
+样本数少于 5 时直接对已有样本做线性插值，结果是精确值。
+
+LatencyStats 在此基础上同时维护 平均值/标准差（Welford）、相邻两次耗时之差的平均绝对值（抖动）
+以及 p50/p95/p99。
+"""
+
+import math
+from typing import Iterable
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def exact_quantile(values: list[float], p: float) -> float:
+    """已排序样本的 p 分位数（线性插值，与 numpy 的默认方法一致）"""
+    if not values:
+        return 0.0
+    pos = p * (len(values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+class P2Quantile:
+    """
+    P² 分位数估计
+
+    Args:
+        p: 要估计的分位数（0~1）
+    """
+
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float) -> None:
+        if not 0 < p < 1:
+            raise ValueError(f"Quantile must be in (0, 1): {p}")
+        self.p = p
+        self.count = 0
+        self.heights: list[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        n = self.positions
+        # 找到 x 所在的区间，必要时扩展两端的标记点
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # 调整中间三个标记点，使其实际位置接近期望位置
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self) -> float:
+        """当前估计值；没有样本时为 0.0"""
+        if self.count <= 5:
+            return exact_quantile(self.heights, self.p)
+        return self.heights[2]
+
+
+class LatencyStats:
+    """
+    单个 IP 的流式延迟统计
+
+    Args:
+        quantiles: 要估计的分位数，默认 p50/p95/p99
+    """
+
+    __slots__ = ("count", "mean", "_m2", "_prev", "_diff_sum", "estimators")
+
+    def __init__(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._prev: float | None = None
+        self._diff_sum = 0.0
+        self.estimators = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if self._prev is not None:
+            self._diff_sum += abs(x - self._prev)
+        self._prev = x
+        for estimator in self.estimators.values():
+            estimator.add(x)
+
+    def extend(self, values: Iterable[float]) -> "LatencyStats":
+        for x in values:
+            self.add(x)
+        return self
+
+    @property
+    def stddev(self) -> float:
+        """总体标准差（毫秒）"""
+        return math.sqrt(self._m2 / self.count) if self.count > 1 else 0.0
+
+    @property
+    def jitter(self) -> float:
+        """相邻两次耗时之差的平均绝对值（毫秒）"""
+        return self._diff_sum / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, p: float) -> float:
+        return self.estimators[p].value()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基于 CIDR 区间索引的地区分类
+
+把 ip.txt / ipv6.txt 中的网段和 region_overrides.txt 中的 CIDR→地区码 覆盖表
+合并成按起始地址排序、互不重叠的整数区间，查询时用 bisect 二分定位，
+每个 IP 的代价是 O(log n)，并且不需要按 '.' 切分字符串。
+"""
+
+import socket
+import ipaddress
+from bisect import bisect_right
+from pathlib import Path
+from typing import Iterable
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# 未被覆盖表标注的网段（以及不在任何网段中的 IP）统一归为该地区
+DEFAULT_REGION = "Other"
+
+DEFAULT_IP_FILES = (
+    REPO_ROOT / "ip.txt",
+    REPO_ROOT / ".tmp_cfst" / "bin" / "ipv6.txt",
+)
+DEFAULT_OVERRIDE_FILE = REPO_ROOT / "region_overrides.txt"
+
+
+def ip_to_int(ip: str) -> tuple[int, int]:
+    """
+    把 IP 字符串转换为 (版本, 整数)
+
+    Raises:
+        ValueError: 不是合法的 IPv4/IPv6 地址
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+    except OSError:
+        raise ValueError(f"Invalid IP address: {ip!r}") from None
+
+
+def read_cidr_file(path: Path) -> list[tuple[str, str | None]]:
+    """
+    读取 CIDR 列表文件，返回 (cidr, 地区码) 列表
+
+    每行一个 CIDR，可选第二列为地区码；空行和 # 之后的内容被忽略。
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            entries.append((parts[0], parts[1] if len(parts) > 1 else None))
+    return entries
+
+
+class RegionIndex:
+    """
+    CIDR→地区码 的排序整数区间索引（IPv4 与 IPv6 分开存放）
+
+    覆盖表中的网段优先于 ip.txt/ipv6.txt 中的网段；同一来源内前缀越长越优先。
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, str, int]], default: str = DEFAULT_REGION):
+        """
+        Args:
+            entries: (cidr, 地区码, 优先级) 序列，优先级高者覆盖低者
+            default: 查询不到时返回的地区码
+        """
+        self.default = default
+        by_version: dict[int, list[tuple[int, int, str, tuple[int, int]]]] = {4: [], 6: []}
+        for cidr, region, priority in entries:
+            net = ipaddress.ip_network(cidr, strict=False)
+            start = int(net.network_address)
+            end = int(net.broadcast_address)
+            by_version[net.version].append((start, end, region, (priority, net.prefixlen)))
+
+        self._starts: dict[int, list[int]] = {}
+        self._ends: dict[int, list[int]] = {}
+        self._regions: dict[int, list[str]] = {}
+        for version, nets in by_version.items():
+            starts, ends, regions = self._flatten(nets)
+            self._starts[version] = starts
+            self._ends[version] = ends
+            self._regions[version] = regions
+
+    @staticmethod
+    def _flatten(nets: list[tuple[int, int, str, tuple[int, int]]]) -> tuple[list[int], list[int], list[str]]:
+        """把可能嵌套的网段压平为互不重叠、相邻同地区已合并的区间"""
+        bounds = sorted({b for start, end, _, _ in nets for b in (start, end + 1)})
+        starts: list[int] = []
+        ends: list[int] = []
+        regions: list[str] = []
+        for lo, hi in zip(bounds, bounds[1:]):
+            best = None
+            for start, end, region, rank in nets:
+                if start <= lo and hi - 1 <= end and (best is None or rank > best[1]):
+                    best = (region, rank)
+            if best is None:
+                continue
+            region = best[0]
+            if ends and ends[-1] == lo - 1 and regions[-1] == region:
+                ends[-1] = hi - 1
+            else:
+                starts.append(lo)
+                ends.append(hi - 1)
+                regions.append(region)
+        return starts, ends, regions
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._starts.values())
+
+    def lookup_int(self, version: int, value: int) -> str:
+        """按 (版本, 整数地址) 查询地区码"""
+        starts = self._starts[version]
+        i = bisect_right(starts, value) - 1
+        if i >= 0 and value <= self._ends[version][i]:
+            return self._regions[version][i]
+        return self.default
+
+    def lookup_many_int(self, version: int, values: Iterable[int]) -> list[str]:
+        """按整数地址批量查询同一版本的一列 IP"""
+        starts, ends, regions = self._starts[version], self._ends[version], self._regions[version]
+        default = self.default
+        out = []
+        append = out.append
+        for value in values:
+            i = bisect_right(starts, value) - 1
+            append(regions[i] if i >= 0 and value <= ends[i] else default)
+        return out
+
+    def lookup(self, ip: str) -> str:
+        """查询单个 IP 的地区码，非法地址返回默认地区"""
+        try:
+            version, value = ip_to_int(ip)
+        except ValueError:
+            return self.default
+        return self.lookup_int(version, value)
+
+    def classify_many(self, ips: Iterable[str]) -> list[str]:
+        """
+        批量分类一整列 IP
+
+        Args:
+            ips: IP 字符串序列
+
+        Returns:
+            与输入一一对应的地区码列表
+        """
+        pton = socket.inet_pton
+        af4, af6 = socket.AF_INET, socket.AF_INET6
+        from_bytes = int.from_bytes
+        s4, e4, r4 = self._starts[4], self._ends[4], self._regions[4]
+        s6, e6, r6 = self._starts[6], self._ends[6], self._regions[6]
+        default = self.default
+
+        out = []
+        append = out.append
+        for ip in ips:
+            try:
+                value = from_bytes(pton(af4, ip), "big")
+                starts, ends, regions = s4, e4, r4
+            except OSError:
+                try:
+                    value = from_bytes(pton(af6, ip), "big")
+                    starts, ends, regions = s6, e6, r6
+                except OSError:
+                    append(default)
+                    continue
+            i = bisect_right(starts, value) - 1
+            append(regions[i] if i >= 0 and value <= ends[i] else default)
+        return out
+
+
+def load_region_index(ip_files: Iterable[Path] = DEFAULT_IP_FILES,
+                      override_file: Path | None = DEFAULT_OVERRIDE_FILE,
+                      default: str = DEFAULT_REGION,
+                      resolved: dict[str, str] | None = None) -> RegionIndex:
+    """
+    从 ip.txt/ipv6.txt 和覆盖表构建地区索引，缺失的文件会被跳过
+
+    Args:
+        ip_files: CIDR 列表文件（可带第二列地区码）
+        override_file: CIDR→地区码 覆盖表
+        default: 查询不到时返回的地区码
+        resolved: 实测得到的 CIDR→地区码（如 colo.py 按 /24 解析的数据中心），优先级最高
+
+    Returns:
+        RegionIndex 实例
+    """
+    entries = []
+    for path in ip_files:
+        if not Path(path).exists():
+            continue
+        for cidr, region in read_cidr_file(Path(path)):
+            entries.append((cidr, region or default, 0))
+    if override_file is not None and Path(override_file).exists():
+        for cidr, region in read_cidr_file(Path(override_file)):
+            entries.append((cidr, region or default, 1))
+    for cidr, region in (resolved or {}).items():
+        entries.append((cidr, region, 2))
+    return RegionIndex(entries, default)
+
+
+_default_index: RegionIndex | None = None
+
+
+def get_default_index() -> RegionIndex:
+    """返回（惰性构建的）仓库默认地区索引"""
+    global _default_index
+    if _default_index is None:
+        _default_index = load_region_index()
+    return _default_index
+
+
+def set_resolved_regions(resolved: dict[str, str]) -> None:
+    """用实测得到的 CIDR→地区码 重建默认索引（之后的 classify_ips 等都会使用）；传入空字典即恢复"""
+    global _default_index
+    _default_index = load_region_index(resolved=resolved)
+
+
+def get_region_for_ip(ip: str) -> str:
+    """基于Cloudflare IP段的地区检测（使用仓库默认地区索引）"""
+    return get_default_index().lookup(ip)
+
+
+def classify_ips(ips: Iterable[str]) -> list[str]:
+    """批量地区检测（使用仓库默认地区索引）"""
+    return get_default_index().classify_many(ips)
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按天追加的测速结果归档
+
+每天提交一份完整的 result.csv 会让仓库历史越来越大。归档把每次运行压缩成一条记录，
+追加到同一个文件末尾：
+
+    记录头  <4s I d I I I>  魔数、日期（YYYYMMDD）、时间戳、行数、负载长度、负载 CRC32
+    负载    zlib 压缩的列式数据：
+            varint 长度 + 元数据 JSON（CSV 表头、每列的编码方式、IPv4/IPv6 行数）
+            IPv4 地址升序排列后的差值（varint），IPv6 同理
+            每列一段：数值列按列内最大小数位数量化为整数（zigzag varint），
+                     列内小数位数不一致时另存每个值的位数；
+                     其余列（地区码、数据中心等）存类别表 + 类别编码
+
+IP 排序后相邻差值很小，数值列只保留 CSV 中写出的精度，压缩后每行只占几个字节。
+读取时只需依次读取记录头并跳过负载，就能按日期定位任意一次运行，无需解压其他记录。
+追加中途被打断留下的残缺记录会在读取时忽略，并在下次追加前截掉。
+
+导出的 CSV 与原文件列和值逐字相同（包括每个值的小数位数），行按 (丢包率, 平均延迟) 重新排序。
+
+用法：
+    python scripts/result_archive.py append --archive results.archive --csv result.csv
+    python scripts/result_archive.py list --archive results.archive
+    python scripts/result_archive.py export --archive results.archive --date 2026-10-17 --out result.csv
+"""
+
+import os
+import csv
+import json
+import zlib
+import socket
+import struct
+import argparse
+from decimal import Decimal
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Iterable, NamedTuple
+
+from tcp_probe import float_at
+
+MAGIC = b"CFA1"
+RECORD = struct.Struct("<4sIdIII")
+
+# 按数值存储的列最多允许的小数位数，超过时整列按类别存储
+MAX_DECIMALS = 4
+
+
+class RunInfo(NamedTuple):
+    date: str  # YYYY-MM-DD（UTC）
+    timestamp: float
+    rows: int
+    offset: int  # 记录头在文件中的偏移
+    size: int  # 压缩后的负载长度
+
+
+# ---- varint ----
+
+def _put_varint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+# ---- 列编码 ----
+
+def _decimals(text: str) -> int | None:
+    """数值的小数位数；不是普通十进制数（空串、N/A、科学计数法等）时返回 None"""
+    body = text[1:] if text.startswith("-") else text
+    whole, _, frac = body.partition(".")
+    if not whole.isdigit() or (frac and not frac.isdigit()) or body.endswith("."):
+        return None
+    return len(frac)
+
+
+def _format_fixed(q: int, decimals: int) -> str:
+    if not decimals:
+        return str(q)
+    whole, frac = divmod(abs(q), 10 ** decimals)
+    return f"{'-' if q < 0 else ''}{whole}.{frac:0{decimals}d}"
+
+
+def _encode_column(values: list[str], out: bytearray) -> dict:
+    """写出一列，返回该列的元数据"""
+    decimals = [_decimals(v) for v in values]
+    if values and None not in decimals and max(decimals) <= MAX_DECIMALS:
+        d = max(decimals)
+        quantized = [int(Decimal(v).scaleb(d)) for v in values]
+        # 只有能按原样写回的列才按数值存储（排除 -0.00、前导零等写法）
+        if all(_format_fixed(q // 10 ** (d - k), k) == v for q, k, v in zip(quantized, decimals, values)):
+            for q in quantized:
+                _put_varint(out, _zigzag(q))
+            if min(decimals) == d:
+                return {"kind": "num", "decimals": d}
+            # 列内小数位数不一致时另存每个值比最大位数少几位
+            for k in decimals:
+                _put_varint(out, d - k)
+            return {"kind": "num", "decimals": d, "mixed": True}
+
+    categories: dict[str, int] = {}
+    for v in values:
+        _put_varint(out, categories.setdefault(v, len(categories)))
+    return {"kind": "cat", "values": list(categories)}
+
+
+def _decode_column(meta: dict, count: int, data: bytes, pos: int) -> tuple[list[str], int]:
+    out = []
+    if meta["kind"] == "num":
+        d = meta["decimals"]
+        quantized = []
+        for _ in range(count):
+            n, pos = _get_varint(data, pos)
+            quantized.append(_unzigzag(n))
+        if meta.get("mixed"):
+            for q in quantized:
+                trim, pos = _get_varint(data, pos)
+                out.append(_format_fixed(q // 10 ** trim, d - trim))
+        else:
+            out = [_format_fixed(q, d) for q in quantized]
+    else:
+        names = meta["values"]
+        for _ in range(count):
+            n, pos = _get_varint(data, pos)
+            out.append(names[n])
+    return out, pos
+
+
+def encode_run(header: list[str], rows: Iterable[list[str]]) -> tuple[bytes, int]:
+    """
+    把一次运行的 CSV 行编码为压缩负载
+
+    Args:
+        header: CSV 表头（第一列为 IP）
+        rows: 数据行；IP 无法解析的行会被丢弃，缺少的尾部字段按空串处理
+
+    Returns:
+        (压缩后的负载, 行数)
+    """
+    keyed = []
+    width = len(header)
+    for row in rows:
+        if not row:
+            continue
+        ip = row[0].strip()
+        try:
+            key = (0, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big"))
+        except OSError:
+            try:
+                key = (1, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big"))
+            except OSError:
+                continue
+        fields = row[1:width] + [""] * (width - len(row))
+        keyed.append((key, fields))
+    keyed.sort(key=lambda item: item[0])
+
+    body = bytearray()
+    n4 = sum(1 for (family, _), _ in keyed if family == 0)
+    prev = {0: 0, 1: 0}
+    for (family, value), _ in keyed:
+        _put_varint(body, value - prev[family])
+        prev[family] = value
+
+    columns = [_encode_column([fields[i] for _, fields in keyed], body) for i in range(width - 1)]
+    meta = json.dumps({"header": header, "columns": columns, "v4": n4, "v6": len(keyed) - n4},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    prefix = bytearray()
+    _put_varint(prefix, len(meta))
+    return zlib.compress(bytes(prefix + meta + body), 9), len(keyed)
+
+
+def decode_run(payload: bytes) -> tuple[list[str], list[list[str]]]:
+    """
+    解码 encode_run 的负载
+
+    Returns:
+        (表头, 按 IP 排序的数据行)
+    """
+    data = zlib.decompress(payload)
+    length, pos = _get_varint(data, 0)
+    meta = json.loads(data[pos:pos + length].decode("utf-8"))
+    pos += length
+
+    ips = []
+    for family, count in ((socket.AF_INET, meta["v4"]), (socket.AF_INET6, meta["v6"])):
+        size = 4 if family == socket.AF_INET else 16
+        value = 0
+        for _ in range(count):
+            delta, pos = _get_varint(data, pos)
+            value += delta
+            ips.append(socket.inet_ntop(family, value.to_bytes(size, "big")))
+
+    columns = []
+    for column in meta["columns"]:
+        values, pos = _decode_column(column, len(ips), data, pos)
+        columns.append(values)
+    return meta["header"], [[ip, *fields] for ip, *fields in zip(ips, *columns)]
+
+
+def sort_like_result(rows: list[list[str]]) -> list[list[str]]:
+    """按 (丢包率, 平均延迟) 升序排列，与 cfst / tcp_probe 写出的顺序一致"""
+    return sorted(rows, key=lambda row: (float_at(row, 3, 1.0), float_at(row, 4, 9999.0)))
+
+
+class ResultArchive:
+    """
+    归档文件
+
+    Args:
+        path: 归档文件路径（不存在时在第一次追加时创建）
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def _scan(self) -> tuple[list[RunInfo], int]:
+        """依次读取记录头，返回 (完整的记录, 最后一条完整记录的结束位置)"""
+        runs: list[RunInfo] = []
+        end = 0
+        if not self.path.exists():
+            return runs, end
+        total = self.path.stat().st_size
+        with open(self.path, "rb") as f:
+            while True:
+                head = f.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    break
+                magic, day, timestamp, rows, size, _ = RECORD.unpack(head)
+                if magic != MAGIC or end + RECORD.size + size > total:
+                    break
+                runs.append(RunInfo(f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}",
+                                    timestamp, rows, end, size))
+                end += RECORD.size + size
+                f.seek(end)
+        return runs, end
+
+    def runs(self) -> list[RunInfo]:
+        """所有运行（按追加顺序）"""
+        return self._scan()[0]
+
+    def append(self, header: list[str], rows: Iterable[list[str]], timestamp: float | None = None) -> RunInfo:
+        """
+        追加一次运行
+
+        Args:
+            header: CSV 表头
+            rows: 数据行
+            timestamp: 运行时间（Unix 时间戳），默认当前时间；日期按 UTC 计算
+        """
+        payload, count = encode_run(header, rows)
+        timestamp = datetime.now(timezone.utc).timestamp() if timestamp is None else timestamp
+        when = datetime.fromtimestamp(timestamp, timezone.utc)
+        day = when.year * 10000 + when.month * 100 + when.day
+        _, end = self._scan()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "r+b" if self.path.exists() else "wb") as f:
+            # 截掉上次被打断时留下的残缺记录
+            f.truncate(end)
+            f.seek(end)
+            f.write(RECORD.pack(MAGIC, day, timestamp, count, len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return RunInfo(when.strftime("%Y-%m-%d"), timestamp, count, end, len(payload))
+
+    def append_csv(self, csv_path: Path, timestamp: float | None = None) -> RunInfo:
+        """把一份 result.csv 追加为一次运行"""
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            return self.append(header, reader, timestamp)
+
+    def find(self, date: str | None = None) -> RunInfo:
+        """
+        按日期查找运行；同一天有多次运行时取最后一次，date 为 None 时取最新的运行
+
+        Raises:
+            KeyError: 没有对应的运行
+        """
+        runs = self.runs()
+        if date is not None:
+            runs = [run for run in runs if run.date == date]
+        if not runs:
+            raise KeyError(f"No archived run for {date or 'any date'} in {self.path}")
+        return runs[-1]
+
+    def read(self, run: RunInfo | str | None = None) -> tuple[list[str], list[list[str]]]:
+        """
+        读取一次运行（RunInfo、日期字符串或 None 表示最新）
+
+        Returns:
+            (表头, 按 IP 排序的数据行)
+
+        Raises:
+            ValueError: 负载校验失败
+        """
+        if not isinstance(run, RunInfo):
+            run = self.find(run)
+        with open(self.path, "rb") as f:
+            f.seek(run.offset)
+            *_, crc = RECORD.unpack(f.read(RECORD.size))
+            payload = f.read(run.size)
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupt archived run at offset {run.offset} in {self.path}")
+        return decode_run(payload)
+
+    def export_csv(self, run: RunInfo | str | None, csv_path: Path) -> int:
+        """把一次运行写回 result.csv 格式，返回行数"""
+        header, rows = self.read(run)
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(sort_like_result(rows))
+        return len(rows)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Append-only, delta-encoded archive of result.csv runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    append = sub.add_parser("append", help="archive a result.csv")
+    append.add_argument("--csv", type=Path, default=Path("result.csv"))
+    listing = sub.add_parser("list", help="list archived runs")
+    export = sub.add_parser("export", help="write an archived run back to CSV")
+    export.add_argument("--date", default=None, help="YYYY-MM-DD (UTC); default: latest run")
+    export.add_argument("--out", type=Path, default=Path("result.csv"))
+    for p in (append, listing, export):
+        p.add_argument("--archive", type=Path, default=Path("results.archive"))
+    args = parser.parse_args(argv)
+
+    archive = ResultArchive(args.archive)
+    if args.command == "append":
+        info = archive.append_csv(args.csv)
+        print(json.dumps({"date": info.date, "rows": info.rows, "bytes": info.size,
+                          "csv_bytes": args.csv.stat().st_size}))
+    elif args.command == "list":
+        for info in archive.runs():
+            print(json.dumps({"date": info.date, "timestamp": info.timestamp, "rows": info.rows,
+                              "bytes": info.size}))
+    else:
+        try:
+            rows = archive.export_csv(args.date, args.out)
+        except KeyError as e:
+            parser.error(str(e.args[0]))
+        print(f"Wrote {rows} rows to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
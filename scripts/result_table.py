@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+紧凑的列式测速结果容器
+
+每行只占约 30 字节：IPv4 地址为 uint32，延迟/丢包率/抖动/速度/P95/P99 为 float32，地区为 2 字节
+类别编码（地区名只存一份）。IPv6 行很少，单独存放其行号和 16 字节地址。
+排序、过滤、Top-K、按地区选择都只在行号数组上进行，不为每行创建元组或字符串。
+过滤按行流式写入结果数组；排序（argsort、order、rank_of 的地址索引）在纯 Python 中只能借助
+sorted()，排序期间会有一个 N 个行号的临时列表，排好后立即转为 uint32 数组并释放。
+
+可以保存为二进制文件，重新加载时用 mmap 直接映射各列（零拷贝）：
+
+    头部   <8s H H Q Q I>  魔数、版本、保留、行数、IPv6 行数、类别 JSON 长度
+    类别   UTF-8 JSON 数组，补齐到 8 字节
+    列     addr(u32) latency(f32) loss(f32) jitter(f32) speed(f32) p95(f32) p99(f32)
+           region(u16, 补齐到 4 字节) v6_rows(u32) v6_addr(16 字节/行)
+    所有数值均为小端序。版本 1 的文件没有 p95/p99 列，打开时这两列直接使用 latency；
+    版本 1、2 的 region 为 u8。
+
+CSV 没有分位数列（cfst 的结果）时 p95/p99 同样取平均延迟，按尾延迟排序时退化为按平均延迟排序。
+"""
+
+import os
+import csv
+import sys
+import json
+import mmap
+import heapq
+import socket
+import struct
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable
+
+from region_index import RegionIndex, get_default_index
+from tcp_probe import JITTER_COLUMN, P95_COLUMN, P99_COLUMN, float_at
+
+MAGIC = b"CFSTRES1"
+FORMAT_VERSION = 3
+HEADER = struct.Struct("<8sHHQQI")
+
+FLOAT_COLUMNS = ("latency", "loss", "jitter", "speed", "p95", "p99")
+
+# 可以作为排序依据的列（见 ResultTable.rank_by）
+RANK_KEYS = ("latency", "p95", "p99")
+
+LOAD_CHUNK = 65536
+
+# region 列为 u16
+MAX_CATEGORIES = 1 << 16
+
+
+def _pad(n: int, align: int) -> int:
+    return -n % align
+
+
+class ResultTable:
+    """
+    列式测速结果
+
+    addr 中 IPv6 行记为 0；IPv6 行的行号（升序）和地址分别保存在 v6_rows / v6_addr 中。
+    从二进制文件 open() 得到的表各列是只读的 memoryview，用完需要 close()。
+    """
+
+    def __init__(self) -> None:
+        self.addr = array("I")
+        self.latency = array("f")
+        self.loss = array("f")
+        self.jitter = array("f")
+        self.speed = array("f")
+        self.p95 = array("f")
+        self.p99 = array("f")
+        self.region = array("H")
+        self.categories: list[str] = []
+        self.v6_rows = array("I")
+        self.v6_addr = bytearray()
+        self.rank_key = "latency"
+        self._mmap: mmap.mmap | None = None
+        self._views: list[memoryview] = []
+        self._order: array | None = None
+        self._ordered_addr: array | None = None
+        self._by_addr: array | None = None
+        self._v6_positions: dict[bytes, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.addr)
+
+    def __enter__(self) -> "ResultTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- 单行访问 ----
+
+    def _v6_slot(self, row: int) -> int | None:
+        i = bisect_left(self.v6_rows, row)
+        return i if i < len(self.v6_rows) and self.v6_rows[i] == row else None
+
+    def ip_at(self, row: int) -> str:
+        slot = self._v6_slot(row) if self.v6_rows else None
+        if slot is not None:
+            return socket.inet_ntop(socket.AF_INET6, bytes(self.v6_addr[16 * slot:16 * slot + 16]))
+        return socket.inet_ntoa(self.addr[row].to_bytes(4, "big"))
+
+    def region_at(self, row: int) -> str:
+        return self.categories[self.region[row]]
+
+    def codes_for(self, regions: Iterable[str]) -> list[int]:
+        """地区名 → 类别编码；不存在的地区会新增一个类别（不会出现在任何行中）"""
+        lookup = {name: code for code, name in enumerate(self.categories)}
+        out = []
+        for name in regions:
+            if name not in lookup:
+                if len(self.categories) >= MAX_CATEGORIES:
+                    raise ValueError(f"Too many region categories (limit {MAX_CATEGORIES})")
+                lookup[name] = len(self.categories)
+                self.categories.append(name)
+            out.append(lookup[name])
+        return out
+
+    # ---- 构建 ----
+
+    @classmethod
+    def from_csv(cls, csv_path: Path, index: RegionIndex | None = None) -> "ResultTable":
+        """
+        流式读取 cfst / tcp_probe 的 result.csv
+
+        Args:
+            csv_path: CSV 文件路径
+            index: 地区索引，默认使用 get_default_index()
+        """
+        index = index or get_default_index()
+        table = cls()
+        pton = socket.inet_pton
+        af4, af6 = socket.AF_INET, socket.AF_INET6
+        from_bytes = int.from_bytes
+        addr_append = table.addr.append
+        latency_append = table.latency.append
+        loss_append = table.loss.append
+        jitter_append = table.jitter.append
+        speed_append = table.speed.append
+        p95_append = table.p95.append
+        p99_append = table.p99.append
+        pending_v6: list[tuple[int, bytes]] = []
+
+        def classify(start: int) -> None:
+            # 按整数地址批量分类，IPv6 行单独查询
+            regions = index.lookup_many_int(4, table.addr[start:])
+            for row, packed in pending_v6:
+                regions[row - start] = index.lookup_int(6, from_bytes(packed, "big"))
+            pending_v6.clear()
+            table.region.extend(table.codes_for(regions))
+
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return table
+            jitter_idx = header.index(JITTER_COLUMN) if JITTER_COLUMN in header else -1
+            p95_idx = header.index(P95_COLUMN) if P95_COLUMN in header else -1
+            p99_idx = header.index(P99_COLUMN) if P99_COLUMN in header else -1
+
+            chunk_start = 0
+            for row in reader:
+                if not row:
+                    continue
+                ip = row[0].strip()
+                if not ip:
+                    continue
+
+                try:
+                    addr_append(from_bytes(pton(af4, ip), "big"))
+                except OSError:
+                    try:
+                        packed = pton(af6, ip)
+                    except OSError:
+                        continue
+                    pending_v6.append((len(table.addr), packed))
+                    table.v6_rows.append(len(table.addr))
+                    table.v6_addr += packed
+                    addr_append(0)
+                try:
+                    latency, loss, speed = float(row[4]), float(row[3]), float(row[5])
+                except (ValueError, IndexError):
+                    # 与 iter_result_records 相同的缺省值
+                    latency, loss, speed = float_at(row, 4, 9999.0), float_at(row, 3, 1.0), float_at(row, 5, 0.0)
+                latency_append(latency)
+                loss_append(loss)
+                speed_append(speed)
+                jitter_append(float_at(row, jitter_idx, 0.0) if jitter_idx >= 0 else 0.0)
+                p95_append(float_at(row, p95_idx, latency) if p95_idx >= 0 else latency)
+                p99_append(float_at(row, p99_idx, latency) if p99_idx >= 0 else latency)
+
+                if len(table.addr) - chunk_start >= LOAD_CHUNK:
+                    classify(chunk_start)
+                    chunk_start = len(table.addr)
+            classify(chunk_start)
+        return table
+
+    # ---- 行号数组上的操作 ----
+
+    def argsort(self, key: str = "latency", rows: Iterable[int] | None = None) -> array:
+        """按某一列升序排列的行号（稳定排序；排序期间临时占用一个行号列表）"""
+        column = getattr(self, key)
+        return array("I", sorted(range(len(self)) if rows is None else rows, key=column.__getitem__))
+
+    @property
+    def order(self) -> array:
+        """按 rank_key 列（默认平均延迟）升序的行号（相同时保持文件顺序），结果会被缓存"""
+        if self._order is None:
+            self._order = self.argsort(self.rank_key)
+        return self._order
+
+    def rank_by(self, key: str) -> None:
+        """
+        更换排序依据，order、select_top、rank_of 随之改变
+
+        Args:
+            key: RANK_KEYS 之一（latency / p95 / p99）
+        """
+        if key not in RANK_KEYS:
+            raise ValueError(f"Unknown rank key: {key} (choose from {', '.join(RANK_KEYS)})")
+        if key != self.rank_key:
+            self.rank_key = key
+            self._order = self._ordered_addr = self._by_addr = None
+
+    def filter(self, max_latency: float | None = None, max_loss: float | None = None,
+               regions: Iterable[str] | None = None, rows: Iterable[int] | None = None) -> array:
+        """满足条件的行号（各条件串成生成器，逐行写入结果数组，不生成中间列表）"""
+        rows = range(len(self)) if rows is None else rows
+        if max_latency is not None:
+            latency = self.latency
+            rows = (r for r in rows if latency[r] <= max_latency)
+        if max_loss is not None:
+            loss = self.loss
+            rows = (r for r in rows if loss[r] <= max_loss)
+        if regions is not None:
+            codes = self.codes_for(regions)
+            mask = bytearray(len(self.categories))
+            for code in codes:
+                mask[code] = 1
+            region = self.region
+            rows = (r for r in rows if mask[region[r]])
+        return array("I", rows)
+
+    def top_k(self, k: int, key: str = "latency", rows: Iterable[int] | None = None) -> array:
+        """某一列最小的 k 行（稳定：值相同时行号小者优先）"""
+        column = getattr(self, key)
+        rows = range(len(self)) if rows is None else rows
+        return array("I", heapq.nsmallest(k, rows, key=column.__getitem__))
+
+    def select_top(self, regions: list[str], max_per_region: int = 10,
+                   max_total: int = 100) -> tuple[array, list[int]]:
+        """
+        按地区选择延迟（rank_key 列）最低的行，规则与 parse_top_ips_by_region 的三轮选择相同
+
+        Returns:
+            (选中的行号, 每轮结束后的已选数量)
+        """
+        order = self.order
+        region = self.region
+        priority = {code: 0 for code in self.codes_for(regions)}
+        selected = array("I")
+        taken = set()
+        after_pass = []
+
+        # 第一轮：优先地区，每个地区最多 max_per_region 个
+        for row in order:
+            code = region[row]
+            if code in priority and priority[code] < max_per_region:
+                selected.append(row)
+                taken.add(row)
+                priority[code] += 1
+            if len(selected) >= max_total:
+                break
+        after_pass.append(len(selected))
+
+        # 第二轮：非优先地区；第三轮：不分地区补足
+        for accept in (lambda code: code not in priority, lambda code: True):
+            if len(selected) < max_total:
+                for row in order:
+                    if row not in taken and accept(region[row]):
+                        selected.append(row)
+                        taken.add(row)
+                        if len(selected) >= max_total:
+                            break
+            after_pass.append(len(selected))
+
+        return selected, after_pass
+
+    def rank_of(self, ip: str) -> int | None:
+        """
+        IP 在按延迟排序后的列表中的位置（从 0 开始），不存在时返回 None
+
+        第一次调用时建立 按地址排序的位置 索引（uint32 数组），之后每次查询 O(log N)。
+        同一 IP 出现多次时返回最靠前的位置。
+        """
+        if self._by_addr is None:
+            self._ordered_addr = array("I", map(self.addr.__getitem__, self.order))
+            # 稳定排序：地址相同的位置保持升序，二分找到的第一个即最靠前的位置
+            self._by_addr = array("I", sorted(range(len(self)), key=self._ordered_addr.__getitem__))
+            self._v6_positions = {}
+            if self.v6_rows:
+                for pos, row in enumerate(self.order):
+                    slot = self._v6_slot(row)
+                    if slot is not None:
+                        self._v6_positions.setdefault(bytes(self.v6_addr[16 * slot:16 * slot + 16]), pos)
+
+        try:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+        except OSError:
+            try:
+                return self._v6_positions.get(socket.inet_pton(socket.AF_INET6, ip))
+            except OSError:
+                return None
+        i = bisect_left(self._by_addr, value, key=self._ordered_addr.__getitem__)
+        while i < len(self._by_addr):
+            pos = self._by_addr[i]
+            if self._ordered_addr[pos] != value:
+                break
+            # 地址为 0 的位置也可能是 IPv6 行
+            if self._v6_slot(self.order[pos]) is None:
+                return pos
+            i += 1
+        return None
+
+    # ---- 二进制格式 ----
+
+    def _columns(self) -> list:
+        return [self.addr] + [getattr(self, name) for name in FLOAT_COLUMNS]
+
+    def save(self, path: Path) -> None:
+        """写出二进制文件（先写临时文件再原子替换）"""
+        path = Path(path)
+        categories = json.dumps(self.categories, ensure_ascii=False).encode("utf-8")
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(self), len(self.v6_rows), len(categories)))
+            f.write(categories + bytes(_pad(HEADER.size + len(categories), 8)))
+            for column in self._columns() + [self.region, self.v6_rows]:
+                data = array(column.typecode if isinstance(column, array) else column.format, column)
+                if sys.byteorder == "big":
+                    data.byteswap()
+                f.write(data.tobytes())
+                if column is self.region:
+                    f.write(bytes(_pad(data.itemsize * len(self), 4)))
+            f.write(bytes(self.v6_addr))
+        os.replace(tmp, path)
+
+    @classmethod
+    def open(cls, path: Path) -> "ResultTable":
+        """
+        用 mmap 打开二进制文件，各列直接映射为只读 memoryview（零拷贝）
+
+        大端序机器上会退化为拷贝并转换字节序。
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f"Not a result table file: {path}")
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, rows, v6_rows, cat_len = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or not 1 <= version <= FORMAT_VERSION:
+            mm.close()
+            raise ValueError(f"Not a result table file: {path}")
+
+        table = cls()
+        table._mmap = mm
+        offset = HEADER.size
+        table.categories = json.loads(bytes(mm[offset:offset + cat_len]).decode("utf-8"))
+        offset += cat_len + _pad(HEADER.size + cat_len, 8)
+
+        base = memoryview(mm)
+        table._views.append(base)
+
+        def take(fmt: str, count: int, size: int):
+            nonlocal offset
+            view = base[offset:offset + count * size]
+            offset += count * size
+            if sys.byteorder == "big" and size > 1:
+                data = array(fmt, view.tobytes())
+                data.byteswap()
+                return data
+            view = view.cast(fmt)
+            table._views.append(view)
+            return view
+
+        table.addr = take("I", rows, 4)
+        for name in FLOAT_COLUMNS if version >= 2 else FLOAT_COLUMNS[:4]:
+            setattr(table, name, take("f", rows, 4))
+        if version < 2:
+            table.p95 = table.p99 = table.latency
+        region_size = 2 if version >= 3 else 1
+        table.region = take("H" if version >= 3 else "B", rows, region_size)
+        offset += _pad(region_size * rows, 4)
+        table.v6_rows = take("I", v6_rows, 4)
+        table.v6_addr = take("B", v6_rows * 16, 1)
+        return table
+
+    def close(self) -> None:
+        """释放 mmap（仅对 open() 得到的表有效）"""
+        if self._mmap is None:
+            return
+        self._order = self._ordered_addr = self._by_addr = None
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+        self._mmap = None
+
+
+def is_table_file(path: Path) -> bool:
+    """文件是否为 ResultTable 的二进制格式"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def load_table(path: Path, index: RegionIndex | None = None) -> ResultTable:
+    """按文件内容自动选择：二进制文件用 mmap 打开，否则按 CSV 读取"""
+    if is_table_file(path):
+        return ResultTable.open(path)
+    return ResultTable.from_csv(path, index)
@@ -6,12 +6,34 @@ import sys
 import csv
 import json
 import shutil
+import hashlib
+import secrets
 import tarfile
+import tempfile
 import zipfile
-import urllib.request
 import subprocess
 import platform
 from pathlib import Path
+from typing import Iterable, Iterator
+
+from bandit import generate_candidates, load_arms, stats_from_history
+from churn import top_set_change
+from cidr_walk import walk_candidates
+from colo import (DEFAULT_TRACE_URL, DEFAULT_TTL as DEFAULT_COLO_TTL, ColoCache, apply_colo_results,
+                  resolve_colos, top_ips)
+from daemon import HysteresisSet, run_daemon, tcp_prober
+from downloader import download_many
+from early_stop import PerFamilyTracker, QuotaTracker
+from download_stage import apply_download_results, run_download_stage
+from history import open_history, record_run, record_speeds, stability_scores
+from region_index import set_resolved_regions
+from result_archive import ResultArchive
+from result_table import ResultTable, is_table_file
+from scoring import iter_candidates, make_scorer, parse_weights, select_scored
+from selection import select_streaming
+from sharding import run_sharded
+from tcp_probe import float_at, run_probes, write_result_csv
+from telemetry import Telemetry, counted
 
 # CloudflareSpeedTest 发布版本
 RELEASE_VERSION = "v2.3.4"
@@ -19,6 +41,7 @@ RELEASE_BASE_URL = f"https://github.com/XIU2/CloudflareSpeedTest/releases/downlo
 
 # ip.txt 的官方原始地址（master 分支）
 IP_TXT_URL = "https://raw.githubusercontent.com/XIU2/CloudflareSpeedTest/master/ip.txt"  # :contentReference[oaicite:1]{index=1}
+IPV6_TXT_URL = "https://raw.githubusercontent.com/XIU2/CloudflareSpeedTest/master/ipv6.txt"
 
 def get_platform_url() -> str:
     """
@@ -60,131 +83,130 @@ def get_platform_url() -> str:
     
     return f"{RELEASE_BASE_URL}/{filename}"
 
-def download(url: str, dst: Path) -> None:
-    dst.parent.mkdir(parents=True, exist_ok=True)
-    req = urllib.request.Request(url, headers={"User-Agent": "MyAutoScript/1.0"})
-    with urllib.request.urlopen(req, timeout=60) as r, open(dst, "wb") as f:
-        shutil.copyfileobj(r, f)
+# 压缩包中 cfst 可执行文件可能的名字
+CFST_MEMBER_NAMES = ("cfst", "cfst.exe", "CloudflareST", "CloudflareST.exe", "cloudflareST")
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _copy_cfst_member(archive: Path, dst) -> tuple[str, str]:
+    """
+    只把压缩包中的 cfst 可执行文件流式复制到 dst，不解压其它文件
 
-def extract_archive(archive: Path, out_dir: Path) -> None:
-    out_dir.mkdir(parents=True, exist_ok=True)
+    Returns:
+        (成员文件名, 成员内容的 SHA-256)
+    """
     name = archive.name.lower()
+    h = hashlib.sha256()
 
-    if name.endswith(".tar.gz") or name.endswith(".tgz"):
-        with tarfile.open(archive, "r:gz") as t:
-            t.extractall(out_dir)
-        return
+    def copy(src) -> None:
+        for block in iter(lambda: src.read(1 << 20), b""):
+            h.update(block)
+            dst.write(block)
 
-    if name.endswith(".zip"):
+    if name.endswith(".tar.gz") or name.endswith(".tgz"):
+        with tarfile.open(archive, "r|gz") as t:
+            for member in t:
+                if member.isfile() and Path(member.name).name in CFST_MEMBER_NAMES:
+                    copy(t.extractfile(member))
+                    return Path(member.name).name, h.hexdigest()
+    elif name.endswith(".zip"):
         with zipfile.ZipFile(archive, "r") as z:
-            z.extractall(out_dir)
-        return
+            for info in z.infolist():
+                if not info.is_dir() and Path(info.filename).name in CFST_MEMBER_NAMES:
+                    with z.open(info) as src:
+                        copy(src)
+                    return Path(info.filename).name, h.hexdigest()
+    else:
+        raise RuntimeError(f"Unsupported archive format: {archive}")
 
-    raise RuntimeError(f"Unsupported archive format: {archive}")
+    raise RuntimeError(f"cfst binary not found in {archive}")
 
-def find_cfst(bin_dir: Path) -> Path:
-    for c in (bin_dir / "cfst", bin_dir / "CloudflareST", bin_dir / "cloudflareST"):
-        if c.exists():
-            return c
-    for p in bin_dir.rglob("*"):
-        if p.is_file() and p.name in ("cfst", "CloudflareST"):
-            return p
-    raise RuntimeError("cfst binary not found after extraction")
+def install_cfst(archive: Path, cache_dir: Path, version: str = RELEASE_VERSION,
+                 expected_sha256: str | None = None) -> Path:
+    """
+    从按内容寻址的缓存中取得 cfst 可执行文件，缓存未命中时才从压缩包中提取
+    
+    缓存键为 发布版本 + 平台 + 压缩包 SHA-256；命中时完全跳过解压。
+    未命中时只流式提取 cfst 一个成员，写入临时文件、fsync 并校验后原子重命名。
+    
+    Args:
+        archive: cfst 发布压缩包
+        cache_dir: 缓存根目录
+        version: 发布版本
+        expected_sha256: 可选，压缩包应有的 SHA-256（不一致时报错）
+    
+    Returns:
+        可执行文件路径
+    """
+    digest = file_sha256(archive)
+    if expected_sha256 and digest != expected_sha256.strip().lower():
+        raise RuntimeError(f"Checksum mismatch for {archive}: {digest}")
+
+    platform_tag = archive.name.split(".")[0]
+    entry = cache_dir / f"{version}-{platform_tag}-{digest[:16]}"
+    meta_path = entry / "cfst.json"
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        binary = entry / meta["name"]
+        if meta.get("archive_sha256") == digest and binary.exists() and binary.stat().st_size == meta["size"]:
+            return binary
+
+    entry.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=entry, prefix=".cfst-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            member_name, member_sha256 = _copy_cfst_member(archive, f)
+            f.flush()
+            os.fsync(f.fileno())
+        if file_sha256(Path(tmp)) != member_sha256:
+            raise RuntimeError(f"Checksum mismatch after extracting {member_name} from {archive}")
+        os.chmod(tmp, 0o755)
+        binary = entry / member_name
+        os.replace(tmp, binary)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    meta = {
+        "version": version,
+        "archive": archive.name,
+        "archive_sha256": digest,
+        "name": member_name,
+        "sha256": member_sha256,
+        "size": binary.stat().st_size,
+    }
+    tmp_meta = entry / "cfst.json.tmp"
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp_meta, meta_path)
+
+    # 清理同一平台的旧缓存
+    for stale in cache_dir.glob(f"*-{platform_tag}-*"):
+        if stale != entry and stale.is_dir():
+            shutil.rmtree(stale, ignore_errors=True)
+    return binary
 
 def run_cmd(cmd: list[str], cwd: Path | None = None) -> None:
     print(">>", " ".join(cmd))
     subprocess.run(cmd, cwd=str(cwd) if cwd else None, check=True)
 
-def parse_top_ips_by_region(csv_path: Path, regions: list[str], max_per_region: int = 10, max_total: int = 100) -> list[str]:
+def iter_result_rows(csv_path: Path) -> Iterator[tuple[str, float]]:
     """
-    解析CSV文件，按地区选择最快的前N个IP
+    流式读取 cfst 的 result.csv，逐行产出 (ip, 平均延迟)
     
     Args:
         csv_path: CSV文件路径
-        regions: 优先处理的地区列表
-        max_per_region: 每个地区最多选择的IP数量
-        max_total: 总共最多选择的IP数量
-    
-    Returns:
-        按地区分组选择的IP列表
     """
-    # 基于Cloudflare IP段的地区检测
-    # 参考：https://www.cloudflare.com/ips/
-    def get_region_for_ip(ip: str) -> str:
-        ip_parts = ip.split('.')
-        if len(ip_parts) < 2:
-            return "Other"
-        
-        first_octet = int(ip_parts[0])
-        second_octet = int(ip_parts[1])
-        
-        # 美国IP段 (主要Cloudflare数据中心)
-        # 104.16.0.0 - 104.31.255.255
-        if first_octet == 104 and 16 <= second_octet <= 31:
-            return "US"
-        # 172.64.0.0 - 172.71.255.255
-        elif first_octet == 172 and 64 <= second_octet <= 71:
-            return "US"
-        # 162.158.0.0 - 162.159.255.255
-        elif first_octet == 162 and second_octet in [158, 159]:
-            return "US"
-        # 198.41.128.0 - 198.41.255.255
-        elif first_octet == 198 and second_octet == 41:
-            return "US"
-        # 108.162.192.0 - 108.162.255.255
-        elif first_octet == 108 and second_octet == 162:
-            return "US"
-        # 172.65.0.0 - 172.67.255.255
-        elif first_octet == 172 and 65 <= second_octet <= 67:
-            return "US"
-        # 173.245.48.0 - 173.245.63.255
-        elif first_octet == 173 and second_octet == 245:
-            return "US"
-        # 188.114.96.0 - 188.114.111.255
-        elif first_octet == 188 and second_octet == 114:
-            return "US"
-        
-        # 英国IP段
-        # 141.101.64.0 - 141.101.127.255
-        elif first_octet == 141 and second_octet == 101:
-            return "GB"
-        
-        # 日本IP段
-        # 103.21.244.0 - 103.21.247.255
-        elif first_octet == 103 and second_octet == 21:
-            return "JP"
-        
-        # 韩国IP段
-        # 103.22.200.0 - 103.22.203.255
-        elif first_octet == 103 and second_octet == 22:
-            return "KR"
-        
-        # 新加坡IP段
-        # 103.31.4.0 - 103.31.7.255
-        elif first_octet == 103 and second_octet == 31:
-            return "SG"
-        
-        # 香港IP段
-        # 190.93.240.0 - 190.93.243.255
-        elif first_octet == 190 and second_octet == 93:
-            return "HK"
-        
-        # 印度IP段
-        # 197.234.240.0 - 197.234.243.255
-        elif first_octet == 197 and second_octet == 234:
-            return "IN"
-        
-        # 其他地区
-        else:
-            return "Other"
-    
-    # 读取CSV文件
-    ip_data = []  # 存储(ip, latency, region)元组
     with open(csv_path, "r", encoding="utf-8", newline="") as f:
         reader = csv.reader(f)
         header = next(reader, None)
         if header is None:
-            return []
+            return
         
         # 查找延迟列的索引
         latency_idx = 4 if len(header) > 4 else -1  # 平均延迟在第5列
@@ -203,61 +225,138 @@ def parse_top_ips_by_region(csv_path: Path, regions: list[str], max_per_region:
             except (ValueError, IndexError):
                 latency = 9999.0  # 如果解析失败，设置一个很大的延迟值
             
-            # 获取地区
-            region = get_region_for_ip(ip)
-            
-            ip_data.append((ip, latency, region))
-    
-    # 按延迟排序
-    ip_data.sort(key=lambda x: x[1])
-    
-    # 按地区分组选择IP
-    selected_ips = []
-    region_counts = {}
-    
-    # 优先处理指定的地区
-    for region in regions:
-        region_counts[region] = 0
+            yield ip, latency
+
+def iter_result_records(csv_path: Path) -> Iterator[tuple[str, float, float, float]]:
+    """
+    流式读取 cfst 的 result.csv，逐行产出 (ip, 平均延迟, 丢包率, 下载速度)
     
-    # 首先选择指定地区的IP
-    for ip, latency, region in ip_data:
-        if region in regions and region_counts.get(region, 0) < max_per_region:
-            selected_ips.append(ip)
-            region_counts[region] = region_counts.get(region, 0) + 1
+    Args:
+        csv_path: CSV文件路径
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        if next(reader, None) is None:
+            return
         
-        # 如果达到总数限制，停止
-        if len(selected_ips) >= max_total:
-            break
-    
-    # 如果还有空位，选择其他地区的IP
-    if len(selected_ips) < max_total:
-        for ip, latency, region in ip_data:
-            if ip in selected_ips:  # 跳过已选择的IP
+        for row in reader:
+            if not row:
                 continue
-                
-            if region not in regions:  # 只选择非优先地区的IP
-                selected_ips.append(ip)
             
-            # 如果达到总数限制，停止
-            if len(selected_ips) >= max_total:
-                break
-    
-    # 如果仍然有空位（因为优先地区IP数量不足），从所有IP中选择最快的前N个
-    if len(selected_ips) < max_total:
-        # 重新遍历所有IP，选择最快的前N个（不考虑地区）
-        for ip, latency, region in ip_data:
-            if ip in selected_ips:  # 跳过已选择的IP
+            ip = row[0].strip()
+            if not ip:
                 continue
-                
-            selected_ips.append(ip)
             
-            # 如果达到总数限制，停止
-            if len(selected_ips) >= max_total:
-                break
+            # 平均延迟、丢包率、下载速度分别在第5、4、6列
+            yield ip, float_at(row, 4, 9999.0), float_at(row, 3, 1.0), float_at(row, 5, 0.0)
+
+def parse_top_ips_by_region(csv_path: Path, regions: list[str], max_per_region: int = 10, max_total: int = 100) -> list[str]:
+    """
+    解析CSV文件，按地区选择最快的前N个IP
+    
+    Args:
+        csv_path: CSV文件路径
+        regions: 优先处理的地区列表
+        max_per_region: 每个地区最多选择的IP数量
+        max_total: 总共最多选择的IP数量
     
-    return selected_ips
+    Returns:
+        按地区分组选择的IP列表
+    """
+    # ResultTable 二进制文件直接 mmap，在行号数组上选择
+    if is_table_file(csv_path):
+        with ResultTable.open(csv_path) as table:
+            rows, _ = table.select_top(regions, max_per_region, max_total)
+            return [table.ip_at(row) for row in rows]
+    return select_top_ips(iter_result_rows(csv_path), regions, max_per_region, max_total)
+
+def select_top_ips(rows: Iterable[tuple[str, float]], regions: list[str], max_per_region: int = 10, max_total: int = 100) -> list[str]:
+    """
+    按地区选择最快的前N个IP（可直接消费测速结果，无需经过CSV）
+    
+    单遍读取，每个地区维护有界堆，时间 O(N log K)，内存 O(K)
+    
+    Args:
+        rows: (ip, 平均延迟) 序列
+        regions: 优先处理的地区列表
+        max_per_region: 每个地区最多选择的IP数量
+        max_total: 总共最多选择的IP数量
+    
+    Returns:
+        按地区分组选择的IP列表
+    """
+    return select_streaming(rows, regions, max_per_region, max_total)
 
 def main() -> int:
+    if os.getenv("DAEMON", "0") == "1":
+        return daemon_main()
+    telemetry = Telemetry()
+    try:
+        return run(telemetry)
+    finally:
+        # 各阶段的耗时与资源统计：JSON lines 追加写入，Prometheus textfile 原子覆盖
+        telemetry_jsonl = os.getenv("TELEMETRY_JSONL", "").strip()
+        if telemetry_jsonl:
+            telemetry.write_jsonl(Path(telemetry_jsonl))
+        prometheus_textfile = os.getenv("PROMETHEUS_TEXTFILE", "").strip()
+        if prometheus_textfile:
+            telemetry.write_prometheus(Path(prometheus_textfile))
+        runtime_budget = float(os.getenv("RUNTIME_BUDGET_S", "0"))
+        if runtime_budget > 0 and telemetry.total_wall() > runtime_budget:
+            print(f"::warning::run took {telemetry.total_wall():.1f}s, over the {runtime_budget:.0f}s budget")
+
+def daemon_main() -> int:
+    """
+    常驻模式（DAEMON=1）：每 DAEMON_INCUMBENT_INTERVAL_S 秒复测 best_ip.txt 中的 IP，
+    每 DAEMON_CHALLENGER_INTERVAL_S 秒测 DAEMON_CHALLENGERS 个轮换的挑战者，
+    挑战者好出迟滞阈值时替换最差的 IP 并原子地重写 best_ip.txt
+    """
+    repo_root = Path(os.getenv("GITHUB_WORKSPACE", Path.cwd())).resolve()
+    regions = [r.strip() for r in os.getenv("PRIORITY_REGIONS", "US,GB,IN,JP,KR,SG,HK").split(",") if r.strip()]
+    # 常驻模式只维护一个集合（一个 best_ip.txt），不支持 dual；IPv4 与 IPv6 需要各跑一个实例
+    version = os.getenv("IP_VERSION", "4").strip().lower()
+    if version not in ("4", "6"):
+        print(f"ERROR: DAEMON=1 supports IP_VERSION 4 or 6, got {version!r}; "
+              "run one daemon per family instead of dual")
+        return 2
+    ip_version = int(version)
+    if ip_version == 6:
+        ranges_txt = repo_root / os.getenv("IPV6_TXT", ".tmp_cfst/bin/ipv6.txt")
+        ranges_url = IPV6_TXT_URL
+    else:
+        ranges_txt = repo_root / "ip.txt"
+        ranges_url = IP_TXT_URL
+    if not ranges_txt.exists():
+        download_many([{"url": ranges_url, "dst": ranges_txt}])
+
+    live = HysteresisSet(
+        regions,
+        max_per_region=int(os.getenv("MAX_PER_REGION", "10")),
+        max_total=int(os.getenv("MAX_TOTAL", "100")),
+        margin=float(os.getenv("DAEMON_MARGIN", "0.1")),
+        margin_ms=float(os.getenv("DAEMON_MARGIN_MS", "5")),
+    )
+    probe = tcp_prober(
+        port=int(os.getenv("PROBE_PORT", "443")),
+        count=int(os.getenv("PROBE_COUNT", "4")),
+        concurrency=int(os.getenv("PROBE_CONCURRENCY", "200")),
+        timeout=float(os.getenv("PROBE_TIMEOUT", "1.0")),
+    )
+    rounds = int(os.getenv("DAEMON_ROUNDS", "0")) or None
+    stats = run_daemon(
+        ranges_txt, repo_root / "best_ip.txt", live, probe,
+        version=ip_version,
+        per_24=int(os.getenv("PROBE_PER_24", "1")),
+        seed=int(os.getenv("PROBE_SEED", "") or secrets.randbits(32)),
+        challengers=int(os.getenv("DAEMON_CHALLENGERS", "200")),
+        incumbent_interval=float(os.getenv("DAEMON_INCUMBENT_INTERVAL_S", "300")),
+        challenger_interval=float(os.getenv("DAEMON_CHALLENGER_INTERVAL_S", "900")),
+        rounds=rounds,
+    )
+    print("Done:", json.dumps(stats))
+    return 0
+
+def run(telemetry: Telemetry) -> int:
     repo_root = Path(os.getenv("GITHUB_WORKSPACE", Path.cwd())).resolve()
 
     # 配置参数
@@ -271,55 +370,334 @@ def main() -> int:
     
     cfst_args = os.getenv("CFST_ARGS", "-n 200 -t 4 -dn 100 -dt 8 -p 0 -o result.csv").strip()
 
-    # ✅ 确保 ip.txt 存在（cfst 默认读取 ip.txt）
-    ip_txt = repo_root / "ip.txt"
-    if not ip_txt.exists():
-        print(f"ip.txt not found, downloading from: {IP_TXT_URL}")
-        download(IP_TXT_URL, ip_txt)
-
     work_dir = repo_root / ".tmp_cfst"
     work_dir.mkdir(parents=True, exist_ok=True)
 
+    csv_path = repo_root / "result.csv"
+    probe_engine = os.getenv("PROBE_ENGINE", "cfst").strip().lower()
+
     # 获取适合当前平台的下载URL
-    download_url = get_platform_url()
-    archive_filename = download_url.split("/")[-1]
-    archive = work_dir / archive_filename
-    bin_dir = work_dir / "bin"
+    cfst_url = get_platform_url()
+    archive = work_dir / cfst_url.split("/")[-1]
 
-    if not archive.exists():
-        print(f"Downloading cfst from {download_url}")
-        download(download_url, archive)
+    # ✅ 确保 ip.txt 存在（cfst 默认读取 ip.txt）；IP_TXT_REFRESH=1 时用条件 GET 刷新
+    # ip.txt 与 cfst 压缩包相互独立，并发下载（失败自动重试，压缩包支持断点续传）
+    ip_txt = repo_root / "ip.txt"
+    # IP_VERSION：4（默认）/ 6 / dual（同时测 IPv4 与 IPv6，分别输出 best_ip.txt 与 best_ipv6.txt）
+    ip_version = os.getenv("IP_VERSION", "4").strip().lower()
+    if ip_version not in ("4", "6", "dual"):
+        print(f"ERROR: IP_VERSION must be 4, 6 or dual, got {ip_version!r}")
+        return 2
+    ipv6_txt = repo_root / os.getenv("IPV6_TXT", ".tmp_cfst/bin/ipv6.txt")
+    with telemetry.phase("fetch") as m:
+        fetch_jobs = []
+        if ip_version != "6" and (not ip_txt.exists() or os.getenv("IP_TXT_REFRESH", "0") == "1"):
+            print(f"Fetching ip.txt from: {IP_TXT_URL}")
+            fetch_jobs.append({"url": IP_TXT_URL, "dst": ip_txt, "conditional": True,
+                               "meta_path": work_dir / "ip.txt.meta.json"})
+        if ip_version != "4" and not ipv6_txt.exists():
+            print(f"Fetching ipv6.txt from: {IPV6_TXT_URL}")
+            fetch_jobs.append({"url": IPV6_TXT_URL, "dst": ipv6_txt, "conditional": True,
+                               "meta_path": work_dir / "ipv6.txt.meta.json"})
+        if probe_engine != "python" and not archive.exists():
+            print(f"Downloading cfst from {cfst_url}")
+            fetch_jobs.append({"url": cfst_url, "dst": archive})
+        fetch_results = download_many(fetch_jobs)
+        for fetched in fetch_results:
+            print("Fetched:", json.dumps({
+                "url": fetched.url,
+                "not_modified": fetched.not_modified,
+                "bytes": fetched.bytes_downloaded,
+                "attempts": fetched.attempts,
+            }))
+        m["files"] = len(fetch_results)
+        m["bytes_downloaded"] = sum(f.bytes_downloaded for f in fetch_results)
+    probe_stats = None
 
-    if bin_dir.exists():
-        shutil.rmtree(bin_dir)
-    extract_archive(archive, bin_dir)
+    # 测速的网段文件：dual 模式把 ip.txt 与 ipv6.txt 合并（cfst 与 tcp_probe 都能处理混合的网段）
+    if ip_version == "4":
+        ranges_txt = ip_txt
+    elif ip_version == "6":
+        ranges_txt = ipv6_txt
+    else:
+        ranges_txt = work_dir / "ip_dual.txt"
+        ranges_txt.write_text(ip_txt.read_text(encoding="utf-8").rstrip("\n") + "\n"
+                              + ipv6_txt.read_text(encoding="utf-8"), encoding="utf-8")
+    history_db = os.getenv("HISTORY_DB", "").strip()
 
-    cfst_bin = find_cfst(bin_dir)
-    cfst_bin.chmod(0o755)
+    # 可选：根据历史库用 Thompson 采样生成预筛选的候选列表，把测速预算花在表现好的 /24 上（仅 IPv4）
+    candidate_budget = int(os.getenv("CANDIDATE_BUDGET", "0"))
+    candidates = None
+    candidate_file = None
+    if candidate_budget > 0 and history_db and ip_version == "4":
+        with telemetry.phase("candidates") as m:
+            conn = open_history(repo_root / history_db)
+            try:
+                arm_stats = stats_from_history(conn, top_k=max_total)
+            finally:
+                conn.close()
+            candidates = generate_candidates(load_arms(ip_txt), arm_stats, candidate_budget)
+            candidate_file = work_dir / "candidates.txt"
+            candidate_file.write_text("\n".join(candidates) + "\n", encoding="utf-8")
+            print(f"Bandit candidates: {len(candidates)} ({candidate_file})")
+            m["candidates"] = len(candidates)
 
-    # 在 repo_root 下跑，确保 result.csv 输出到仓库根目录
-    cmd = [str(cfst_bin)] + cfst_args.split()
-    run_cmd(cmd, cwd=repo_root)
+    # tcp_probe 参数
+    probe_port = int(os.getenv("PROBE_PORT", "443"))
+    probe_count = int(os.getenv("PROBE_COUNT", "4"))
+    probe_concurrency = int(os.getenv("PROBE_CONCURRENCY", "200"))
+    probe_timeout = float(os.getenv("PROBE_TIMEOUT", "1.0"))
+    probe_per_24 = int(os.getenv("PROBE_PER_24", "1"))
+    # 候选 IP 按种子决定的伪随机顺序遍历 ip.txt；记录种子即可复现同一批候选，
+    # PROBE_OFFSET / PROBE_LIMIT 用于分批或断点续测
+    probe_seed = int(os.getenv("PROBE_SEED", "") or secrets.randbits(32))
+    probe_offset = int(os.getenv("PROBE_OFFSET", "0"))
+    probe_limit = int(os.getenv("PROBE_LIMIT", "0")) or None
+    # IPv6 网段太大（一个 /32 就有 65536 个 /48），默认只测前 PROBE_LIMIT_V6 个候选
+    probe_limit_v6 = int(os.getenv("PROBE_LIMIT_V6", "2000")) or None
 
-    csv_path = repo_root / "result.csv"
-    if not csv_path.exists():
-        print("ERROR: result.csv not found. Check CFST_ARGS.")
-        return 2
+    probe_shards = int(os.getenv("PROBE_SHARDS", "1"))
+    shard_timings = None
+
+    # 可选：各地区配额都已被延迟不超过 EARLY_STOP_MS 的 IP 填满、选择结果不会再变时提前结束测速
+    # （仅进程内测速：cfst 与分片测速在子进程中运行，只能整体跑完）
+    early_stop_ms = float(os.getenv("EARLY_STOP_MS", "0"))
+    gate = None
+    if early_stop_ms > 0:
+        if probe_engine == "python" and probe_shards <= 1:
+            tracker = PerFamilyTracker if ip_version == "dual" else QuotaTracker
+            gate = tracker(regions, max_per_region, max_total, early_stop_ms)
+        else:
+            print("EARLY_STOP_MS is only supported with PROBE_ENGINE=python and PROBE_SHARDS=1; ignored")
+
+    cfst_bin = None
+    if probe_engine != "python":
+        # 按 版本 + 平台 + SHA-256 缓存可执行文件，命中时跳过解压
+        with telemetry.phase("install"):
+            cfst_bin = install_cfst(archive, work_dir / "cache", RELEASE_VERSION,
+                                    os.getenv("CFST_ARCHIVE_SHA256") or None)
+
+    with telemetry.phase("probe") as m:
+        if probe_shards > 1 and candidates is None:
+            # 把 ip.txt 切成多个分片并行测速，再归并为一个 result.csv（总并发数在分片间平分）
+            cfst_cmd = None
+            if cfst_bin is not None:
+                cfst_cmd = [str(cfst_bin)] + cfst_args.split()
+                if "-n" in cfst_cmd[:-1]:
+                    probe_concurrency = int(cfst_cmd[cfst_cmd.index("-n") + 1])
+            shard_timings = run_sharded(
+                ranges_txt, csv_path, work_dir / "shards", probe_shards, probe_concurrency, cfst_cmd,
+                port=probe_port, count=probe_count, timeout=probe_timeout, per_24=probe_per_24,
+                seed=probe_seed, limit_v6=probe_limit_v6,
+            )
+            print("Shards:", json.dumps(shard_timings))
+            m["shards"] = len(shard_timings)
+            records = None
+        elif probe_engine == "python":
+            # 进程内 asyncio TCP 测速：无需下载/解压 cfst，结果直接交给选择逻辑
+            if candidates is None:
+                candidates = list(walk_candidates(ranges_txt, probe_per_24, probe_seed, probe_offset,
+                                                  probe_limit, limit_v6=probe_limit_v6))
+                print(f"Probe seed: {probe_seed} (offset {probe_offset}, {len(candidates)} candidates)")
+            results, probe_stats = run_probes(
+                candidates,
+                port=probe_port,
+                count=probe_count,
+                concurrency=probe_concurrency,
+                timeout=probe_timeout,
+                gate=gate,
+            )
+            print("Probe:", json.dumps(probe_stats))
+            if gate is not None:
+                early = probe_stats["early_stop"]
+                print(f"Early stop: {'settled' if gate.settled else 'not settled'}, "
+                      f"{early['unprobed']} of {probe_stats['candidates']} candidates not probed, "
+                      f"about {early['saved_s_est']:.1f}s saved")
+                m["early_stop_unprobed"] = early["unprobed"]
+                m["early_stop_saved_s"] = early["saved_s_est"]
+            write_result_csv(results, csv_path)
+            records = [(r.ip, r.latency, r.loss, 0.0) for r in results]
+            m["candidates"] = probe_stats["candidates"]
+            m["alive"] = probe_stats["alive"]
+            m["probes_per_second"] = probe_stats["probes_per_second"]
+        else:
+            # 在 repo_root 下跑，确保 result.csv 输出到仓库根目录
+            cmd = [str(cfst_bin)] + cfst_args.split()
+            if candidate_file is not None:
+                cmd += ["-f", str(candidate_file)]
+            elif ranges_txt != ip_txt:
+                cmd += ["-f", str(ranges_txt)]
+            run_cmd(cmd, cwd=repo_root)
+
+            if not csv_path.exists():
+                print("ERROR: result.csv not found. Check CFST_ARGS.")
+                return 2
+
+            records = None  # 按需从 result.csv 流式读取
+        m["result_csv_bytes"] = csv_path.stat().st_size if csv_path.exists() else 0
+
+    # 可选：记录到历史库，并按长期 EWMA 分数排序
+    rank_by = os.getenv("RANK_BY", "latency").strip().lower()
+    rows = None
+    history_run = None
+    if history_db:
+        with telemetry.phase("history") as m:
+            if records is None:
+                records = list(counted(iter_result_records(csv_path), m, "rows_parsed"))
+            conn = open_history(repo_root / history_db)
+            try:
+                history_run = record_run(conn, records)
+                if rank_by == "history":
+                    scores = stability_scores(conn, [ip for ip, _, _, _ in records])
+                    rows = [(ip, scores.get(ip, latency)) for ip, latency, _, _ in records]
+            finally:
+                conn.close()
+            m["records"] = len(records)
+
+    # 可选：对延迟最低的 COLO_TOP 个 IP 请求 /cdn-cgi/trace，按 /24 缓存实测的数据中心，
+    # 换算出的地区覆盖 region_index 的推断，供下面的选择使用，并写入 result.csv 的 地区码 列
+    colo_top = int(os.getenv("COLO_TOP", "0"))
+    colo_stats = None
+    if colo_top > 0 and csv_path.exists():
+        with telemetry.phase("colo") as m:
+            colo_cache_path = os.getenv("COLO_CACHE", "").strip()
+            colo_cache = ColoCache(repo_root / colo_cache_path if colo_cache_path else None,
+                                   float(os.getenv("COLO_TTL_S", str(DEFAULT_COLO_TTL))))
+            if records is None:
+                colo_rows = counted(iter_result_rows(csv_path), m, "rows_parsed")
+            else:
+                colo_rows = ((ip, latency) for ip, latency, _, _ in records)
+            colo_stats = resolve_colos(top_ips(colo_rows, colo_top), colo_cache,
+                                       os.getenv("COLO_TRACE_URL", DEFAULT_TRACE_URL),
+                                       int(os.getenv("COLO_CONCURRENCY", "32")))
+            colo_cache.save()
+            set_resolved_regions(colo_cache.regions())
+            m["rows_filled"] = apply_colo_results(csv_path, colo_cache)
+            print("Colo:", json.dumps(colo_stats))
+            m["requested"] = colo_stats["requested"]
+            m["cached"] = colo_stats["cached"]
+
+    # 评分方式：latency（只看延迟）/ weighted（延迟+丢包+抖动+速度 加权）/ throughput（估算吞吐）/ p95、p99（尾延迟）
+    # SELECT_MODE=pareto 时先保留全部非支配 IP 再按地区配额补足；RANK_BY=history 优先
+    score_by = os.getenv("SCORE_BY", "latency").strip().lower()
+    select_mode = os.getenv("SELECT_MODE", "quota").strip().lower()
+    with telemetry.phase("select") as m:
+        def select(family: int | None) -> list[str]:
+            """按当前配置选择 IP；family 为 4/6 时只考虑该地址族（双栈模式下分别选择）"""
+            keep = (lambda ip: True) if family is None else (lambda ip: (":" in ip) == (family == 6))
+            if rows is None and (score_by != "latency" or select_mode == "pareto"):
+                scorer = make_scorer(score_by, parse_weights(os.getenv("SCORE_WEIGHTS", "")))
+                scored = (c for c in counted(iter_candidates(csv_path), m, "rows_parsed") if keep(c.ip))
+                return select_scored(scored, regions, max_per_region, max_total, scorer,
+                                     pareto=select_mode == "pareto")
+            if rows is not None:
+                source = rows
+            elif records is None:
+                source = counted(iter_result_rows(csv_path), m, "rows_parsed")
+            else:
+                source = ((ip, latency) for ip, latency, _, _ in records)
+
+            # 使用新的按地区选择IP的函数
+            return select_top_ips(((ip, score) for ip, score in source if keep(ip)), regions,
+                                  max_per_region, max_total)
+
+        ips_v6 = None
+        if ip_version == "dual":
+            ips, ips_v6 = select(4), select(6)
+            m["selected_v6"] = len(ips_v6)
+        else:
+            ips = select(None)
+        m["selected"] = len(ips)
+
+    # 可选：对选出的 IP 做多连接下载测速，结果写回 result.csv
+    download_test_url = os.getenv("DOWNLOAD_TEST_URL", "").strip()
+    download_stats = None
+    if download_test_url and ips:
+        with telemetry.phase("download_test") as m:
+            download_count = int(os.getenv("DOWNLOAD_COUNT", "10"))
+            download_results, download_stats = run_download_stage(
+                ips[:download_count] + (ips_v6 or [])[:download_count],
+                download_test_url,
+                connections=int(os.getenv("DOWNLOAD_CONNECTIONS", "4")),
+                duration=float(os.getenv("DOWNLOAD_SECONDS", "8")),
+                parallel_ips=int(os.getenv("DOWNLOAD_PARALLEL_IPS", "1")),
+                budget=float(os.getenv("DOWNLOAD_BUDGET_MBPS", "0")) * 1024 * 1024,
+            )
+            print("Download:", json.dumps(download_stats))
+            apply_download_results(csv_path, download_results)
+            if history_run is not None:
+                conn = open_history(repo_root / history_db)
+                try:
+                    record_speeds(conn, history_run, {r.ip: r.speed for r in download_results if r.connections_ok})
+                finally:
+                    conn.close()
+            m["ips"] = len(download_results)
+            m["bytes_downloaded"] = sum(r.bytes for r in download_results)
 
-    # 使用新的按地区选择IP的函数
-    ips = parse_top_ips_by_region(csv_path, regions, max_per_region, max_total)
     best_path = repo_root / "best_ip.txt"
-    best_path.write_text("\n".join(ips) + ("\n" if ips else ""), encoding="utf-8")
+    best_v6_path = repo_root / "best_ipv6.txt"
+    # 可选：把 result.csv 另存为可 mmap 的二进制表，供分析/选择工具快速加载
+    results_bin = os.getenv("RESULTS_BIN", "").strip()
+    # 可选：把 result.csv 追加到按天的压缩归档（代替每天提交完整的 result.csv）
+    results_archive = os.getenv("RESULTS_ARCHIVE", "").strip()
+    # 选出的 IP 集合变化比例低于 COMMIT_MIN_CHANGE 时保留上一次的 best_ip.txt，工作流也就不会提交；
+    # 归档仍然追加本次运行，由工作流缓存到下一次提交
+    commit_min_change = float(os.getenv("COMMIT_MIN_CHANGE", "0"))
+    top_change = None
+    archived = None
+    with telemetry.phase("write") as m:
+        if commit_min_change > 0:
+            previous = []
+            for path in (best_path, best_v6_path) if ips_v6 is not None else (best_path,):
+                if path.exists():
+                    previous += path.read_text(encoding="utf-8").splitlines()
+            top_change = round(top_set_change(previous, ips + (ips_v6 or [])), 4)
+            m["top_set_change"] = top_change
+        publish = top_change is None or top_change >= commit_min_change
+        if publish:
+            best_path.write_text("\n".join(ips) + ("\n" if ips else ""), encoding="utf-8")
+            if ips_v6 is not None:
+                best_v6_path.write_text("\n".join(ips_v6) + ("\n" if ips_v6 else ""), encoding="utf-8")
+        else:
+            print(f"Top set changed by {top_change:.1%} (< COMMIT_MIN_CHANGE={commit_min_change:.1%}); "
+                  "keeping the previous best_ip.txt")
+        if results_archive and csv_path.exists():
+            info = ResultArchive(repo_root / results_archive).append_csv(csv_path)
+            archived = {"date": info.date, "rows": info.rows, "bytes": info.size}
+            m["archive_bytes"] = info.size
+        if results_bin and csv_path.exists():
+            table = ResultTable.from_csv(csv_path)
+            table.save(repo_root / results_bin)
+            m["table_rows"] = len(table)
 
     print("Done:", json.dumps({
         "priority_regions": regions,
         "max_per_region": max_per_region,
         "max_total": max_total,
+        "probe_engine": probe_engine,
         "cfst_args": cfst_args,
+        "probe_stats": probe_stats,
+        "probe_seed": probe_seed,
+        "shard_timings": shard_timings,
+        "bandit_candidates": len(candidates) if candidate_file is not None else None,
+        "download_stats": download_stats,
+        "colo_stats": colo_stats,
+        "rank_by": rank_by,
+        "score_by": score_by,
+        "select_mode": select_mode,
+        "history_run": history_run,
+        "ip_version": ip_version,
         "count": len(ips),
+        "count_v6": len(ips_v6) if ips_v6 is not None else None,
+        "telemetry": telemetry.summary(),
         "best_ip_txt": str(best_path),
+        "best_ipv6_txt": str(best_v6_path) if ips_v6 is not None else None,
         "result_csv": str(csv_path),
-        "ip_txt": str(ip_txt),
+        "results_bin": str(repo_root / results_bin) if results_bin else None,
+        "top_set_change": top_change,
+        "published": publish,
+        "archived": archived,
+        "ip_txt": str(ranges_txt),
     }, ensure_ascii=False))
     return 0
 
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多目标评分与 Pareto 选择
+
+把 平均延迟、丢包率、抖动、下载速度 组合成一个可配置的分数（越小越好），
+再交给按地区选择的逻辑。评分方式可插拔：
+- latency：只看平均延迟（原有行为）
+- weighted：加权和，权重用 SCORE_WEIGHTS 配置
+- throughput：按实测下载速度排序；没有实测速度时用 Mathis 公式
+  （吞吐 ≈ MSS / (RTT · √丢包率)）估算 TCP 可达吞吐
+- p95 / p99：按尾延迟排序（tcp_probe 输出的分位数列）；没有分位数时退回平均延迟
+
+Pareto 模式先保留所有非支配的 IP（没有任何其他 IP 在 延迟、丢包、抖动 上都不差
+且下载速度不低，并至少一项更好），再按地区配额补足剩余名额。
+"""
+
+import csv
+import math
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from history import LOSS_PENALTY_MS
+from selection import select_streaming
+from tcp_probe import JITTER_COLUMN, P95_COLUMN, P99_COLUMN, float_at
+
+
+class Candidate(NamedTuple):
+    ip: str
+    latency: float  # 毫秒
+    loss: float  # 0~1
+    jitter: float = 0.0  # 毫秒
+    speed: float = 0.0  # MB/s，0 表示未测
+    p95: float = 0.0  # 毫秒，0 表示没有分位数（cfst 的结果）
+    p99: float = 0.0
+
+
+Scorer = Callable[[Candidate], float]
+
+# weighted 评分的默认权重：丢包按 LOSS_PENALTY_MS 折算为毫秒，与历史库的分数一致
+DEFAULT_WEIGHTS = {"latency": 1.0, "loss": LOSS_PENALTY_MS, "jitter": 1.0, "speed": 0.0, "p95": 0.0}
+
+# Mathis 公式参数
+MSS_BYTES = 1460
+MATHIS_C = math.sqrt(3 / 2)
+# 没有观测到丢包时按 1% 计算，避免估算值为无穷大
+MIN_LOSS = 0.01
+
+
+def parse_weights(text: str) -> dict[str, float]:
+    """
+    解析 "latency=1,loss=1000,jitter=0.5,speed=20,p95=1" 形式的权重
+
+    未指定的项使用 DEFAULT_WEIGHTS；speed 的权重为每 MB/s 抵消的毫秒数。
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        key, _, value = part.partition("=")
+        key = key.strip().lower()
+        if key not in weights:
+            raise ValueError(f"Unknown score weight: {key}")
+        weights[key] = float(value)
+    return weights
+
+
+def latency_scorer() -> Scorer:
+    return lambda c: c.latency
+
+
+def tail_latency(c: Candidate, p: str = "p95") -> float:
+    """p95 / p99 延迟；没有分位数时用平均延迟"""
+    return getattr(c, p) or c.latency
+
+
+def tail_scorer(p: str) -> Callable[[], Scorer]:
+    """按 p95 / p99 延迟评分的构造函数"""
+    return lambda: (lambda c: tail_latency(c, p))
+
+
+def weighted_scorer(weights: dict[str, float] | None = None) -> Scorer:
+    """延迟 + 丢包 + 抖动 + p95 的加权和，减去下载速度的加权值"""
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    wl, wp, wj, ws, wt = w["latency"], w["loss"], w["jitter"], w["speed"], w["p95"]
+    return lambda c: wl * c.latency + wp * c.loss + wj * c.jitter - ws * c.speed + wt * tail_latency(c)
+
+
+def estimated_throughput(c: Candidate) -> float:
+    """实测下载速度；未测时用 Mathis 公式估算（MB/s）"""
+    if c.speed > 0:
+        return c.speed
+    if c.latency <= 0 or c.loss >= 1:
+        return 0.0
+    rtt = c.latency / 1000
+    return MSS_BYTES * MATHIS_C / (rtt * math.sqrt(max(c.loss, MIN_LOSS))) / (1024 * 1024)
+
+
+def throughput_scorer() -> Scorer:
+    return lambda c: -estimated_throughput(c)
+
+
+SCORERS: dict[str, Callable[..., Scorer]] = {
+    "latency": latency_scorer,
+    "weighted": weighted_scorer,
+    "throughput": throughput_scorer,
+    "p95": tail_scorer("p95"),
+    "p99": tail_scorer("p99"),
+}
+
+
+def make_scorer(name: str, weights: dict[str, float] | None = None) -> Scorer:
+    """按名字构造评分函数"""
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer: {name} (choose from {', '.join(SCORERS)})")
+    if name == "weighted":
+        return weighted_scorer(weights)
+    return SCORERS[name]()
+
+
+def iter_candidates(csv_path: Path) -> Iterator[Candidate]:
+    """
+    流式读取 result.csv 为 Candidate；有抖动、分位数列（tcp_probe 输出）时一并读取
+
+    Args:
+        csv_path: CSV 文件路径
+    """
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        jitter_idx = header.index(JITTER_COLUMN) if JITTER_COLUMN in header else None
+        p95_idx = header.index(P95_COLUMN) if P95_COLUMN in header else None
+        p99_idx = header.index(P99_COLUMN) if P99_COLUMN in header else None
+
+        for row in reader:
+            if not row:
+                continue
+            ip = row[0].strip()
+            if not ip:
+                continue
+            yield Candidate(
+                ip,
+                float_at(row, 4, 9999.0),
+                float_at(row, 3, 1.0),
+                float_at(row, jitter_idx, 0.0) if jitter_idx is not None else 0.0,
+                float_at(row, 5, 0.0),
+                float_at(row, p95_idx, 0.0) if p95_idx is not None else 0.0,
+                float_at(row, p99_idx, 0.0) if p99_idx is not None else 0.0,
+            )
+
+
+def _dominates(a: Candidate, b: Candidate) -> bool:
+    """a 在所有目标上不差于 b，且至少一项更好"""
+    no_worse = a.latency <= b.latency and a.loss <= b.loss and a.jitter <= b.jitter and a.speed >= b.speed
+    better = a.latency < b.latency or a.loss < b.loss or a.jitter < b.jitter or a.speed > b.speed
+    return no_worse and better
+
+
+def pareto_frontier(candidates: Iterable[Candidate]) -> list[Candidate]:
+    """
+    求非支配集合
+
+    先按 (延迟, 丢包, 抖动, -速度) 排序，排在后面的点不可能支配排在前面的点，
+    因此每个点只需与当前前沿比较，复杂度 O(N·F)，F 为前沿大小（通常很小）。
+    """
+    ordered = sorted(candidates, key=lambda c: (c.latency, c.loss, c.jitter, -c.speed))
+    frontier: list[Candidate] = []
+    seen = set()
+    for c in ordered:
+        if c.ip in seen:
+            continue
+        if not any(_dominates(f, c) for f in frontier):
+            frontier.append(c)
+            seen.add(c.ip)
+    return frontier
+
+
+def select_scored(candidates: Iterable[Candidate], regions: list[str], max_per_region: int = 10,
+                  max_total: int = 100, scorer: Scorer | None = None, pareto: bool = False) -> list[str]:
+    """
+    按分数选择 IP
+
+    Args:
+        candidates: 测速结果
+        regions: 优先处理的地区列表
+        max_per_region: 每个地区最多选择的IP数量
+        max_total: 总共最多选择的IP数量
+        scorer: 评分函数（越小越好），默认只看延迟
+        pareto: 先保留全部非支配 IP（按分数排序，不占地区配额），再按地区配额补足
+
+    Returns:
+        选出的 IP 列表
+    """
+    scorer = scorer or latency_scorer()
+    if not pareto:
+        return select_streaming(((c.ip, scorer(c)) for c in candidates), regions, max_per_region, max_total)
+
+    candidates = list(candidates)
+    frontier = sorted(pareto_frontier(candidates), key=scorer)[:max_total]
+    if len(frontier) >= max_total:
+        return [c.ip for c in frontier]
+    chosen = {c.ip for c in frontier}
+    rest = ((c.ip, scorer(c)) for c in candidates if c.ip not in chosen)
+    return [c.ip for c in frontier] + select_streaming(rest, regions, max_per_region, max_total - len(frontier))
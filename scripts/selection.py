@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单遍流式的按地区 Top-K 选择
+
+边读取测速结果边维护有界堆：每个优先地区一个（容量为每地区上限），
+非优先地区一个，以及一个存放优先地区超额 IP 的回填堆（容量均不超过总数上限）。
+时间 O(N log K)，内存 O(K)，输出与原先“整表排序 + 三遍扫描”的结果一致。
+"""
+
+import heapq
+from itertools import count, islice
+from typing import Iterable, Iterator
+
+from region_index import classify_ips
+
+# 堆元素：(-延迟, -序号, ip)，即按 (延迟, 序号) 的大顶堆，堆顶是当前最差的元素
+_Entry = tuple[float, int, str]
+
+
+def _push_bounded(heap: list[_Entry], entry: _Entry, limit: int) -> _Entry | None:
+    """
+    向容量为 limit 的大顶堆中加入元素
+
+    Returns:
+        被挤出（或未能进入）的元素；没有元素被挤出时返回 None
+    """
+    if limit <= 0:
+        return entry
+    if len(heap) < limit:
+        heapq.heappush(heap, entry)
+        return None
+    if entry > heap[0]:  # 取负后更大 = (延迟, 序号) 更小
+        return heapq.heapreplace(heap, entry)
+    return entry
+
+
+def _sorted_ips(heap: list[_Entry]) -> list[str]:
+    """按 (延迟, 序号) 升序返回堆中的 IP"""
+    return [ip for _, _, ip in sorted(heap, reverse=True)]
+
+
+class TopKSelector:
+    """
+    流式的按地区选择器
+
+    选择规则与 parse_top_ips_by_region 相同：
+    1. 按延迟从低到高，选择优先地区的 IP，每个地区不超过 max_per_region；
+    2. 仍有空位时，按延迟补充非优先地区的 IP；
+    3. 仍有空位时，按延迟补充优先地区中超出上限的 IP。
+    延迟相同的 IP 保持输入顺序。
+    """
+
+    def __init__(self, regions: list[str], max_per_region: int = 10, max_total: int = 100):
+        self.regions = list(regions)
+        self.max_per_region = max_per_region
+        self.max_total = max_total
+        self._region_cap = min(max_per_region, max_total)
+        self._region_heaps: dict[str, list[_Entry]] = {region: [] for region in self.regions}
+        self._other_heap: list[_Entry] = []
+        self._overflow_heap: list[_Entry] = []
+        self._seq = count()
+
+    def add(self, ip: str, latency: float, region: str) -> None:
+        """加入一条测速结果"""
+        entry = (-latency, -next(self._seq), ip)
+        heap = self._region_heaps.get(region)
+        if heap is None:
+            _push_bounded(self._other_heap, entry, self.max_total)
+            return
+        evicted = _push_bounded(heap, entry, self._region_cap)
+        if evicted is not None:
+            _push_bounded(self._overflow_heap, evicted, self.max_total)
+
+    def result(self) -> list[str]:
+        """返回最终选择的 IP 列表"""
+        max_total = self.max_total
+        if max_total <= 0:
+            return []
+
+        # 第一步：合并各优先地区的前 max_per_region 个（按延迟排序）
+        merged = heapq.merge(*(sorted(h, reverse=True) for h in self._region_heaps.values()), reverse=True)
+        selected_ips = [ip for _, _, ip in islice(merged, max_total)]
+        if len(selected_ips) >= max_total:
+            return selected_ips
+
+        # 第二步、第三步：依次用非优先地区、优先地区超额的 IP 回填
+        selected = set(selected_ips)
+        for heap in (self._other_heap, self._overflow_heap):
+            for ip in _sorted_ips(heap):
+                if ip in selected:  # 跳过已选择的IP
+                    continue
+                selected_ips.append(ip)
+                selected.add(ip)
+                if len(selected_ips) >= max_total:
+                    return selected_ips
+        return selected_ips
+
+
+def _batched(rows: Iterable[tuple[str, float]], size: int) -> Iterator[list[tuple[str, float]]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def select_streaming(rows: Iterable[tuple[str, float]], regions: list[str], max_per_region: int = 10,
+                     max_total: int = 100, chunk_size: int = 4096) -> list[str]:
+    """
+    单遍流式地按地区选择最快的前N个IP
+
+    Args:
+        rows: (ip, 平均延迟) 序列，可以是CSV读取器或测速结果流
+        regions: 优先处理的地区列表
+        max_per_region: 每个地区最多选择的IP数量
+        max_total: 总共最多选择的IP数量
+        chunk_size: 每批批量分类地区的行数
+
+    Returns:
+        按地区分组选择的IP列表
+    """
+    selector = TopKSelector(regions, max_per_region, max_total)
+    add = selector.add
+    for chunk in _batched(rows, chunk_size):
+        regions_col = classify_ips([ip for ip, _ in chunk])
+        for (ip, latency), region in zip(chunk, regions_col):
+            add(ip, latency, region)
+    return selector.result()
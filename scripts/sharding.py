@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多进程分片测速
+
+把 ip.txt 的网段按地址数量均衡地切成 N 个分片，每个分片由一个独立的测速进程
+（cfst 或 tcp_probe）处理并写出自己的结果文件，最后对各分片已排序的结果做
+k 路归并，得到一个 result.csv。总并发数在各分片之间平分，避免压垮 runner 的网络。
+"""
+
+import csv
+import heapq
+import ipaddress
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from cidr_walk import BLOCK_PREFIX, walk_candidates
+from tcp_probe import RESULT_HEADER, run_probes, write_result_csv
+
+# cfst 中需要按分片覆盖的参数
+_SHARD_FLAGS = ("-f", "-o", "-n")
+
+
+def split_cidrs(cidrs: list[str], shards: int) -> list[list[str]]:
+    """
+    把网段按地址数量均衡地分成若干份
+
+    过大的网段会被对半拆分，直到不超过平均每份的地址数，
+    然后按从大到小的顺序分给当前地址数最少的分片。
+    IPv4 与 IPv6 各自均衡（IPv6 的地址数会淹没 IPv4）。
+
+    Args:
+        cidrs: CIDR 列表（IPv4 最细拆到 /24，IPv6 最细拆到 /48）
+        shards: 分片数量
+
+    Returns:
+        每个分片的 CIDR 列表
+    """
+    shards = max(1, shards)
+    out: list[list[str]] = [[] for _ in range(shards)]
+    all_nets = [ipaddress.ip_network(c, strict=False) for c in cidrs]
+    for version in (4, 6):
+        nets = [n for n in all_nets if n.version == version]
+        if not nets:
+            continue
+
+        target = sum(n.num_addresses for n in nets) / shards
+        pending = list(nets)
+        pieces = []
+        while pending:
+            net = pending.pop()
+            if net.num_addresses > target and net.prefixlen < BLOCK_PREFIX[version]:
+                pending.extend(net.subnets(prefixlen_diff=1))
+            else:
+                pieces.append(net)
+
+        heap = [(0, i) for i in range(shards)]
+        assigned: list[list] = [[] for _ in range(shards)]
+        for net in sorted(pieces, key=lambda n: (-n.num_addresses, int(n.network_address))):
+            load, i = heapq.heappop(heap)
+            assigned[i].append(net)
+            heapq.heappush(heap, (load + net.num_addresses, i))
+        for shard, nets_in_shard in zip(out, assigned):
+            shard += [str(n) for n in sorted(nets_in_shard, key=lambda n: int(n.network_address))]
+    return out
+
+
+def read_cidrs(ip_txt: Path) -> list[str]:
+    with open(ip_txt, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _override_args(args: list[str], overrides: dict[str, str]) -> list[str]:
+    """去掉 args 中与 overrides 相同的参数（连同其取值），再追加 overrides"""
+    out = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+            continue
+        if arg in overrides:
+            skip = True
+            continue
+        out.append(arg)
+    for flag, value in overrides.items():
+        out += [flag, value]
+    return out
+
+
+def _sort_key(row: list[str]) -> tuple[float, float]:
+    try:
+        return float(row[3]), float(row[4])
+    except (ValueError, IndexError):
+        return 1.0, 9999.0
+
+
+def _iter_rows(path: Path) -> Iterator[list[str]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+def merge_shard_results(shard_csvs: list[Path], out_csv: Path) -> int:
+    """
+    对各分片已按 (丢包率, 平均延迟) 排序的结果做 k 路归并
+
+    Returns:
+        合并后的行数
+    """
+    header = RESULT_HEADER
+    for path in shard_csvs:
+        if path.exists():
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                header = next(csv.reader(f), None) or header
+            break
+
+    count = 0
+    iters = [_iter_rows(p) for p in shard_csvs if p.exists()]
+    with open(out_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in heapq.merge(*iters, key=_sort_key):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _probe_shard(shard_file: str, out_csv: str, port: int, count: int, concurrency: int,
+                 timeout: float, per_24: int, seed: int, limit_v6: int | None) -> dict:
+    """分片工作进程：用 tcp_probe 测一个分片"""
+    start = time.perf_counter()
+    candidates = list(walk_candidates(Path(shard_file), per_24, seed, limit_v6=limit_v6))
+    results, stats = run_probes(candidates, port, count, concurrency, timeout)
+    write_result_csv(results, Path(out_csv))
+    stats["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def run_sharded(ip_txt: Path, out_csv: Path, work_dir: Path, shards: int, total_concurrency: int = 200,
+                cfst_cmd: list[str] | None = None, port: int = 443, count: int = 4,
+                timeout: float = 1.0, per_24: int = 1, seed: int = 0,
+                limit_v6: int | None = None) -> list[dict]:
+    """
+    分片并行测速并合并结果
+
+    Args:
+        ip_txt: ip.txt 路径
+        out_csv: 合并后的 result.csv 路径
+        work_dir: 存放分片文件的目录
+        shards: 分片（进程）数量
+        total_concurrency: 所有分片合计的并发数上限
+        cfst_cmd: cfst 命令（可执行文件 + CFST_ARGS）；为 None 时使用 tcp_probe
+        port, count, timeout, per_24: tcp_probe 参数
+        seed: 候选 IP 遍历顺序的种子（见 cidr_walk）
+        limit_v6: 所有分片合计最多测的 IPv6 候选数
+
+    Returns:
+        每个分片的统计信息（含耗时）
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    parts = [p for p in split_cidrs(read_cidrs(ip_txt), shards) if p]
+    per_shard = max(1, total_concurrency // max(1, len(parts)))
+    shard_limit_v6 = -(-limit_v6 // max(1, len(parts))) if limit_v6 is not None else None
+
+    shard_files = []
+    shard_csvs = []
+    for i, cidrs in enumerate(parts):
+        shard_file = work_dir / f"shard_{i}.txt"
+        shard_file.write_text("\n".join(cidrs) + "\n", encoding="utf-8")
+        shard_files.append(shard_file)
+        shard_csv = work_dir / f"shard_{i}.csv"
+        shard_csv.unlink(missing_ok=True)
+        shard_csvs.append(shard_csv)
+
+    timings = []
+    if cfst_cmd is not None:
+        procs = []
+        for i, (shard_file, shard_csv) in enumerate(zip(shard_files, shard_csvs)):
+            cmd = [cfst_cmd[0]] + _override_args(cfst_cmd[1:], {
+                "-f": str(shard_file), "-o": str(shard_csv), "-n": str(per_shard),
+            })
+            print(">>", " ".join(cmd))
+            procs.append((i, time.perf_counter(), subprocess.Popen(cmd, cwd=str(work_dir),
+                                                                    stdin=subprocess.DEVNULL,
+                                                                    stdout=subprocess.DEVNULL)))
+        for i, start, proc in procs:
+            code = proc.wait()
+            timings.append({"shard": i, "cidrs": len(parts[i]), "returncode": code,
+                            "elapsed_s": round(time.perf_counter() - start, 3)})
+        failed = [t for t in timings if t["returncode"] != 0]
+        if failed:
+            raise subprocess.CalledProcessError(failed[0]["returncode"], cfst_cmd)
+    else:
+        with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+            futures = [pool.submit(_probe_shard, str(f), str(c), port, count, per_shard, timeout, per_24, seed,
+                                   shard_limit_v6)
+                       for f, c in zip(shard_files, shard_csvs)]
+            for i, future in enumerate(futures):
+                stats = future.result()
+                stats.update({"shard": i, "cidrs": len(parts[i])})
+                timings.append(stats)
+
+    merge_shard_results(shard_csvs, out_csv)
+    return timings
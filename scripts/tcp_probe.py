@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+纯 Python 的 asyncio TCP 延迟测速（cfst 二进制的替代方案）
+
+对每个候选 IP 发起若干次计时的 TCP 握手，并发数由信号量限制，
+输出与 cfst 的 result.csv 相同的列，选择逻辑可以直接消费测速结果。
+"""
+
+import csv
+import time
+import asyncio
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from quantiles import LatencyStats
+
+# 与 cfst 的 result.csv 保持一致的表头
+RESULT_HEADER = ["IP 地址", "已发送", "已接收", "丢包率", "平均延迟", "下载速度(MB/s)", "地区码"]
+
+# tcp_probe 额外输出的列（cfst 没有）
+JITTER_COLUMN = "抖动(ms)"
+P50_COLUMN = "P50延迟(ms)"
+P95_COLUMN = "P95延迟(ms)"
+P99_COLUMN = "P99延迟(ms)"
+STDDEV_COLUMN = "延迟标准差(ms)"
+PROBE_COLUMNS = [JITTER_COLUMN, P50_COLUMN, P95_COLUMN, P99_COLUMN, STDDEV_COLUMN]
+
+
+def float_at(row: list[str], idx: int, fallback: float) -> float:
+    """result.csv 一行中第 idx 列的数值；列缺失或无法解析时返回 fallback"""
+    try:
+        return float(row[idx])
+    except (ValueError, IndexError):
+        return fallback
+
+
+class ProbeResult(NamedTuple):
+    ip: str
+    sent: int
+    received: int
+    latency: float  # 平均延迟（毫秒），全部失败时为 0.0
+    jitter: float = 0.0  # 相邻两次握手耗时之差的平均绝对值（毫秒）
+    p50: float = 0.0  # 握手耗时的分位数（毫秒），由 quantiles.LatencyStats 流式估计
+    p95: float = 0.0
+    p99: float = 0.0
+    stddev: float = 0.0  # 握手耗时的标准差（毫秒）
+
+    @property
+    def loss(self) -> float:
+        return (self.sent - self.received) / self.sent if self.sent else 1.0
+
+
+async def probe_ip(ip: str, port: int, count: int, timeout: float, sem: asyncio.Semaphore) -> ProbeResult:
+    """对单个 IP 进行 count 次计时的 TCP 连接；耗时只进入流式统计，内存占用与 count 无关"""
+    stats = LatencyStats()
+    for _ in range(count):
+        async with sem:
+            start = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+            except (OSError, asyncio.TimeoutError):
+                continue
+            elapsed = time.perf_counter() - start
+            # 在信号量内等待连接真正关闭，避免高并发时大量传输在后台堆积
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), timeout)
+            except (OSError, asyncio.TimeoutError):
+                pass
+        stats.add(elapsed * 1000)
+    return ProbeResult(ip, count, stats.count, stats.mean, stats.jitter,
+                       stats.quantile(0.5), stats.quantile(0.95), stats.quantile(0.99), stats.stddev)
+
+
+async def probe_many(ips: Iterable[str], port: int = 443, count: int = 4,
+                     concurrency: int = 200, timeout: float = 1.0, gate=None) -> list[ProbeResult]:
+    """
+    并发测速多个 IP
+
+    Args:
+        ips: 候选 IP
+        port: 目标端口（对应 cfst 的 -tp）
+        count: 每个 IP 的握手次数（对应 cfst 的 -t）
+        concurrency: 同时进行的连接数上限（对应 cfst 的 -n）
+        timeout: 单次连接超时（秒）
+        gate: 可选的 early_stop.QuotaTracker / PerFamilyTracker；给出时跳过不再需要的地区，
+              选择结果确定后停止领取
+
+    Returns:
+        与输入顺序一致的测速结果（提前结束时只含已测的 IP）
+    """
+    # 固定 concurrency 个工作协程按顺序领取候选：协程数量与候选数无关（候选可达数十万）
+    sem = asyncio.Semaphore(concurrency)
+    pending = enumerate(ips)
+    done: list[tuple[int, ProbeResult]] = []
+
+    async def worker() -> None:
+        for i, ip in pending:
+            if gate is None:
+                done.append((i, await probe_ip(ip, port, count, timeout, sem)))
+                continue
+            if gate.settled:
+                return
+            token = gate.admit(ip)
+            if token is None:
+                continue
+            result = await probe_ip(ip, port, count, timeout, sem)
+            gate.observe(token, result.latency, result.loss)
+            done.append((i, result))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    done.sort(key=lambda item: item[0])
+    return [result for _, result in done]
+
+
+def run_probes(ips: list[str], port: int = 443, count: int = 4,
+               concurrency: int = 200, timeout: float = 1.0, gate=None) -> tuple[list[ProbeResult], dict]:
+    """
+    同步入口：测速并按 丢包率、平均延迟 排序，丢弃全部失败的 IP
+
+    Args:
+        gate: 可选的 early_stop.QuotaTracker，见 probe_many
+
+    Returns:
+        (排序后的结果, 统计信息)，统计信息包含 probes_per_second；
+        给出 gate 时另含 early_stop（未测的候选数与按实测速率估算的节省时间）
+    """
+    start = time.perf_counter()
+    results = asyncio.run(probe_many(ips, port, count, concurrency, timeout, gate))
+    elapsed = time.perf_counter() - start
+
+    alive = [r for r in results if r.received > 0]
+    alive.sort(key=lambda r: (r.loss, r.latency))
+
+    probes = len(results) * count
+    stats = {
+        "candidates": len(ips),
+        "alive": len(alive),
+        "probes": probes,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "probes_per_second": round(probes / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    if gate is not None:
+        unprobed = len(ips) - len(results)
+        per_ip = elapsed / len(results) if results else 0.0
+        stats["early_stop"] = dict(gate.summary(), unprobed=unprobed, saved_s_est=round(unprobed * per_ip, 3))
+    return alive, stats
+
+
+def write_result_csv(results: Iterable[ProbeResult], csv_path: Path) -> None:
+    """按 cfst 的格式写出 result.csv，并在末尾追加 抖动、分位数、标准差 列（PROBE_COLUMNS）"""
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_HEADER + PROBE_COLUMNS)
+        for r in results:
+            writer.writerow([r.ip, r.sent, r.received, f"{r.loss:.2f}", f"{r.latency:.2f}", "0.00", "N/A",
+                             f"{r.jitter:.2f}", f"{r.p50:.2f}", f"{r.p95:.2f}", f"{r.p99:.2f}",
+                             f"{r.stddev:.2f}"])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测速流程各阶段的耗时与资源统计
+
+每个阶段记录墙钟时间、CPU 时间（本进程 + 已结束的子进程，如 cfst）、峰值 RSS，
+以及阶段内自行上报的计数（下载字节数、解析行数、测速速率等）。
+结果可以输出为 JSON lines（追加写入，便于长期跟踪）和 Prometheus textfile
+（供 node_exporter 的 textfile collector 读取）。
+"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+T = TypeVar("T")
+
+METRIC_PREFIX = "cfst_speedtest"
+
+
+def _peak_rss(who: int) -> int:
+    """峰值 RSS（字节）；ru_maxrss 在 macOS 上以字节为单位，在 Linux 上以 KB 为单位"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cpu_seconds() -> tuple[float, float]:
+    t = os.times()
+    return time.process_time(), t.children_user + t.children_system
+
+
+class Telemetry:
+    """
+    按阶段收集统计信息
+
+    用法：
+        tel = Telemetry()
+        with tel.phase("probe") as m:
+            ...
+            m["probes_per_second"] = 1234.5
+        tel.write_jsonl(path)
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.phases: list[dict] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[dict]:
+        """计量一个阶段；阶段内可以往产出的字典里写入额外的计数"""
+        metrics: dict = {}
+        wall = time.perf_counter()
+        cpu, child_cpu = _cpu_seconds()
+        ok = False
+        try:
+            yield metrics
+            ok = True
+        finally:
+            cpu_end, child_cpu_end = _cpu_seconds()
+            record = {
+                "phase": name,
+                "ok": ok,
+                "wall_s": round(time.perf_counter() - wall, 6),
+                "cpu_s": round(cpu_end - cpu, 6),
+                "children_cpu_s": round(child_cpu_end - child_cpu, 6),
+                "peak_rss_bytes": _peak_rss(resource.RUSAGE_SELF) if resource else 0,
+                "children_peak_rss_bytes": _peak_rss(resource.RUSAGE_CHILDREN) if resource else 0,
+            }
+            record.update(metrics)
+            self.phases.append(record)
+            print("Phase:", json.dumps(record, ensure_ascii=False))
+
+    def total_wall(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> dict:
+        """整次运行的汇总"""
+        return {
+            "started_at": round(self.started_at, 3),
+            "wall_s": round(self.total_wall(), 6),
+            "phases": {p["phase"]: p["wall_s"] for p in self.phases},
+        }
+
+    def write_jsonl(self, path: Path) -> None:
+        """把各阶段和汇总各写一行 JSON，追加到 path"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        run = {"run": self.started_at}
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.phases:
+                f.write(json.dumps({**run, **record}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({**run, "phase": "total", **self.summary()}, ensure_ascii=False) + "\n")
+
+    def prometheus_text(self) -> str:
+        """生成 Prometheus 文本格式的指标"""
+        gauges: dict[str, list[tuple[str, float]]] = {}
+        for record in self.phases:
+            labels = f'phase="{record["phase"]}"'
+            for key, value in record.items():
+                if key == "phase" or not isinstance(value, (int, float)):
+                    continue
+                if key.endswith("_s"):
+                    key = key[:-2] + "_seconds"
+                gauges.setdefault(f"{METRIC_PREFIX}_phase_{key}", []).append((labels, float(value)))
+
+        lines = []
+        for name, samples in gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines += [f"{name}{{{labels}}} {value:g}" for labels, value in samples]
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_wall_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_wall_seconds {self.total_wall():g}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_timestamp_seconds {self.started_at:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """原子地写入 Prometheus textfile（避免 collector 读到半个文件）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def counted(items: Iterable[T], metrics: dict, key: str) -> Iterator[T]:
+    """透传 items，同时把产出的数量累加到 metrics[key]"""
+    metrics.setdefault(key, 0)
+    for item in items:
+        metrics[key] += 1
+        yield item
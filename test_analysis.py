@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from analysis import PRIORITY_REGIONS, build_report, first_positions, simulate_selection
+from result_table import load_table
+from run_speedtest import parse_top_ips_by_region
+from tcp_probe import RESULT_HEADER
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _write(path: Path, rows: list[list]) -> Path:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_HEADER)
+        writer.writerows(rows)
+    return path
+
+
+def test_load_and_rank(tmp_path):
+    path = _write(tmp_path / "result.csv", [
+        ["104.16.0.1", 4, 4, "0.00", "9.00", "1.50", "N/A"],
+        ["2606:4700::1", 4, 4, "0.00", "3.00", "0.00", "N/A"],
+        ["141.101.64.9", 4, 4, "0.00", "5.00", "0.00", "N/A"],
+        ["104.16.0.1", 4, 4, "0.00", "2.00", "0.00", "N/A"],
+        ["190.93.240.1", 4, 3, "0.25", "bad", "", "N/A"],
+        [],
+    ])
+    cols = load_table(path)
+    assert len(cols) == 5
+    assert cols.ip_at(1) == "2606:4700::1" and cols.ip_at(2) == "141.101.64.9"
+    assert [cols.region_at(i) for i in range(5)] == ["US", "US", "GB", "US", "HK"]
+    assert cols.latency[4] == 9999.0 and cols.loss[4] == 0.25 and cols.speed[0] == 1.5
+
+    assert list(cols.order) == [3, 1, 2, 0, 4]
+    assert cols.rank_of("104.16.0.1") == 0
+    assert cols.rank_of("2606:4700::1") == 1
+    assert cols.rank_of("190.93.240.1") == 4
+    assert cols.rank_of("1.1.1.1") is None and cols.rank_of("::1") is None
+
+    first = first_positions(cols)
+    assert {r: v["position"] for r, v in first.items()} == {"US": 0, "GB": 2, "HK": 4}
+
+
+def test_selection_matches_production():
+    cols = load_table(ROOT / "test_result.csv")
+    for max_per_region, max_total in [(10, 100), (50, 100), (1, 20), (5, 5000)]:
+        sim = simulate_selection(cols, PRIORITY_REGIONS, max_per_region, max_total)
+        expected = parse_top_ips_by_region(ROOT / "test_result.csv", PRIORITY_REGIONS, max_per_region, max_total)
+        assert [cols.ip_at(r) for r in sim["selected"]] == expected
+
+
+def test_report_from_single_load():
+    cols = load_table(ROOT / "test_result.csv")
+    with open(ROOT / "best_ip.txt", "r", encoding="utf-8") as f:
+        best = [line.strip() for line in f if line.strip()]
+    report = build_report(cols, ["distribution", "first", "select", "ranks"], PRIORITY_REGIONS, 50, 100, 100, best)
+    assert sum(report["distribution"].values()) == report["total"] == len(cols)
+    assert sum(report["distribution_top"]["regions"].values()) == min(100, len(cols))
+    ranks = report["best_ips"]["ranks"]
+    assert len(ranks) == len(best)
+    for r in ranks:
+        if r["position"] is not None:
+            assert cols.ip_at(cols.order[r["position"]]) == r["ip"]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import asyncio
+import threading
+import http.client
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from api_server import ApiApp, SnapshotStore, serve
+from result_table import MAGIC, ResultTable
+
+HEADER = "IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n"
+ROWS = [
+    ("104.16.0.3", 0.0, 30.0, "US"),
+    ("104.16.0.1", 0.0, 10.0, "US"),
+    ("103.31.4.2", 0.25, 20.0, "SG"),
+    ("2606:4700::1", 0.0, 15.0, "US"),
+]
+
+
+def make_app(tmp_path, results_name="result.csv"):
+    csv = tmp_path / "result.csv"
+    csv.write_text(HEADER + "".join(f"{ip},4,4,{loss},{lat},1.5,{cc}\n" for ip, loss, lat, cc in ROWS),
+                   encoding="utf-8")
+    results = csv
+    if results_name != "result.csv":
+        results = tmp_path / results_name
+        ResultTable.from_csv(csv).save(results)
+    best = tmp_path / "best_ip.txt"
+    best.write_text("104.16.0.1\n103.31.4.2\n", encoding="utf-8")
+    best6 = tmp_path / "best_ipv6.txt"
+    best6.write_text("2606:4700::1\n", encoding="utf-8")
+    return ApiApp(SnapshotStore([best, best6], results, check_interval=0)), best
+
+
+def get(app, target, **headers):
+    response = app.handle("GET", target, {k.replace("_", "-"): v for k, v in headers.items()})
+    body = json.loads(response.body) if response.body and response.content_type.startswith("application/json") else response.body
+    return response, body
+
+
+def test_best_and_etag(tmp_path):
+    app, _ = make_app(tmp_path)
+    response, body = get(app, "/best?n=5")
+    assert response.status == 200 and body["count"] == 3
+    assert [ip["ip"] for ip in body["ips"]] == ["104.16.0.1", "103.31.4.2", "2606:4700::1"]
+    assert body["ips"][1]["region"] == "SG" and body["ips"][1]["loss"] == 0.25
+
+    assert [ip["ip"] for ip in get(app, "/best?family=6")[1]["ips"]] == ["2606:4700::1"]
+    assert get(app, "/best.txt?n=1")[0].body == b"104.16.0.1\n"
+
+    cached, _ = get(app, "/best?n=5", if_none_match=response.etag)
+    assert cached.status == 304 and cached.body == b"" and cached.etag == response.etag
+    assert get(app, "/best?n=5", if_none_match='"stale"')[0].status == 200
+
+    assert get(app, "/best?n=x")[0].status == 400
+    assert get(app, "/nope")[0].status == 404
+    assert app.handle("POST", "/best", {}).status == 405
+
+
+def test_region_and_ip_metadata(tmp_path):
+    for name in ("result.csv", "result.bin"):
+        app, _ = make_app(tmp_path, name)
+        _, body = get(app, "/regions/us?n=5")
+        assert body["region"] == "US" and [ip["ip"] for ip in body["ips"]] == ["104.16.0.1", "2606:4700::1",
+                                                                      "104.16.0.3"]
+        assert [ip["ip"] for ip in get(app, "/regions/SG")[1]["ips"]] == ["103.31.4.2"]
+
+        _, meta = get(app, "/ip/104.16.0.3")
+        assert meta == {"ip": "104.16.0.3", "region": "US", "latency": 30.0, "loss": 0.0, "jitter": 0.0,
+                        "speed": 1.5, "rank": 3, "published_rank": None}
+        assert get(app, "/ip/2606:4700::1")[1]["published_rank"] == 2
+        assert get(app, "/ip/1.2.3.4")[0].status == 404
+        app.store.current().close()
+
+
+def test_reload_on_change(tmp_path):
+    app, best = make_app(tmp_path)
+    first, _ = get(app, "/best")
+    assert get(app, "/best")[0] is first and app.store.reloads == 1
+
+    best.write_text("104.16.0.3\n", encoding="utf-8")
+    os.utime(best, ns=(0, 0))
+    response, body = get(app, "/best")
+    assert response.etag != first.etag and body["ips"][0]["ip"] == "104.16.0.3"
+    assert app.store.reloads == 2
+
+    # 检查间隔内不重新 stat
+    app.store.check_interval = 3600
+    best.write_text("103.31.4.2\n", encoding="utf-8")
+    assert get(app, "/best")[0] is response
+
+    metrics = app.handle("GET", "/metrics", {}).body.decode()
+    assert 'cfst_api_requests_total{endpoint="best",status="200"} 4' in metrics
+    assert "cfst_api_reloads_total 2" in metrics and "cfst_api_result_rows 4" in metrics
+
+
+def test_corrupt_results_keep_previous_snapshot(tmp_path):
+    app, _ = make_app(tmp_path, "result.bin")
+    first, _ = get(app, "/best")
+    results = app.store.results
+    results.write_bytes(MAGIC + b"\x03")  # 写到一半的文件头
+    os.utime(results, ns=(0, 0))
+    response, body = get(app, "/best")
+    assert response.status == 200 and response.etag == first.etag and body["ips"][0]["latency"] == 10.0
+    assert app.store.reloads == 1 and app.store.reload_errors == 1
+    assert "cfst_api_reload_errors_total 1" in app.handle("GET", "/metrics", {}).body.decode()
+    app.store.current().close()
+
+    # 第一次加载就失败时返回 500，而不是断开连接
+    fresh = ApiApp(SnapshotStore(app.store.best_files, results, check_interval=0))
+    assert get(fresh, "/best")[0].status == 500 and get(fresh, "/metrics")[0].status == 500
+
+    ResultTable.from_csv(tmp_path / "result.csv").save(results)
+    assert get(fresh, "/best")[1]["count"] == 3
+    fresh.store.current().close()
+
+
+async def _cancel_all():
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_http_keep_alive(tmp_path):
+    app, _ = make_app(tmp_path)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    ready = asyncio.Event()
+    asyncio.run_coroutine_threadsafe(serve(app, "127.0.0.1", 0, ready), loop)
+    asyncio.run_coroutine_threadsafe(ready.wait(), loop).result(5)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", app.port, timeout=5)
+        conn.request("GET", "/best.txt")
+        response = conn.getresponse()
+        etag = response.getheader("ETag")
+        assert response.status == 200 and response.read() == b"104.16.0.1\n103.31.4.2\n2606:4700::1\n"
+        conn.request("GET", "/best.txt", headers={"If-None-Match": etag})
+        response = conn.getresponse()
+        assert response.status == 304 and response.read() == b""
+        conn.close()
+    finally:
+        asyncio.run_coroutine_threadsafe(_cancel_all(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import copy
+import csv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from benchmark import compare, generate_csv, run_benchmarks
+from region_index import classify_ips
+
+
+def test_synthetic_csv_is_cfst_shaped(tmp_path):
+    path = generate_csv(tmp_path / "synthetic.csv", 5000, seed=1)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    assert len(rows) == 5000
+    keys = [(float(r[3]), float(r[4])) for r in rows]
+    assert keys == sorted(keys)
+    regions = classify_ips([r[0] for r in rows])
+    assert 0.8 < regions.count("US") / len(rows) < 0.95
+    assert len(set(regions)) >= 6
+
+
+def test_run_and_compare(tmp_path):
+    current = run_benchmarks([2000], cases=["csv_parse", "select"], repeat=1, data_dir=tmp_path)
+    assert [(r["case"], r["rows"]) for r in current["results"]] == [("csv_parse", 2000), ("select", 2000)]
+    assert compare(current, current) == []
+
+    # 基线比当前快一倍（且机器校准相同）时应报告回退
+    baseline = copy.deepcopy(current)
+    for r in baseline["results"]:
+        r["seconds"] /= 2
+        r["peak_bytes"] //= 2
+    problems = compare(current, baseline, min_seconds=0)
+    assert len(problems) == 4
+    # 默认不比较基线耗时很短的用例，只比较内存
+    assert [p for p in compare(current, baseline) if "slower" in p] == []
+    assert len(compare(current, baseline)) == 2
+
+    # 当前机器整体慢一倍时不算回退
+    slow_machine = copy.deepcopy(current)
+    slow_machine["meta"]["calibration_s"] *= 2
+    for r in slow_machine["results"]:
+        r["seconds"] *= 2
+    assert compare(slow_machine, current) == []
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import sys
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from run_speedtest import file_sha256, install_cfst
+
+BINARY = b"\x7fELF" + b"cfst" * 1000
+
+
+def _make_tar(path: Path) -> Path:
+    with tarfile.open(path, "w:gz") as t:
+        for name, data in (("cfst", BINARY), ("使用说明.txt", b"docs"), ("cfst_hosts.sh", b"#!/bin/sh")):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    return path
+
+
+def _make_zip(path: Path) -> Path:
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("ip.txt", "1.1.1.0/24\n")
+        z.writestr("cfst.exe", BINARY)
+    return path
+
+
+def test_miss_extracts_only_binary_then_hits(tmp_path):
+    archive = _make_tar(tmp_path / "cfst_linux_amd64.tar.gz")
+    cache = tmp_path / "cache"
+    binary = install_cfst(archive, cache, "v1")
+    assert binary.read_bytes() == BINARY
+    assert binary.stat().st_mode & 0o111
+    assert sorted(p.name for p in binary.parent.iterdir()) == ["cfst", "cfst.json"]
+
+    mtime = binary.stat().st_mtime_ns
+    assert install_cfst(archive, cache, "v1") == binary
+    assert binary.stat().st_mtime_ns == mtime
+
+
+def test_new_archive_replaces_stale_entry(tmp_path):
+    cache = tmp_path / "cache"
+    old = install_cfst(_make_tar(tmp_path / "cfst_linux_amd64.tar.gz"), cache, "v1")
+    new = install_cfst(_make_tar(tmp_path / "cfst_linux_amd64.tar.gz"), cache, "v2")
+    assert new != old and not old.exists() and new.exists()
+
+
+def test_zip_and_checksum_verification(tmp_path):
+    archive = _make_zip(tmp_path / "cfst_windows_amd64.zip")
+    binary = install_cfst(archive, tmp_path / "cache", "v1", expected_sha256=file_sha256(archive))
+    assert binary.name == "cfst.exe" and binary.read_bytes() == BINARY
+    with pytest.raises(RuntimeError):
+        install_cfst(archive, tmp_path / "cache", "v1", expected_sha256="0" * 64)
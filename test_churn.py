@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from churn import churn_report, diff_runs, make_run, read_runs_from_dirs, read_runs_from_git
+from result_archive import ResultArchive
+
+HEADER = "IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n"
+
+
+def _result(rows: list[tuple[str, float]]) -> str:
+    return HEADER + "".join(f"{ip},4,4,0.00,{lat:.2f},0.00,N/A\n" for ip, lat in rows)
+
+
+def test_diff_two_runs():
+    old = make_run("a", ["104.16.0.1", "104.16.0.2", "141.101.64.1", "190.93.240.1"],
+                   [["104.16.0.1", "4", "4", "0", "5.00"], ["104.16.0.2", "4", "4", "0", "6.00"]])
+    new = make_run("b", ["104.16.0.2", "104.16.0.1", "103.31.4.1", "190.93.240.1"],
+                   [["104.16.0.2", "4", "4", "0", "5.50"], ["104.16.0.1", "4", "4", "0", "7.00"]])
+    d = diff_runs(old, new)
+    assert (d["kept"], d["entered"], d["left"]) == (3, 1, 1)
+    assert d["jaccard"] == round(3 / 5, 4)
+    assert d["rank_displacement"] == {"mean": round(2 / 3, 3), "median": 1, "max": 1}
+    assert d["latency_delta_ms"]["mean"] == 0.75
+    assert d["regions"] == {
+        "GB": {"kept": 0, "entered": 0, "left": 1},
+        "HK": {"kept": 1, "entered": 0, "left": 0},
+        "SG": {"kept": 0, "entered": 1, "left": 0},
+        "US": {"kept": 2, "entered": 0, "left": 0},
+    }
+
+
+def test_runs_from_git_and_dirs(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git = lambda *a: subprocess.run(["git", *a], cwd=repo, check=True, capture_output=True)
+    git("init", "-q")
+    git("config", "user.email", "t@example.com")
+    git("config", "user.name", "t")
+    days = [
+        [("104.16.0.1", 5.0), ("104.16.0.2", 6.0)],
+        [("104.16.0.2", 5.5), ("104.16.0.3", 6.5)],
+        [("104.16.0.2", 5.0), ("104.16.0.3", 6.0)],
+    ]
+    for i, rows in enumerate(days):
+        (repo / "best_ip.txt").write_text("\n".join(ip for ip, _ in rows) + "\n", encoding="utf-8")
+        (repo / "result.csv").write_text(_result(rows), encoding="utf-8")
+        git("add", ".")
+        git("commit", "-q", "-m", f"day {i}")
+        run_dir = tmp_path / f"day{i}"
+        run_dir.mkdir()
+        (run_dir / "best_ip.txt").write_text((repo / "best_ip.txt").read_text(encoding="utf-8"), encoding="utf-8")
+
+    runs = read_runs_from_git(repo, 10)
+    assert [r.rank for r in runs] == [{ip: i for i, (ip, _) in enumerate(rows)} for rows in days]
+    assert runs[2].latency == {"104.16.0.2": 5.0, "104.16.0.3": 6.0}
+
+    report = churn_report(runs)
+    assert [p["jaccard"] for p in report["pairs"]] == [round(1 / 3, 4), 1.0]
+    assert report["pairs"][1]["latency_delta_ms"]["mean"] == -0.5
+    assert report["summary"]["in_every_run"] == 1 and report["summary"]["distinct_ips"] == 3
+
+    local = read_runs_from_dirs([tmp_path / f"day{i}" for i in range(3)])
+    assert [r.rank for r in local] == [r.rank for r in runs]
+    assert [p["jaccard"] for p in churn_report(local, against="first")["pairs"]] == [round(1 / 3, 4), round(1 / 3, 4)]
+
+
+def test_runs_from_git_take_latencies_from_the_archive(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    env = dict(os.environ)
+    git = lambda *a: subprocess.run(["git", *a], cwd=repo, env=env, check=True, capture_output=True)
+    git("init", "-q")
+    git("config", "user.email", "t@example.com")
+    git("config", "user.name", "t")
+    archive = ResultArchive(repo / "results.archive")
+    header = _result([]).strip().split(",")
+    days = [
+        [("104.16.0.1", 5.0), ("104.16.0.2", 6.0)],
+        [("104.16.0.2", 5.5), ("104.16.0.3", 6.5)],
+        [("104.16.0.2", 4.5), ("104.16.0.3", 6.0)],
+    ]
+    # 旧版本提交过一份 result.csv，之后不再更新；第 1 天的运行未发布（best_ip.txt 没有提交）
+    (repo / "result.csv").write_text(_result(days[0]), encoding="utf-8")
+    for i, rows in enumerate(days):
+        t = 1792195200 + i * 86400
+        archive.append(header, [row.split(",") for row in _result(rows).splitlines()[1:]], t)
+        if i == 1:
+            continue
+        (repo / "best_ip.txt").write_text("\n".join(ip for ip, _ in rows) + "\n", encoding="utf-8")
+        env["GIT_COMMITTER_DATE"] = env["GIT_AUTHOR_DATE"] = f"{t + 60} +0000"
+        git("add", ".")
+        git("commit", "-q", "-m", f"day {i}")
+
+    runs = read_runs_from_git(repo, 10)
+    assert [r.latency for r in runs] == [{"104.16.0.1": 5.0, "104.16.0.2": 6.0},
+                                         {"104.16.0.2": 4.5, "104.16.0.3": 6.0}]
+    assert churn_report(runs)["pairs"][0]["latency_delta_ms"]["mean"] == -1.5
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import ipaddress
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from cidr_walk import CidrSpace, FeistelPermutation, read_cidrs, walk, walk_candidates
+
+ROOT = Path(__file__).resolve().parent
+
+
+def test_permutation_is_bijective():
+    for size in (0, 1, 2, 3, 17, 256, 1000, 4097):
+        perm = FeistelPermutation(size, seed=7)
+        assert sorted(perm[i] for i in range(size)) == list(range(size))
+    assert [FeistelPermutation(1000, 1)[i] for i in range(20)] != [FeistelPermutation(1000, 2)[i] for i in range(20)]
+
+
+def test_full_walk_covers_every_address_once():
+    space = CidrSpace(["10.0.0.0/23", "10.0.1.0/24", "10.2.0.0/30", "2606:4700::/126"])
+    ips = list(walk(space, seed=3))
+    # 重叠的网段被合并，IPv6 被忽略
+    assert len(space) == 516 and len(ips) == 516
+    expected = {str(ip) for net in ("10.0.0.0/23", "10.2.0.0/30") for ip in ipaddress.ip_network(net)}
+    assert set(ips) == expected
+    assert ips != sorted(ips, key=lambda ip: int(ipaddress.IPv4Address(ip)))
+
+
+def test_per_24_stratification():
+    space = CidrSpace(["10.0.0.0/22", "10.1.0.0/30"], per_block=3, seed=5)
+    ips = list(walk(space, seed=5))
+    assert len(ips) == len(set(ips)) == 15
+    assert Counter(ip.rsplit(".", 1)[0] for ip in ips) == {
+        "10.0.0": 3, "10.0.1": 3, "10.0.2": 3, "10.0.3": 3, "10.1.0": 3,
+    }
+    assert len(CidrSpace(["10.1.0.0/30"], per_block=8)) == 4
+
+
+def test_resume_and_shard_are_exact(tmp_path):
+    ip_txt = tmp_path / "ip.txt"
+    ip_txt.write_text("# ranges\n10.0.0.0/20\n10.9.0.0/24  # trailing comment\n", encoding="utf-8")
+    ips = list(walk_candidates(ip_txt, per_block=4, seed=11))
+    assert len(ips) == 17 * 4
+    assert list(walk_candidates(ip_txt, per_block=4, seed=11)) == ips
+    assert list(walk_candidates(ip_txt, per_block=4, seed=11, offset=10, limit=5)) == ips[10:15]
+
+    shards = [list(walk_candidates(ip_txt, per_block=4, seed=11, offset=6, shard=k, shards=3)) for k in range(3)]
+    assert sorted(ip for shard in shards for ip in shard) == sorted(ips[6:])
+    assert shards[1][0] == ips[7] and shards[2][:2] == [ips[8], ips[11]]
+
+
+def test_walks_repo_ip_txt_lazily():
+    cidrs = read_cidrs(ROOT / "ip.txt")
+    space = CidrSpace(cidrs, per_block=None, seed=1)
+    nets = ipaddress.collapse_addresses(ipaddress.ip_network(c) for c in cidrs if ":" not in c)
+    assert len(space) == sum(n.num_addresses for n in nets)
+    head = list(walk(space, seed=1, limit=5000))
+    assert len(set(head)) == 5000
+
+
+def test_ipv6_space_is_sampled_without_enumeration():
+    space = CidrSpace(["2606:4700::/32", "104.16.0.0/24"], per_block=None, seed=2, version=6)
+    assert space.size == 2 ** 96
+    head = list(walk(space, seed=2, limit=1000))
+    assert len(set(head)) == 1000
+    assert all(ipaddress.IPv6Address(ip) in ipaddress.ip_network("2606:4700::/32") for ip in head)
+
+    # 每个 /48 取 2 个，块内地址分散在主机部分
+    space = CidrSpace(["2001:db8::/46", "2001:db8:10::/120"], per_block=2, seed=4, version=6)
+    ips = list(walk(space, seed=4))
+    assert len(ips) == len(set(ips)) == 10
+    blocks = Counter(ipaddress.ip_network(ip + "/48", strict=False) for ip in ips)
+    assert set(blocks.values()) == {2} and len(blocks) == 5
+    assert len({ip.split(":", 3)[3] for ip in ips}) == 10
+
+
+def test_walk_candidates_mixed_families(tmp_path):
+    ip_txt = tmp_path / "ranges.txt"
+    ip_txt.write_text("10.0.0.0/23\n2001:db8::/47\n", encoding="utf-8")
+    ips = list(walk_candidates(ip_txt, per_block=1, seed=1))
+    assert [":" in ip for ip in ips] == [False, False, True, True]
+    assert len(list(walk_candidates(ip_txt, per_block=3, seed=1, limit=1, limit_v6=4))) == 5
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from colo import COLO_COLUMN, ColoCache, apply_colo_results, parse_trace, prefix_of, resolve_colos, top_ips
+from region_index import classify_ips, set_resolved_regions
+
+# 本地 trace 服务：按连接到达的本地地址（127.0.x.y）决定返回哪个数据中心
+COLOS = {"127.0.1": "NRT", "127.0.2": "LHR", "127.0.3": "XYZ"}
+
+
+class TraceHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        local = self.connection.getsockname()[0]
+        self.requests.append((local, self.path, self.headers["Host"]))
+        body = f"fl=1f1\nh={self.headers['Host']}\nip=203.0.113.9\nts=1.0\n" \
+               f"colo={COLOS[local.rsplit('.', 1)[0]]}\nloc=CN\ntls=off\n".encode()
+        self.send_response(200 if self.path == "/cdn-cgi/trace" else 404)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _server():
+    srv = ThreadingHTTPServer(("0.0.0.0", 0), TraceHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    TraceHandler.requests = []
+    return srv, f"http://trace.test:{srv.server_address[1]}/cdn-cgi/trace"
+
+
+def test_parse_trace_and_prefix():
+    fields = parse_trace("fl=1\nh=cloudflare.com\ncolo=SJC\nloc=US\nbad line\n")
+    assert fields["colo"] == "SJC" and fields["loc"] == "US" and "bad line" not in fields
+    assert prefix_of("188.114.97.52") == "188.114.97.0/24"
+    assert prefix_of("2606:4700:1:2::5") == "2606:4700:1::/48"
+
+
+def test_resolve_once_per_prefix_with_ttl(tmp_path):
+    srv, url = _server()
+    cache_path = tmp_path / "colo_cache.json"
+    try:
+        cache = ColoCache(cache_path, ttl=3600, now=1000.0)
+        stats = resolve_colos(["127.0.1.5", "127.0.1.9", "127.0.2.7", "127.0.3.1"], cache, url)
+        assert stats["requested"] == 3 and stats["resolved"] == 3 and stats["unknown_colos"] == ["XYZ"]
+        # 同一 /24 只请求排在最前的 IP；Host 取自 trace 地址
+        assert sorted(local for local, _, _ in TraceHandler.requests) == ["127.0.1.5", "127.0.2.7", "127.0.3.1"]
+        assert all(path == "/cdn-cgi/trace" and host.startswith("trace.test:")
+                   for _, path, host in TraceHandler.requests)
+        assert cache.regions() == {"127.0.1.0/24": "JP", "127.0.2.0/24": "GB"}
+        assert cache.get("127.0.3.0/24").colo == "XYZ" and cache.get("127.0.1.0/24").loc == "CN"
+        cache.save()
+
+        # TTL 内：全部命中缓存
+        again = ColoCache(cache_path, ttl=3600, now=2000.0)
+        assert resolve_colos(["127.0.1.77", "127.0.2.8"], again, url)["requested"] == 0
+        assert len(TraceHandler.requests) == 3
+
+        # 过期后重新请求
+        expired = ColoCache(cache_path, ttl=3600, now=5000.0)
+        assert expired.entries == {}
+        assert resolve_colos(["127.0.1.77"], expired, url)["requested"] == 1
+    finally:
+        srv.shutdown()
+
+
+def test_failed_trace_is_not_cached(tmp_path):
+    srv, url = _server()
+    srv.shutdown()
+    srv.server_close()
+    cache = ColoCache(None)
+    stats = resolve_colos(["127.0.1.5"], cache, url, timeout=1.0)
+    assert stats["requested"] == 1 and stats["resolved"] == 0 and cache.entries == {}
+
+
+def test_resolved_regions_feed_selection_and_csv(tmp_path):
+    cache = ColoCache(None)
+    srv, url = _server()
+    try:
+        resolve_colos(top_ips([("127.0.1.5", 9.0), ("127.0.9.9", 500.0), ("127.0.2.7", 12.0)], 2), cache, url)
+    finally:
+        srv.shutdown()
+    assert set(cache.regions()) == {"127.0.1.0/24", "127.0.2.0/24"}
+
+    try:
+        set_resolved_regions(cache.regions())
+        assert classify_ips(["127.0.1.200", "127.0.2.1", "127.0.9.9"]) == ["JP", "GB", "Other"]
+    finally:
+        set_resolved_regions({})
+    assert classify_ips(["127.0.1.200"]) == ["Other"]
+
+    csv_path = tmp_path / "result.csv"
+    csv_path.write_text("IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n"
+                        "127.0.1.8,4,4,0.00,9.00,0.00,N/A\n"
+                        "127.0.9.9,4,4,0.00,500.00,0.00,N/A\n", encoding="utf-8")
+    assert apply_colo_results(csv_path, cache) == 1
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][-1] == COLO_COLUMN
+    assert rows[1][6:] == ["JP", "NRT"] and rows[2][6:] == ["N/A", ""]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from daemon import HysteresisSet, IndexedHeap, run_daemon
+from run_speedtest import daemon_main
+
+
+def test_indexed_heap_matches_sorted():
+    rng = random.Random(3)
+    heap = IndexedHeap()
+    ref: dict[str, float] = {}
+    for step in range(2000):
+        key = f"k{rng.randrange(60)}"
+        op = rng.random()
+        if op < 0.5:
+            score = rng.uniform(0, 100)
+            heap.push(key, score)
+            ref[key] = score
+        elif key in ref:
+            heap.remove(key)
+            del ref[key]
+        assert len(heap) == len(ref)
+        if ref:
+            assert heap.peek()[1] == max(ref.values())
+            assert all(heap.score(k) == v for k, v in ref.items())
+
+
+def test_hysteresis_and_quotas():
+    live = HysteresisSet(["US"], max_per_region=2, max_total=3, margin=0.1, margin_ms=5, alpha=1.0)
+    for ip, region, score in [("us1", "US", 50), ("us2", "US", 80), ("gb1", "GB", 100)]:
+        assert live.challenge(ip, region, score) is None
+    assert live.ips() == ["us1", "us2", "gb1"]
+
+    # 优先地区已满：只与同地区最差的比较，且要好出迟滞阈值（80 × 0.9 - 5 = 67）
+    assert live.challenge("us3", "US", 70) is None
+    swap = live.challenge("us3", "US", 60)
+    assert swap is not None and (swap.removed, swap.added) == ("us2", "us3")
+
+    # 集合已满、地区不在集合中：与全体最差的比较
+    swap = live.challenge("jp1", "JP", 10)
+    assert swap is not None and swap.removed == "gb1"
+    assert live.ips() == ["jp1", "us1", "us3"]
+
+    # 复测：已在集合中的 IP 只更新分数
+    assert live.challenge("us1", "US", 500) is None and live.score("us1") == 500
+    assert "us1" in live and len(live) == 3
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_run_daemon_replaces_degraded_ip(tmp_path):
+    ip_txt = tmp_path / "ip.txt"
+    ip_txt.write_text("10.0.0.0/22\n", encoding="utf-8")
+    best = tmp_path / "best_ip.txt"
+    best.write_text("10.0.0.1\n10.0.1.1\n", encoding="utf-8")
+
+    latency = {"10.0.0.1": 20.0, "10.0.1.1": 30.0}
+    probed: list[list[str]] = []
+
+    def probe(ips):
+        probed.append(list(ips))
+        return {ip: latency.get(ip, 28.0) for ip in ips}
+
+    clock = FakeClock()
+    live = HysteresisSet(["US"], max_per_region=10, max_total=2, margin=0.1, margin_ms=0, alpha=1.0)
+    stats = run_daemon(ip_txt, best, live, probe, per_24=1, seed=5, challengers=2,
+                       incumbent_interval=60, challenger_interval=300, rounds=1,
+                       sleep=clock.sleep, clock=clock)
+    # 挑战者 28ms 没有好出 30ms 的 10%，集合不变，文件不重写
+    assert best.read_text(encoding="utf-8").split() == ["10.0.0.1", "10.0.1.1"]
+    assert stats["swaps"] == 0 and stats["writes"] == 0
+
+    # 10.0.1.1 变差后，下一轮挑战者替换它
+    latency["10.0.1.1"] = 300.0
+    live = HysteresisSet(["US"], max_per_region=10, max_total=2, margin=0.1, margin_ms=0, alpha=1.0)
+    stats = run_daemon(ip_txt, best, live, probe, per_24=1, seed=5, challengers=2,
+                       incumbent_interval=60, challenger_interval=300, rounds=8,
+                       sleep=clock.sleep, clock=clock)
+    published = best.read_text(encoding="utf-8").split()
+    assert published[0] == "10.0.0.1" and "10.0.1.1" not in published
+    assert stats["swaps"] == 1 and stats["writes"] == 1
+    assert not (tmp_path / "best_ip.txt.tmp").exists()
+
+    # 复测每 60 秒一次，挑战者每 300 秒一次：8 轮里挑战者只测了 2 次
+    assert stats["challenger_probes"] == 2 * 2
+    assert len(set(ip for batch in probed for ip in batch)) <= 2 + 2 * 3
+
+
+def test_daemon_main_rejects_dual(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("GITHUB_WORKSPACE", str(tmp_path))
+    monkeypatch.setenv("IP_VERSION", "dual")
+    assert daemon_main() == 2
+    assert "IP_VERSION 4 or 6" in capsys.readouterr().out
+    assert list(tmp_path.iterdir()) == []
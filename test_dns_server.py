@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import socket
+import struct
+import asyncio
+import ipaddress
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from dns_server import (AnswerTable, DnsResponder, encode_name, load_selection, serve, watch,
+                        weighted_variants)
+
+IPV4 = [("104.16.0.1", 10.0), ("104.16.0.2", 20.0), ("104.16.0.3", 40.0), ("104.16.0.4", 80.0),
+        ("104.16.0.5", 160.0), ("104.16.0.6", 320.0)]
+IPV6 = [("2606:4700::1", 15.0)]
+
+
+def query(name: str, qtype: int = 1, ident: int = 0x1234, flags: int = 0x0100) -> bytes:
+    return struct.pack("!HHHHHH", ident, flags, 1, 0, 0, 0) + encode_name(name) + struct.pack("!HH", qtype, 1)
+
+
+def parse(response: bytes) -> tuple[int, int, list[str]]:
+    """返回 (id, rcode, 应答中的地址)"""
+    ident, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", response)
+    pos = 12
+    for _ in range(qdcount):
+        while response[pos]:
+            pos += response[pos] + 1
+        pos += 5
+    ips = []
+    for _ in range(ancount):
+        assert response[pos:pos + 2] == b"\xc0\x0c"
+        rdlength = struct.unpack_from("!H", response, pos + 10)[0]
+        ips.append(str(ipaddress.ip_address(response[pos + 12:pos + 12 + rdlength])))
+        pos += 12 + rdlength
+    assert pos == len(response)
+    return ident, flags & 0xF, ips
+
+
+def test_weighted_variants_favour_low_latency():
+    groups = weighted_variants(IPV4, 2, 2000, seed=1)
+    assert all(len(set(g)) == 2 for g in groups)
+    first = Counter(g[0] for g in groups)
+    assert first["104.16.0.1"] > first["104.16.0.2"] > first["104.16.0.3"] > first["104.16.0.6"]
+    assert weighted_variants(IPV4[:2], 4, 10) == [["104.16.0.1", "104.16.0.2"]]
+    assert weighted_variants([], 4, 10) == []
+
+
+def test_responses():
+    responder = DnsResponder(AnswerTable(["cdn.example.com"], IPV4, IPV6, answers=3, variants=16))
+    seen = set()
+    for i in range(32):
+        ident, rcode, ips = parse(responder.respond(query("CDN.Example.com", ident=i)))
+        assert ident == i and rcode == 0 and len(ips) == 3
+        seen.update(ips)
+    assert seen <= {ip for ip, _ in IPV4} and len(seen) > 3
+
+    assert parse(responder.respond(query("cdn.example.com", 28)))[1:] == (0, ["2606:4700::1"])
+    # 其他类型：NOERROR、无记录；未配置的域名：REFUSED
+    assert parse(responder.respond(query("cdn.example.com", 15)))[1:] == (0, [])
+    assert parse(responder.respond(query("other.example.com")))[1:] == (5, [])
+    # 报文格式错误返回 FORMERR；应答报文直接丢弃
+    assert parse(responder.respond(query("cdn.example.com")[:-3]))[1] == 1
+    assert responder.respond(query("cdn.example.com", flags=0x8000)) is None
+    assert responder.respond(b"\x00") is None
+
+
+async def _cancel_all():
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_load_selection_and_udp(tmp_path):
+    csv = tmp_path / "result.csv"
+    csv.write_text("IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n"
+                   "104.16.0.1,4,4,0.00,12.50,0.00,US\n"
+                   "104.16.0.2,4,4,0.00,30.00,0.00,US\n"
+                   "2606:4700::1,4,4,0.00,20.00,0.00,US\n", encoding="utf-8")
+    ipv4, ipv6 = load_selection(csv, ["US"])
+    assert ipv4 == [("104.16.0.1", 12.5), ("104.16.0.2", 30.0)] and ipv6 == [("2606:4700::1", 20.0)]
+
+    responder = DnsResponder(AnswerTable(["cdn.example.com"], ipv4, ipv6))
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    ready = asyncio.Event()
+    asyncio.run_coroutine_threadsafe(serve(responder, "127.0.0.1", 0, ready), loop)
+    asyncio.run_coroutine_threadsafe(ready.wait(), loop).result(5)
+    try:
+        port = responder.transport.get_extra_info("sockname")[1]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(5)
+            sock.sendto(query("cdn.example.com"), ("127.0.0.1", port))
+            assert parse(sock.recv(512))[2] == ["104.16.0.1", "104.16.0.2"]
+
+            # 热替换应答表
+            responder.table = AnswerTable(["cdn.example.com"], [("104.16.0.9", 5.0)], [])
+            sock.sendto(query("cdn.example.com"), ("127.0.0.1", port))
+            assert parse(sock.recv(512))[2] == ["104.16.0.9"]
+    finally:
+        asyncio.run_coroutine_threadsafe(_cancel_all(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_reload_does_not_block_the_loop(tmp_path):
+    results = tmp_path / "result.csv"
+    results.write_text("old\n", encoding="utf-8")
+    responder = DnsResponder(AnswerTable(["cdn.example.com"], IPV4, [], answers=1, variants=4))
+    new_table = AnswerTable(["cdn.example.com"], IPV4[5:], [], answers=1, variants=4)
+
+    def slow_build():
+        time.sleep(0.5)
+        return new_table
+
+    async def scenario():
+        task = asyncio.create_task(watch(responder, results, slow_build, interval=0.01))
+        await asyncio.sleep(0.05)
+        results.write_text("new results\n", encoding="utf-8")
+        # 重建在工作线程中进行：期间事件循环仍能及时处理查询
+        start = last = time.perf_counter()
+        longest = 0.0
+        while responder.table is not new_table:
+            parse(responder.respond(query("cdn.example.com")))
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            longest, last = max(longest, now - last), now
+            assert now - start < 5
+        task.cancel()
+        return now - start, longest
+
+    elapsed, longest = asyncio.run(scenario())
+    assert elapsed >= 0.4 and longest < 0.25
+    assert parse(responder.respond(query("cdn.example.com")))[2] == ["104.16.0.6"]
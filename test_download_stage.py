@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from download_stage import TTFB_COLUMN, DownloadResult, apply_download_results, run_download_stage
+
+# 本地测速服务器：每个连接限速 256 KB/s
+PER_CONNECTION_RATE = 256 * 1024
+CHUNK = 16 * 1024
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    ranges = []
+
+    def do_GET(self):
+        start, end = self.headers["Range"].split("=", 1)[1].split("-")
+        self.ranges.append((int(start), int(end)))
+        length = int(end) - int(start) + 1
+        self.send_response(206)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        try:
+            while length > 0:
+                n = min(CHUNK, length)
+                self.wfile.write(b"\0" * n)
+                length -= n
+                time.sleep(n / PER_CONNECTION_RATE)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def _server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://speed.test:{srv.server_address[1]}/file"
+
+
+def test_parallel_connections_scale_throughput():
+    srv, url = _server()
+    ThrottledHandler.ranges = []
+    try:
+        results, stats = run_download_stage(["127.0.0.1"], url, connections=3, duration=1.0)
+    finally:
+        srv.shutdown()
+    r = results[0]
+    assert r.connections_ok == 3 and stats["ok"] == 1
+    assert r.ttfb > 0
+    # 3 个连接 × 0.25 MB/s
+    assert 0.45 < r.speed < 0.95
+    starts = sorted(start for start, _ in ThrottledHandler.ranges)
+    assert len(set(starts)) == 3
+
+
+def test_global_budget_caps_throughput():
+    srv, url = _server()
+    try:
+        results, _ = run_download_stage(["127.0.0.1"], url, connections=3, duration=1.5, budget=64 * 1024)
+    finally:
+        srv.shutdown()
+    assert results[0].speed < 0.2
+
+
+def test_unreachable_ip_records_nothing(tmp_path):
+    results, stats = run_download_stage(["127.0.0.1"], "http://speed.test:1/file", connections=2,
+                                        duration=0.5, timeout=0.5)
+    assert results[0].connections_ok == 0 and stats["ok"] == 0
+
+    csv_path = tmp_path / "result.csv"
+    csv_path.write_text(
+        "IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n"
+        "1.1.1.1,4,4,0.00,5.00,0.00,N/A\n"
+        "1.1.1.2,4,4,0.00,6.00,0.00,N/A\n", encoding="utf-8")
+    apply_download_results(csv_path, [DownloadResult("1.1.1.2", 100, 12.5, 33.3, 4)])
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][-1] == TTFB_COLUMN
+    assert rows[1][5] == "0.00" and rows[1][-1] == ""
+    assert rows[2][5] == "12.50" and rows[2][-1] == "33.30"
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from downloader import download, download_many
+
+IP_TXT = b"173.245.48.0/20\n103.21.244.0/22\n"
+ARCHIVE = bytes(range(256)) * 800
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """本地替身：按脚本注入 503、半途断开，并支持 304 和 Range"""
+
+    requests = []
+    fail_next = {}
+
+    def do_GET(self):
+        self.requests.append((self.path, dict(self.headers)))
+        if self.fail_next.get(self.path, 0) > 0:
+            self.fail_next[self.path] -= 1
+            if self.path == "/archive":
+                # 声明完整长度但只发送一半就断开
+                self.send_response(200)
+                self.send_header("ETag", '"a1"')
+                self.send_header("Content-Length", str(len(ARCHIVE)))
+                self.end_headers()
+                self.wfile.write(ARCHIVE[:len(ARCHIVE) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.send_error(503)
+            return
+
+        if self.path == "/ip.txt":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(200, IP_TXT, '"v1"')
+        elif self.path == "/archive":
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range") == '"a1"':
+                start = int(range_header.split("=")[1].rstrip("-"))
+                self._send(206, ARCHIVE[start:], '"a1"')
+            else:
+                self._send(200, ARCHIVE, '"a1"')
+        else:
+            self.send_error(404)
+
+    def _send(self, status, body, etag):
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.requests = []
+    FlakyHandler.fail_next = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv, f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def test_retry_then_conditional_304(server, tmp_path):
+    _, base = server
+    FlakyHandler.fail_next["/ip.txt"] = 2
+    dst = tmp_path / "ip.txt"
+
+    first = download(f"{base}/ip.txt", dst, conditional=True, backoff=0.01)
+    assert dst.read_bytes() == IP_TXT
+    assert first.attempts == 3 and not first.not_modified
+
+    second = download(f"{base}/ip.txt", dst, conditional=True, backoff=0.01)
+    assert second.not_modified and second.bytes_downloaded == 0
+    assert FlakyHandler.requests[-1][1].get("If-None-Match") == '"v1"'
+    assert dst.read_bytes() == IP_TXT
+
+
+def test_resume_after_truncated_body(server, tmp_path):
+    _, base = server
+    FlakyHandler.fail_next["/archive"] = 1
+    dst = tmp_path / "cfst.tar.gz"
+
+    result = download(f"{base}/archive", dst, backoff=0.01)
+    assert dst.read_bytes() == ARCHIVE
+    assert result.attempts == 2
+    assert FlakyHandler.requests[-1][1].get("Range") == f"bytes={len(ARCHIVE) // 2}-"
+    assert not (tmp_path / "cfst.tar.gz.part").exists()
+
+
+def test_permanent_error_and_concurrent_jobs(server, tmp_path):
+    _, base = server
+    with pytest.raises(urllib.error.HTTPError):
+        download(f"{base}/missing", tmp_path / "missing", backoff=0.01)
+    assert not (tmp_path / "missing").exists()
+
+    results = download_many([
+        {"url": f"{base}/ip.txt", "dst": tmp_path / "a" / "ip.txt"},
+        {"url": f"{base}/archive", "dst": tmp_path / "b" / "archive"},
+    ])
+    assert [r.bytes_downloaded for r in results] == [len(IP_TXT), len(ARCHIVE)]
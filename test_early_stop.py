@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import socket
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from early_stop import PerFamilyTracker, QuotaTracker
+from region_index import RegionIndex
+from tcp_probe import run_probes
+
+INDEX = RegionIndex([("10.1.0.0/16", "US", 1), ("10.2.0.0/16", "JP", 1), ("127.0.0.0/8", "US", 1),
+                     ("2606:4700::/32", "US", 1)])
+
+
+def _listener() -> tuple[socket.socket, int]:
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(128)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return srv, srv.getsockname()[1]
+
+
+def test_region_quotas_and_settling():
+    tracker = QuotaTracker(["US", "JP"], max_per_region=2, max_total=5, cutoff_ms=50, index=INDEX)
+    us = tracker.admit("10.1.0.1")
+    assert us == "US" and not tracker.settled
+
+    # 超过 cutoff 或有丢包的结果不计入
+    tracker.observe("US", 80, 0.0)
+    tracker.observe("US", 10, 0.25)
+    for _ in range(2):
+        tracker.observe("US", 10, 0.0)
+    # US 已满，但第一、二轮还填不满 5 个：US 的 IP 仍可能用于回填
+    assert tracker.wants("US")
+    for _ in range(3):
+        tracker.observe("Other", 20, 0.0)
+    # 2 (US) + 3 (其他) 已填满：US 的回填用不上，非优先地区也够了，只剩 JP 可能改变结果
+    assert not tracker.wants("US") and not tracker.wants("Other") and tracker.wants("JP")
+    assert tracker.admit("10.1.0.2") is None and tracker.admit("10.9.0.1") is None
+    assert tracker.skipped == 2 and not tracker.settled
+
+    tracker.observe("JP", 30, 0.0)
+    tracker.observe("JP", 30, 0.0)
+    assert tracker.settled and tracker.summary()["filled"] == {"JP": 2, "US": 2}
+
+
+def test_priority_regions_alone_fill_total():
+    tracker = QuotaTracker(["US", "JP"], max_per_region=50, max_total=3, cutoff_ms=50, index=INDEX)
+    for _ in range(3):
+        tracker.observe("US", 5, 0.0)
+    # 第一轮已有 3 个足够好的 IP：JP 即使没有 IP 也只能换掉同样足够好的 IP
+    assert tracker.settled and not tracker.wants("JP")
+
+
+def test_per_family_tracker():
+    tracker = PerFamilyTracker(["US"], max_per_region=1, max_total=1, cutoff_ms=50, index=INDEX)
+    token = tracker.admit("10.1.0.1")
+    tracker.observe(token, 5, 0.0)
+    assert not tracker.settled and tracker.admit("10.1.0.2") is None
+    token = tracker.admit("2606:4700::1")
+    assert token == (6, "US")
+    tracker.observe(token, 5, 0.0)
+    assert tracker.settled
+
+
+def test_run_probes_stops_once_settled():
+    srv, port = _listener()
+    try:
+        gate = QuotaTracker(["US"], max_per_region=5, max_total=5, cutoff_ms=1000, index=INDEX)
+        results, stats = run_probes(["127.0.0.1"] * 100, port=port, count=2, concurrency=2, timeout=1.0,
+                                    gate=gate)
+    finally:
+        srv.close()
+    assert gate.settled
+    # 选择结果确定后只有正在进行的测速会完成
+    assert 5 <= len(results) <= 5 + 2
+    early = stats["early_stop"]
+    assert early["settled"] and early["unprobed"] == 100 - len(results)
+    assert stats["probes"] == len(results) * 2 and early["saved_s_est"] >= 0
+
+
+def test_run_probes_without_good_results_probes_everything():
+    gate = QuotaTracker(["US"], max_per_region=1, max_total=1, cutoff_ms=1000, index=INDEX)
+    srv, port = _listener()
+    srv.close()
+    results, stats = run_probes(["127.0.0.1"] * 5, port=port, count=1, timeout=0.5, gate=gate)
+    assert results == [] and stats["early_stop"]["unprobed"] == 0 and not gate.settled
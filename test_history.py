@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "scripts"))
+from history import open_history, prefix_of, record_run, stability_scores, top_ips, top_prefixes
+from run_speedtest import iter_result_records
+
+
+def test_ewma_scores_and_ranking(tmp_path):
+    conn = open_history(tmp_path / "history.sqlite3")
+    record_run(conn, [("1.1.1.1", 10.0, 0.0, 0.0), ("1.1.1.2", 50.0, 0.0, 0.0)], alpha=0.5)
+    record_run(conn, [("1.1.1.1", 30.0, 0.5, 2.0), ("1.1.1.2", 50.0, 0.0, 0.0)], alpha=0.5)
+
+    # 1.1.1.1: 延迟 EWMA = 20ms，丢包 EWMA = 0.25 -> 分数 20 + 250
+    ranked = top_ips(conn, limit=10)
+    assert [ip for ip, _, _ in ranked] == ["1.1.1.2", "1.1.1.1"]
+    assert ranked[1][1] == 270.0 and ranked[1][2] == 2
+
+    assert top_prefixes(conn)[0][0] == "1.1.1.0/24"
+    assert prefix_of("2606:4700:10::1") == "2606:4700:10::/48"
+
+    # 样本不足时使用网段分数
+    record_run(conn, [("1.1.1.3", 5.0, 0.0, 0.0)])
+    scores = stability_scores(conn, ["1.1.1.1", "1.1.1.3", "9.9.9.9"], min_samples=2)
+    assert scores["1.1.1.1"] == 270.0
+    assert scores["1.1.1.3"] != 5.0
+    assert "9.9.9.9" not in scores
+    conn.close()
+
+
+def test_record_committed_result_csv_is_fast(tmp_path):
+    records = list(iter_result_records(ROOT / "test_result.csv"))
+    conn = open_history(tmp_path / "history.sqlite3")
+    start = time.perf_counter()
+    for day in range(3):
+        record_run(conn, records, run_at=f"2026-01-0{day + 1}T20:00:00+00:00")
+    assert len(top_ips(conn, limit=100)) == 100
+    assert time.perf_counter() - start < 5.0
+    conn.close()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from hosts_update import BEGIN_MARKER, END_MARKER, assign, main, replace_block, update_hosts
+
+DOMAINS = [f"d{i}.example.com" for i in range(40)]
+IPS = ["104.16.0.1", "104.16.0.2", "104.16.0.3", "104.16.0.4"]
+
+HOSTS = "127.0.0.1\tlocalhost\n::1\tlocalhost\n# keep me\n10.0.0.1\tnas.lan\n"
+
+
+def test_policies():
+    assert set(assign(DOMAINS, IPS, "first").values()) == {IPS[0]}
+    rr = assign(DOMAINS, IPS, "round-robin")
+    assert [rr[d] for d in DOMAINS[:5]] == IPS + IPS[:1]
+
+    spread = assign(DOMAINS, IPS)
+    assert set(spread.values()) == set(IPS)
+    assert assign(DOMAINS, IPS) == spread
+    # rendezvous：替换一个 IP 时，原本不指向它的域名要么不变，要么移到新 IP 上
+    moved = assign(DOMAINS, IPS[:3] + ["104.16.0.9"])
+    assert all(moved[d] in (spread[d], "104.16.0.9") for d in DOMAINS if spread[d] != IPS[3])
+    assert sum(moved[d] != spread[d] for d in DOMAINS) < len(DOMAINS) // 2
+    assert assign(DOMAINS, []) == {}
+
+
+def test_replace_block_keeps_unmanaged_lines():
+    block = [BEGIN_MARKER, "1.1.1.1\ta.example.com", END_MARKER]
+    once = replace_block(HOSTS, block)
+    assert once.startswith(HOSTS) and once.endswith(END_MARKER + "\n")
+    twice = replace_block(once, [BEGIN_MARKER, "2.2.2.2\ta.example.com", END_MARKER])
+    assert twice == once.replace("1.1.1.1", "2.2.2.2")
+    assert replace_block(once.replace("\n", "\r\n"), block) == once.replace("\n", "\r\n")
+
+
+def test_update_is_atomic_and_skips_unchanged(tmp_path):
+    hosts = tmp_path / "hosts"
+    hosts.write_text(HOSTS, encoding="utf-8")
+    os.chmod(hosts, 0o640)
+
+    assert update_hosts(hosts, ["a.example.com", "b.example.com"], IPS, ["2606:4700::1"], "round-robin")
+    text = hosts.read_text(encoding="utf-8")
+    assert text.startswith(HOSTS)
+    assert "104.16.0.1\ta.example.com\n104.16.0.2\tb.example.com\n2606:4700::1\ta.example.com\n" in text
+    assert hosts.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["hosts"]
+
+    mtime = hosts.stat().st_mtime_ns
+    assert not update_hosts(hosts, ["a.example.com", "b.example.com"], IPS, ["2606:4700::1"], "round-robin")
+    assert hosts.stat().st_mtime_ns == mtime
+
+
+def test_update_keeps_crlf_line_endings(tmp_path):
+    hosts = tmp_path / "hosts"
+    hosts.write_bytes(b"127.0.0.1\tlocalhost\r\n::1\tlocalhost\r\n")
+
+    assert update_hosts(hosts, ["a.example.com"], IPS)
+    data = hosts.read_bytes()
+    assert data.startswith(b"127.0.0.1\tlocalhost\r\n::1\tlocalhost\r\n\r\n" + BEGIN_MARKER.encode() + b"\r\n")
+    assert data.endswith(END_MARKER.encode() + b"\r\n") and b"\n" not in data.replace(b"\r\n", b"")
+    assert not update_hosts(hosts, ["a.example.com"], IPS)
+
+
+def test_cli(tmp_path, capsys):
+    best = tmp_path / "best_ip.txt"
+    best.write_text("\n".join(IPS) + "\n", encoding="utf-8")
+    domains = tmp_path / "domains.txt"
+    domains.write_text("# sites\na.example.com\nb.example.com\n", encoding="utf-8")
+    hosts = tmp_path / "hosts"
+
+    assert main(["--hosts", str(hosts), "--best", str(best), "--domains-file", str(domains), "--top", "1"]) == 0
+    assert hosts.read_text(encoding="utf-8").splitlines() == [
+        BEGIN_MARKER, "104.16.0.1\ta.example.com", "104.16.0.1\tb.example.com", END_MARKER,
+    ]
+    assert main(["--hosts", str(hosts), "--best", str(best), "--domains", "a.example.com", "--top", "1"]) == 0
+    assert "updated" in capsys.readouterr().out
+    assert main(["--hosts", str(hosts), "--best", str(tmp_path / "best_ip.txt"), "--domains", "a.example.com",
+                 "--top", "1"]) == 0
+    assert "unchanged" in capsys.readouterr().out
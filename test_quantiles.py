@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from quantiles import LatencyStats, P2Quantile, exact_quantile
+
+
+def test_few_samples_are_exact():
+    stats = LatencyStats().extend([10.0, 30.0, 20.0, 40.0])
+    assert stats.count == 4 and stats.mean == 25.0
+    assert stats.quantile(0.5) == 25.0 and abs(stats.quantile(0.95) - 38.5) < 1e-9
+    assert abs(stats.stddev - statistics.pstdev([10, 30, 20, 40])) < 1e-9
+    # 相邻之差：20, 10, 20
+    assert abs(stats.jitter - 50 / 3) < 1e-9
+    assert LatencyStats().quantile(0.99) == 0.0 and LatencyStats().extend([7.0]).jitter == 0.0
+
+
+def test_p2_tracks_heavy_tail_in_constant_memory():
+    rng = random.Random(7)
+    # 大部分握手 20ms 左右，约 8% 遇到 150ms 以上的重传
+    values = [rng.gauss(20, 2) if rng.random() > 0.08 else rng.uniform(150, 250) for _ in range(20000)]
+    stats = LatencyStats().extend(values)
+    ordered = sorted(values)
+    for p, tolerance in ((0.5, 0.5), (0.95, 10.0), (0.99, 10.0)):
+        assert abs(stats.quantile(p) - exact_quantile(ordered, p)) < tolerance
+    assert stats.quantile(0.95) > 5 * stats.quantile(0.5)
+    assert abs(stats.mean - statistics.fmean(values)) < 1e-6
+    assert all(len(e.heights) == 5 for e in stats.estimators.values())
+
+
+def test_p2_monotone_input():
+    estimator = P2Quantile(0.9)
+    for x in range(1, 1001):
+        estimator.add(float(x))
+    assert abs(estimator.value() - 900) < 5
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from region_index import RegionIndex, get_region_for_ip, classify_ips
+
+
+def test_default_index_matches_known_ranges():
+    cases = [
+        ("173.245.59.249", "US"),
+        ("188.114.97.52", "US"),
+        ("172.65.95.96", "US"),
+        ("104.31.255.255", "US"),
+        ("104.32.0.0", "Other"),
+        ("190.93.246.50", "HK"),
+        ("141.101.115.156", "GB"),
+        ("103.31.4.13", "SG"),
+        ("131.0.72.1", "Other"),
+        ("8.8.8.8", "Other"),
+        ("2606:4700::1", "US"),
+        ("2400:cb00:2049::1", "JP"),
+        ("2a06:98c0:3600::103", "GB"),
+        ("2001:db8::1", "Other"),
+        ("not-an-ip", "Other"),
+    ]
+    for ip, expected in cases:
+        assert get_region_for_ip(ip) == expected, ip
+    assert classify_ips([ip for ip, _ in cases]) == [expected for _, expected in cases]
+
+
+def test_nested_prefixes_and_priority():
+    index = RegionIndex([
+        ("10.0.0.0/8", "AA", 0),
+        ("10.1.0.0/16", "BB", 0),
+        ("10.1.2.0/24", "CC", 1),
+        ("10.0.0.0/8", "DD", 1),
+        ("2400:cb00::/32", "V6", 0),
+    ])
+    assert index.lookup("10.9.9.9") == "DD"
+    assert index.lookup("10.1.9.9") == "DD"
+    assert index.lookup("10.1.2.3") == "CC"
+    assert index.lookup("11.0.0.0") == "Other"
+    assert index.lookup("2400:cb00:1::1") == "V6"
+    assert index.classify_many(["10.1.2.3", "2400:cb00::", "x"]) == ["CC", "V6", "Other"]
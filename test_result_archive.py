@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from churn import top_set_change
+from result_archive import ResultArchive, decode_run, encode_run, sort_like_result
+
+ROOT = Path(__file__).resolve().parent
+
+HEADER = ["IP 地址", "已发送", "已接收", "丢包率", "平均延迟", "下载速度(MB/s)", "地区码", "抖动(ms)"]
+ROWS = [
+    ["104.16.0.9", "4", "4", "0.00", "9.00", "1.50", "US", "0.8"],
+    ["2606:4700::1", "4", "4", "0.00", "3.00", "0.00", "N/A", "0.1"],
+    ["104.16.0.2", "4", "3", "0.25", "2.00", "0.00", "US", "0.4"],
+    ["not-an-ip", "4", "4", "0.00", "1.00", "0.00", "N/A", "0"],
+    ["190.93.240.1", "4", "3", "0.25", "bad", "0.00", "N/A"],
+]
+
+DAY = 86400.0
+T0 = 1792195200.0  # 2026-10-17 00:00 UTC
+
+
+def test_round_trip_is_lossless_up_to_row_order():
+    payload, count = encode_run(HEADER, ROWS)
+    header, rows = decode_run(payload)
+    assert count == 4 and header == HEADER
+    # IPv4 按地址升序，IPv6 在后；数值列保持原有的小数位数，非数值列（平均延迟含 bad）按类别存储
+    assert [row[0] for row in rows] == ["104.16.0.2", "104.16.0.9", "190.93.240.1", "2606:4700::1"]
+    assert rows[1] == ROWS[0] and rows[3] == ROWS[1] and rows[2] == ROWS[4] + [""]
+    assert [row[0] for row in sort_like_result(rows)] == ["2606:4700::1", "104.16.0.9", "104.16.0.2",
+                                                          "190.93.240.1"]
+
+
+def test_numeric_columns_keep_each_values_precision():
+    header = ["IP 地址", "平均延迟", "下载速度(MB/s)", "抖动(ms)", "P95延迟(ms)"]
+    rows = [
+        ["104.16.0.1", "5.5", "-0.00", "0.123456", "12"],
+        ["104.16.0.2", "5.50", "0.00", "0.1", "-3.25"],
+        ["104.16.0.3", "5", "1.50", "2", "007"],
+    ]
+    payload, _ = encode_run(header, rows)
+    assert decode_run(payload) == (header, rows)
+
+
+def test_archive_is_much_smaller_than_the_csv(tmp_path):
+    archive = ResultArchive(tmp_path / "results.archive")
+    info = archive.append_csv(ROOT / "test_result.csv", T0)
+    assert info.rows > 2000 and info.size * 8 < (ROOT / "test_result.csv").stat().st_size
+
+    out = tmp_path / "result.csv"
+    archive.export_csv("2026-10-17", out)
+    with open(ROOT / "test_result.csv", encoding="utf-8", newline="") as f:
+        original = list(csv.reader(f))
+    with open(out, encoding="utf-8", newline="") as f:
+        exported = list(csv.reader(f))
+    assert exported[0] == original[0] and sorted(exported[1:]) == sorted(original[1:])
+
+
+def test_append_and_random_access_by_date(tmp_path):
+    path = tmp_path / "results.archive"
+    archive = ResultArchive(path)
+    for day in range(3):
+        archive.append(HEADER, [[f"104.16.{day}.1", "4", "4", "0.00", f"{10 + day}.00", "0.00", "US", "0"]],
+                       T0 + day * DAY)
+    # 同一天的第二次运行覆盖按日期的查找结果
+    archive.append(HEADER, [["104.16.9.9", "4", "4", "0.00", "1.00", "0.00", "US", "0"]], T0 + DAY + 3600)
+
+    assert [run.date for run in archive.runs()] == ["2026-10-17", "2026-10-18", "2026-10-19", "2026-10-18"]
+    assert archive.read("2026-10-17")[1][0][0] == "104.16.0.1"
+    assert archive.read("2026-10-18")[1][0][0] == "104.16.9.9"
+    assert archive.read(archive.runs()[1])[1][0][4] == "11.00"
+    assert archive.read()[1][0][0] == "104.16.9.9"
+    try:
+        archive.read("2026-10-20")
+        assert False
+    except KeyError:
+        pass
+
+    # 追加时被打断：残缺的记录被忽略，下次追加前截掉
+    size = path.stat().st_size
+    with open(path, "ab") as f:
+        f.write(b"CFA1\x00\x01")
+    assert len(archive.runs()) == 4
+    archive.append(HEADER, [], T0 + 3 * DAY)
+    assert len(archive.runs()) == 5 and archive.read("2026-10-20") == (HEADER, [])
+    assert path.stat().st_size > size and archive.read("2026-10-19")[1][0][0] == "104.16.2.1"
+
+
+def test_top_set_change():
+    old = ["104.16.0.1", "104.16.0.2", "104.16.0.3", "104.16.0.4"]
+    assert top_set_change(old, list(reversed(old))) == 0.0
+    assert top_set_change(old, old[:3] + ["104.16.0.9"]) == 0.25
+    assert top_set_change(old, old[:2]) == 0.5
+    assert top_set_change([], old) == 1.0 and top_set_change([], []) == 0.0
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import sys
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+import result_table
+from result_table import ResultTable, is_table_file, load_table
+from run_speedtest import parse_top_ips_by_region
+from tcp_probe import JITTER_COLUMN, PROBE_COLUMNS, RESULT_HEADER
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _write(path: Path, rows: list[list]) -> Path:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_HEADER + [JITTER_COLUMN])
+        writer.writerows(rows)
+    return path
+
+
+ROWS = [
+    ["104.16.0.1", 4, 4, "0.00", "9.00", "1.50", "N/A", "0.8"],
+    ["2606:4700::1", 4, 4, "0.00", "3.00", "0.00", "N/A", "0.1"],
+    ["141.101.64.9", 4, 4, "0.00", "5.00", "0.00", "N/A", "2.5"],
+    ["104.16.0.2", 4, 3, "0.25", "2.00", "0.00", "N/A", "0.4"],
+    ["190.93.240.1", 4, 3, "0.25", "bad", "", "N/A"],
+]
+
+
+def _same(a: ResultTable, b: ResultTable) -> None:
+    assert len(a) == len(b)
+    assert [a.ip_at(i) for i in range(len(a))] == [b.ip_at(i) for i in range(len(b))]
+    assert [a.region_at(i) for i in range(len(a))] == [b.region_at(i) for i in range(len(b))]
+    for name in ("latency", "loss", "jitter", "speed"):
+        assert list(getattr(a, name)) == list(getattr(b, name))
+
+
+def test_columns_and_queries(tmp_path):
+    table = ResultTable.from_csv(_write(tmp_path / "result.csv", ROWS))
+    assert len(table) == 5
+    assert table.ip_at(1) == "2606:4700::1" and table.region_at(1) == "US"
+    assert table.jitter[2] == 2.5 and table.jitter[4] == 0.0 and table.latency[4] == 9999.0
+
+    assert list(table.order) == [3, 1, 2, 0, 4]
+    assert list(table.argsort("jitter")) == [4, 1, 3, 0, 2]
+    assert list(table.filter(max_latency=6)) == [1, 2, 3]
+    assert list(table.filter(max_loss=0, regions=["US", "GB"])) == [0, 1, 2]
+    assert list(table.top_k(2)) == [3, 1]
+    assert list(table.top_k(2, "jitter", table.filter(regions=["US"]))) == [1, 3]
+
+    rows, after_pass = table.select_top(["US"], max_per_region=1, max_total=3)
+    assert list(rows) == [3, 2, 4] and after_pass == [1, 3, 3]
+    assert table.rank_of("104.16.0.2") == 0 and table.rank_of("2606:4700::1") == 1
+
+
+def test_save_and_mmap_round_trip(tmp_path):
+    table = ResultTable.from_csv(_write(tmp_path / "result.csv", ROWS))
+    path = tmp_path / "result.bin"
+    table.save(path)
+    assert is_table_file(path) and not is_table_file(tmp_path / "result.csv")
+
+    with load_table(path) as mapped:
+        _same(table, mapped)
+        assert list(mapped.order) == list(table.order)
+        assert mapped.rank_of("2606:4700::1") == 1
+        assert list(mapped.select_top(["GB"], 1, 2)[0]) == [2, 3]
+
+    # 映射的表可以再次保存
+    with ResultTable.open(path) as mapped:
+        mapped.save(tmp_path / "copy.bin")
+    with ResultTable.open(tmp_path / "copy.bin") as copy:
+        _same(table, copy)
+
+
+def test_rank_by_tail_latency(tmp_path, monkeypatch):
+    path = tmp_path / "result.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_HEADER + PROBE_COLUMNS)
+        writer.writerow(["104.16.0.1", 20, 20, "0.00", "8.00", "0.00", "N/A", "9.0", "6.0", "48.0", "60.0", "12.0"])
+        writer.writerow(["104.16.0.2", 20, 20, "0.00", "11.00", "0.00", "N/A", "0.4", "11.0", "12.0", "12.5", "0.5"])
+    table = ResultTable.from_csv(path)
+    assert list(table.p95) == [48.0, 12.0] and table.rank_of("104.16.0.1") == 0
+    table.rank_by("p95")
+    assert list(table.order) == [1, 0] and table.rank_of("104.16.0.1") == 1
+    assert list(table.select_top(["US"], 1, 1)[0]) == [1]
+
+    table.save(tmp_path / "result.bin")
+    with ResultTable.open(tmp_path / "result.bin") as mapped:
+        assert list(mapped.p99) == [60.0, 12.5]
+
+    # 旧版本（没有分位数列）的文件仍可打开，尾延迟按平均延迟处理
+    monkeypatch.setattr(result_table, "FORMAT_VERSION", 1)
+    monkeypatch.setattr(result_table, "FLOAT_COLUMNS", result_table.FLOAT_COLUMNS[:4])
+    table.region = array("B", table.region)
+    table.save(tmp_path / "v1.bin")
+    monkeypatch.undo()
+    with ResultTable.open(tmp_path / "v1.bin") as old:
+        assert list(old.p95) == list(old.latency) == [8.0, 11.0] and list(old.speed) == [0.0, 0.0]
+        assert [old.region_at(r) for r in (0, 1)] == [table.region_at(r) for r in (0, 1)]
+        old.rank_by("p99")
+        assert list(old.order) == [0, 1]
+
+
+def test_more_than_256_regions(tmp_path):
+    table = ResultTable()
+    names = [f"R{i}" for i in range(300)]
+    for i, code in enumerate(table.codes_for(names)):
+        table.addr.append(i + 1)
+        for column in (table.latency, table.loss, table.jitter, table.speed, table.p95, table.p99):
+            column.append(float(i))
+        table.region.append(code)
+    assert table.region_at(299) == "R299"
+    assert list(table.filter(regions=["R1", "R299"])) == [1, 299]
+
+    table.save(tmp_path / "regions.bin")
+    with ResultTable.open(tmp_path / "regions.bin") as mapped:
+        assert [mapped.region_at(r) for r in (0, 256, 299)] == ["R0", "R256", "R299"]
+        assert list(mapped.select_top(["R280"], 1, 1)[0]) == [280]
+
+
+def test_empty_table(tmp_path):
+    table = ResultTable.from_csv(_write(tmp_path / "result.csv", []))
+    table.save(tmp_path / "empty.bin")
+    with ResultTable.open(tmp_path / "empty.bin") as mapped:
+        assert len(mapped) == 0 and list(mapped.order) == []
+
+
+def test_select_top_matches_production(tmp_path):
+    path = ROOT / "test_result.csv"
+    table = ResultTable.from_csv(path)
+    table.save(tmp_path / "result.bin")
+    regions = ["US", "GB", "IN", "JP", "KR", "SG", "HK"]
+    with ResultTable.open(tmp_path / "result.bin") as mapped:
+        for per_region, total in ((10, 100), (3, 20), (50, 200)):
+            rows, _ = mapped.select_top(regions, per_region, total)
+            expected = parse_top_ips_by_region(path, regions, per_region, total)
+            assert [mapped.ip_at(r) for r in rows] == expected
+            assert parse_top_ips_by_region(tmp_path / "result.bin", regions, per_region, total) == expected
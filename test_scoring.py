@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from run_speedtest import parse_top_ips_by_region
+from scoring import (Candidate, _dominates, iter_candidates, make_scorer, pareto_frontier, parse_weights,
+                     select_scored)
+from tcp_probe import PROBE_COLUMNS, RESULT_HEADER
+
+ROOT = Path(__file__).resolve().parent
+REGIONS = ["US", "GB", "IN", "JP", "KR", "SG", "HK"]
+
+
+def test_weighted_score_penalises_loss():
+    lossy = Candidate("104.16.0.1", 5.0, 0.25)
+    clean = Candidate("104.16.0.2", 6.0, 0.0)
+    assert select_scored([lossy, clean], REGIONS, 10, 1) == ["104.16.0.1"]
+    assert select_scored([lossy, clean], REGIONS, 10, 1, make_scorer("weighted")) == ["104.16.0.2"]
+    assert select_scored([lossy, clean], REGIONS, 10, 1, make_scorer("throughput")) == ["104.16.0.2"]
+
+    weights = parse_weights("loss=0, jitter=2")
+    jittery = Candidate("104.16.0.3", 5.0, 0.0, jitter=3.0)
+    assert select_scored([jittery, clean], REGIONS, 10, 1, make_scorer("weighted", weights)) == ["104.16.0.2"]
+
+
+def test_tail_scorer_ranks_by_p95(tmp_path):
+    csv_path = tmp_path / "result.csv"
+    csv_path.write_text(",".join(RESULT_HEADER + PROBE_COLUMNS) + "\n"
+                        "104.16.0.1,20,20,0.00,8.00,0.00,N/A,9.50,6.00,48.00,60.00,12.00\n"
+                        "104.16.0.2,20,20,0.00,11.00,0.00,N/A,0.40,11.00,12.00,12.50,0.50\n"
+                        "104.16.0.3,4,4,0.00,9.00,0.00,N/A\n", encoding="utf-8")
+    cands = list(iter_candidates(csv_path))
+    assert cands[0].p95 == 48.0 and cands[1].p99 == 12.5 and cands[2].p95 == 0.0
+    # 平均值最低的 IP 尾延迟最差；没有分位数的 IP 按平均延迟参与排序
+    assert select_scored(cands, REGIONS, 10, 3) == ["104.16.0.1", "104.16.0.3", "104.16.0.2"]
+    assert select_scored(cands, REGIONS, 10, 3, make_scorer("p95")) == ["104.16.0.3", "104.16.0.2", "104.16.0.1"]
+    assert select_scored(cands, REGIONS, 10, 1, make_scorer("p99")) == ["104.16.0.3"]
+    weights = parse_weights("latency=0,jitter=0,p95=1")
+    assert select_scored(cands, REGIONS, 10, 1, make_scorer("weighted", weights)) == ["104.16.0.3"]
+
+
+def test_pareto_frontier_matches_brute_force():
+    rng = random.Random(3)
+    cands = [Candidate(f"104.16.{i // 256}.{i % 256}", round(rng.uniform(5, 50), 1), rng.choice([0, 0, 0.25, 0.5]),
+                       round(rng.uniform(0, 5), 1), rng.choice([0.0, 0.0, rng.uniform(1, 30)])) for i in range(400)]
+    expected = {c.ip for c in cands if not any(_dominates(o, c) for o in cands)}
+    assert {c.ip for c in pareto_frontier(cands)} == expected
+
+
+def test_pareto_keeps_frontier_then_fills_quotas():
+    fast = Candidate("104.16.0.1", 5.0, 0.0)
+    fastest_download = Candidate("141.101.64.1", 40.0, 0.0, speed=25.0)
+    others = [Candidate(f"104.16.1.{i}", 6.0 + i, 0.0) for i in range(5)]
+    picked = select_scored([fast, fastest_download, *others], REGIONS, 2, 4, make_scorer("weighted"), pareto=True)
+    assert picked[:2] == ["104.16.0.1", "141.101.64.1"]
+    assert picked[2:] == ["104.16.1.0", "104.16.1.1"]
+
+
+def test_latency_scorer_matches_production_selection():
+    for max_per_region, max_total in [(10, 100), (50, 100)]:
+        assert select_scored(iter_candidates(ROOT / "test_result.csv"), REGIONS, max_per_region, max_total) == \
+            parse_top_ips_by_region(ROOT / "test_result.csv", REGIONS, max_per_region, max_total)
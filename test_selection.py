@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "scripts"))
+from region_index import get_region_for_ip
+from run_speedtest import iter_result_rows, parse_top_ips_by_region
+from selection import select_streaming
+
+PRIORITY_REGIONS = ["US", "GB", "IN", "JP", "KR", "SG", "HK"]
+
+
+def reference_select(rows, regions, max_per_region, max_total):
+    """原先的实现：整表排序 + 三遍扫描"""
+    ip_data = [(ip, latency, get_region_for_ip(ip)) for ip, latency in rows]
+    ip_data.sort(key=lambda x: x[1])
+
+    selected_ips = []
+    region_counts = {region: 0 for region in regions}
+    for ip, latency, region in ip_data:
+        if region in regions and region_counts.get(region, 0) < max_per_region:
+            selected_ips.append(ip)
+            region_counts[region] = region_counts.get(region, 0) + 1
+        if len(selected_ips) >= max_total:
+            break
+    if len(selected_ips) < max_total:
+        for ip, latency, region in ip_data:
+            if ip in selected_ips:
+                continue
+            if region not in regions:
+                selected_ips.append(ip)
+            if len(selected_ips) >= max_total:
+                break
+    if len(selected_ips) < max_total:
+        for ip, latency, region in ip_data:
+            if ip in selected_ips:
+                continue
+            selected_ips.append(ip)
+            if len(selected_ips) >= max_total:
+                break
+    return selected_ips
+
+
+def test_identical_on_committed_result_csv():
+    csv_path = ROOT / "test_result.csv"
+    rows = list(iter_result_rows(csv_path))
+    configs = [(50, 100), (10, 100), (5, 30), (3, 2000), (1, 5), (0, 50)]
+    for max_per_region, max_total in configs:
+        expected = reference_select(rows, PRIORITY_REGIONS, max_per_region, max_total)
+        actual = parse_top_ips_by_region(csv_path, PRIORITY_REGIONS, max_per_region, max_total)
+        assert actual == expected, (max_per_region, max_total)
+
+
+def test_matches_committed_best_ip():
+    best = (ROOT / "best_ip.txt").read_text(encoding="utf-8").split()
+    assert parse_top_ips_by_region(ROOT / "test_result.csv", PRIORITY_REGIONS, 50, 100) == best
+
+
+def test_identical_on_random_ties():
+    rng = random.Random(7)
+    prefixes = ["104.16", "141.101", "103.21", "190.93", "131.0", "8.8"]
+    rows = [(f"{rng.choice(prefixes)}.{i // 256 % 256}.{i % 256}", float(rng.randint(1, 20))) for i in range(3000)]
+    for regions in (PRIORITY_REGIONS, ["GB", "HK"], []):
+        for max_per_region, max_total in [(5, 40), (50, 100), (1000, 2500)]:
+            expected = reference_select(rows, regions, max_per_region, max_total)
+            assert select_streaming(iter(rows), regions, max_per_region, max_total, chunk_size=97) == expected
+
+
+def test_ipv6_rows_are_selected(tmp_path):
+    csv_path = tmp_path / "result.csv"
+    csv_path.write_text(
+        "IP 地址,已发送,已接收,丢包率,平均延迟,下载速度(MB/s),地区码\n"
+        "2606:4700:3001::6815:1,4,4,0.00,3.00,0.00,N/A\n"
+        "104.16.0.1,4,4,0.00,5.00,0.00,N/A\n"
+        "2400:cb00:2049::1,4,4,0.00,1.00,0.00,N/A\n",
+        encoding="utf-8",
+    )
+    rows = list(iter_result_rows(csv_path))
+    assert parse_top_ips_by_region(csv_path, ["US"], 1, 3) == reference_select(rows, ["US"], 1, 3)
+    # IPv6 行按覆盖表归入地区（2606:4700::/32 → US，2400:cb00::/32 → JP），参与地区配额
+    assert parse_top_ips_by_region(csv_path, ["US"], 1, 3) == ["2606:4700:3001::6815:1", "2400:cb00:2049::1",
+                                                              "104.16.0.1"]
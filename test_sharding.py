@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import ipaddress
+import socket
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from sharding import _override_args, merge_shard_results, read_cidrs, run_sharded, split_cidrs
+from tcp_probe import PROBE_COLUMNS, RESULT_HEADER
+
+ROOT = Path(__file__).resolve().parent
+
+
+def test_split_covers_ranges_and_balances():
+    cidrs = read_cidrs(ROOT / "ip.txt")
+    shards = split_cidrs(cidrs, 4)
+    original = [ipaddress.ip_network(c) for c in cidrs]
+    pieces = [ipaddress.ip_network(c) for shard in shards for c in shard]
+
+    assert sum(n.num_addresses for n in pieces) == sum(n.num_addresses for n in original)
+    assert all(any(p.subnet_of(o) for o in original) for p in pieces)
+    loads = [sum(ipaddress.ip_network(c).num_addresses for c in shard) for shard in shards]
+    assert max(loads) <= 1.5 * min(loads)
+
+
+def test_split_balances_each_family():
+    shards = split_cidrs(["104.16.0.0/22", "2606:4700::/32", "2400:cb00:2049::/48"], 2)
+    loads = {version: sorted(sum(n.num_addresses for n in map(ipaddress.ip_network, shard) if n.version == version)
+                             for shard in shards) for version in (4, 6)}
+    # IPv4 不会因为 IPv6 的地址数而全部落在同一个分片
+    assert loads[4] == [512, 512]
+    assert loads[6] == [2 ** 95, 2 ** 95 + 2 ** 80]
+
+
+def test_override_args():
+    args = "-n 200 -t 4 -dd -o result.csv".split()
+    assert _override_args(args, {"-o": "s.csv", "-n": "50"}) == ["-t", "4", "-dd", "-o", "s.csv", "-n", "50"]
+
+
+def test_merge_is_sorted(tmp_path):
+    shard_rows = [
+        [("1.0.0.1", "0.00", "5.00"), ("1.0.0.2", "0.00", "9.00"), ("1.0.0.3", "0.25", "1.00")],
+        [("2.0.0.1", "0.00", "3.00"), ("2.0.0.2", "0.00", "9.50")],
+        [],
+    ]
+    paths = []
+    for i, rows in enumerate(shard_rows):
+        path = tmp_path / f"shard_{i}.csv"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(RESULT_HEADER)
+            for ip, loss, latency in rows:
+                writer.writerow([ip, 4, 4, loss, latency, "0.00", "N/A"])
+        paths.append(path)
+
+    out = tmp_path / "result.csv"
+    assert merge_shard_results(paths, out) == 5
+    with open(out, "r", encoding="utf-8", newline="") as f:
+        merged = [row[0] for row in list(csv.reader(f))[1:]]
+    assert merged == ["2.0.0.1", "1.0.0.1", "1.0.0.2", "2.0.0.2", "1.0.0.3"]
+
+
+def test_run_sharded_python_engine(tmp_path):
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(128)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    ip_txt = tmp_path / "ip.txt"
+    ip_txt.write_text("127.0.0.0/24\n127.0.1.0/24\n", encoding="utf-8")
+    try:
+        timings = run_sharded(ip_txt, tmp_path / "result.csv", tmp_path / "shards", shards=2,
+                              total_concurrency=64, port=srv.getsockname()[1], count=1,
+                              timeout=0.5, per_24=256)
+    finally:
+        srv.close()
+
+    assert [t["shard"] for t in timings] == [0, 1]
+    assert all(t["concurrency"] == 32 and t["candidates"] == 256 for t in timings)
+    with open(tmp_path / "result.csv", "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == RESULT_HEADER + PROBE_COLUMNS
+    assert [row[0] for row in rows[1:]] == ["127.0.0.1"]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import csv
+import socket
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+import tcp_probe
+from tcp_probe import PROBE_COLUMNS, RESULT_HEADER, ProbeResult, probe_many, run_probes, write_result_csv
+
+
+def _listener() -> tuple[socket.socket, int]:
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(128)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return srv, srv.getsockname()[1]
+
+
+def _closed_port() -> int:
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def test_probe_loopback_listener(tmp_path):
+    srv, port = _listener()
+    try:
+        results, stats = run_probes(["127.0.0.1"] * 20, port=port, count=3, concurrency=8, timeout=1.0)
+    finally:
+        srv.close()
+    assert len(results) == 20
+    assert all(r.sent == 3 and r.received == 3 and r.loss == 0.0 for r in results)
+    assert stats["probes"] == 60 and stats["probes_per_second"] > 0
+
+    csv_path = tmp_path / "result.csv"
+    write_result_csv(results, csv_path)
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == RESULT_HEADER + PROBE_COLUMNS
+    assert rows[1][0] == "127.0.0.1" and rows[1][3] == "0.00"
+    p50, p95, p99 = (float(v) for v in rows[1][8:11])
+    assert 0 < p50 <= p95 <= p99 and results[0].stddev >= 0
+
+
+def test_probe_drops_unreachable():
+    results, stats = run_probes(["127.0.0.1"], port=_closed_port(), count=2, timeout=0.5)
+    assert results == []
+    assert stats["alive"] == 0
+
+
+def test_probe_many_uses_a_fixed_worker_pool(monkeypatch):
+    tasks = []
+
+    async def fake_probe(ip, port, count, timeout, sem):
+        tasks.append(len(asyncio.all_tasks()))
+        await asyncio.sleep(0)
+        return ProbeResult(ip, count, count, 1.0)
+
+    monkeypatch.setattr(tcp_probe, "probe_ip", fake_probe)
+    ips = (f"10.0.{i // 256}.{i % 256}" for i in range(5000))
+    results = asyncio.run(probe_many(ips, concurrency=8))
+    # 任务数只取决于 concurrency（外加主任务），与候选数无关
+    assert max(tasks) <= 9
+    assert [r.ip for r in results] == [f"10.0.{i // 256}.{i % 256}" for i in range(5000)]
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from telemetry import Telemetry, counted
+
+
+def test_phases_jsonl_and_prometheus(tmp_path):
+    tel = Telemetry()
+    with tel.phase("parse") as m:
+        assert sum(1 for _ in counted(range(1234), m, "rows_parsed")) == 1234
+        m["note"] = "ignored by prometheus"
+    with pytest.raises(RuntimeError):
+        with tel.phase("probe"):
+            time.sleep(0.01)
+            raise RuntimeError("boom")
+
+    parse, probe = tel.phases
+    assert parse["ok"] and parse["rows_parsed"] == 1234
+    assert not probe["ok"] and probe["wall_s"] >= 0.01
+    assert parse["peak_rss_bytes"] > 0
+
+    path = tmp_path / "telemetry.jsonl"
+    tel.write_jsonl(path)
+    tel.write_jsonl(path)
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [l["phase"] for l in lines] == ["parse", "probe", "total"] * 2
+    assert lines[2]["phases"] == {"parse": parse["wall_s"], "probe": probe["wall_s"]}
+
+    prom = tmp_path / "cfst.prom"
+    tel.write_prometheus(prom)
+    text = prom.read_text(encoding="utf-8")
+    assert 'cfst_speedtest_phase_rows_parsed{phase="parse"} 1234' in text
+    assert 'cfst_speedtest_phase_ok{phase="probe"} 0' in text
+    assert "# TYPE cfst_speedtest_phase_wall_seconds gauge" in text
+    assert "note" not in text and "cfst_speedtest_run_wall_seconds" in text